@@ -0,0 +1,126 @@
+"""JWT authentication that resolves the user without a database query.
+
+simplejwt loads the user row on every request. Here the row (minus the
+password hash) is cached for ``JWT_USER_CACHE_TTL`` seconds, tagged with the
+user's version stamp, which ``jwt_auth.signals`` bumps whenever the user is
+saved or deleted (and ``CustomUserQuerySet`` on bulk updates), so a changed
+user is never served from the cache. With
+``JWT_USER_FROM_CLAIMS`` on, the login endpoint also signs the user's fields
+and version into the tokens, and requests build the user from those claims
+while the version still matches.
+
+Fields that are not cached or claimed (the password, for one) are deferred
+and load from the database if something reads them.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from task_manager.conditional import stamp_key, version_stamps
+from .models import CustomUser
+
+# Fields signed into tokens when JWT_USER_FROM_CLAIMS is on.
+CLAIM_FIELDS = [
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_staff",
+    "is_superuser",
+]
+USER_CLAIM = "usr"
+VERSION_CLAIM = "usr_ver"
+
+
+def user_cache_key(user_id):
+    return f"jwt_auth:user:{user_id}"
+
+
+def cached_attnames():
+    return [
+        field.attname
+        for field in CustomUser._meta.concrete_fields
+        if field.attname != "password"
+    ]
+
+
+def user_version(user_id):
+    """Stamp bumped whenever the user changes (see ``jwt_auth.signals``)."""
+    key = stamp_key("user", user_id)
+    return version_stamps([key])[key]
+
+
+def build_user(values):
+    """A user instance from ``{attname: value}``, other fields deferred."""
+    names = [
+        field.attname
+        for field in CustomUser._meta.concrete_fields
+        if field.attname in values
+    ]
+    return CustomUser.from_db(
+        router.db_for_read(CustomUser), names, [values[name] for name in names]
+    )
+
+
+def user_claims(user):
+    return {
+        USER_CLAIM: {name: getattr(user, name) for name in CLAIM_FIELDS},
+        VERSION_CLAIM: user_version(user.pk),
+    }
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that looks users up in the cache or the token."""
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash, which is never cached.
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+
+        user = None
+        if settings.JWT_USER_FROM_CLAIMS:
+            user = self.user_from_claims(validated_token, user_id)
+        if user is None:
+            user = self.cached_user(user_id)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+    def user_from_claims(self, validated_token, user_id):
+        claims = validated_token.get(USER_CLAIM)
+        version = validated_token.get(VERSION_CLAIM)
+        if not claims or version != user_version(user_id):
+            return None  # Issued before the user last changed
+        return build_user({api_settings.USER_ID_FIELD: user_id, **claims})
+
+    def cached_user(self, user_id):
+        key = user_cache_key(user_id)
+        version_key = stamp_key("user", user_id)
+        found = cache.get_many([key, version_key])
+        version = found.get(version_key) or user_version(user_id)
+        entry = found.get(key)
+        if entry is not None and entry[0] == version:
+            return build_user(entry[1])
+        try:
+            values = (
+                CustomUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values(*cached_attnames())
+                .get()
+            )
+        except CustomUser.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        # Tagged with the version read before the row: a change made while
+        # loading it bumps the version and retires this entry.
+        cache.set(key, (version, values), settings.JWT_USER_CACHE_TTL)
+        return build_user(values)
@@ -0,0 +1,133 @@
+"""Refresh token blacklist checks answered from the cache, and row compaction.
+
+Each refresh token's state (``active`` or ``blacklisted``) is cached under its
+JTI until the token expires: written as ``active`` when the token is issued
+and overwritten with ``blacklisted`` when it is blacklisted, so the check made
+by every ``/refresh/`` needs no query. Rotation also writes its rows with
+plain inserts instead of simplejwt's lookups and ``get_or_create`` calls. A JTI missing from the cache (evicted,
+or issued before this layer) is looked up in the database and cached with
+``add()``, which never overwrites a blacklisting recorded in the meantime.
+
+Deleting a blacklist row by hand does not clear the cached state, so the
+token stays refused until it expires.
+
+Outstanding and blacklisted token rows are kept until the token expires and
+then deleted in chunks by ``compact_expired_tokens``.
+"""
+
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+
+ACTIVE = "active"
+BLACKLISTED = "blacklisted"
+
+
+def jti_key(jti):
+    return f"jwt_auth:jti:{jti}"
+
+
+def _timeout(expires_at):
+    return max(1, int(expires_at - time.time()))
+
+
+def remember(jti, expires_at, state):
+    """Cache the state of a token until it expires (``expires_at`` in epoch seconds)."""
+    cache.set(jti_key(jti), state, _timeout(expires_at))
+
+
+def is_blacklisted(jti, expires_at):
+    state = cache.get(jti_key(jti))
+    if state is not None:
+        return state == BLACKLISTED
+    blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+    state = BLACKLISTED if blacklisted else ACTIVE
+    cache.add(jti_key(jti), state, _timeout(expires_at))
+    return blacklisted
+
+
+class RefreshToken(tokens.RefreshToken):
+    """Refresh token whose blacklist membership is read from the cache."""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM], self.payload["exp"]):
+            raise TokenError(_("Token is blacklisted"))
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        remember(token[api_settings.JTI_CLAIM], token["exp"], ACTIVE)
+        return token
+
+    def blacklist(self):
+        """Blacklist with one lookup and one insert, recording it in the cache."""
+        jti = self.payload[api_settings.JTI_CLAIM]
+        token_id = (
+            OutstandingToken.objects.filter(jti=jti)
+            .values_list("pk", flat=True)
+            .first()
+        )
+        if token_id is None:
+            return super().blacklist()  # Issued elsewhere; creates the row
+        BlacklistedToken.objects.bulk_create(
+            [BlacklistedToken(token_id=token_id)], ignore_conflicts=True
+        )
+        remember(jti, self.payload["exp"], BLACKLISTED)
+
+    def outstand(self):
+        """Record the token issued by a rotation with a single insert.
+
+        Its JTI is new, so there is no existing row to look for; refresh has
+        already checked that the user exists.
+        """
+        jti = self.payload[api_settings.JTI_CLAIM]
+        OutstandingToken.objects.bulk_create(
+            [
+                OutstandingToken(
+                    user_id=self.payload.get(api_settings.USER_ID_CLAIM),
+                    jti=jti,
+                    token=str(self),
+                    created_at=self.current_time,
+                    expires_at=datetime_from_epoch(self.payload["exp"]),
+                )
+            ],
+            ignore_conflicts=True,
+        )
+        remember(jti, self.payload["exp"], ACTIVE)
+
+
+def compact_expired_tokens(chunk_size=None):
+    """Delete expired outstanding tokens and their blacklist rows, in chunks.
+
+    Returns the number of outstanding tokens deleted. Expired rows are the
+    oldest, so walking the primary key finds them without an index on
+    ``expires_at``.
+    """
+    chunk_size = chunk_size or settings.JWT_TOKEN_COMPACTION_CHUNK_SIZE
+    now = timezone.now()
+    deleted = 0
+    last_pk = 0
+    while True:
+        pks = list(
+            OutstandingToken.objects.filter(pk__gt=last_pk, expires_at__lte=now)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=pks).delete()
+            OutstandingToken.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        last_pk = pks[-1]
@@ -0,0 +1,195 @@
+"""Bulk creation of users from CSV or JSON Lines files.
+
+Rows are streamed and handled in chunks of ``USER_IMPORT_CHUNK_SIZE``: one
+query finds which emails already exist, the remaining rows are validated and
+their passwords hashed in a pool of ``USER_IMPORT_WORKERS`` processes (PBKDF2
+is nearly all the cost of creating a user), and the new users are written
+with ``bulk_create``. Rows without a password get an unusable one, for users
+who set theirs through a password reset.
+
+Existing users are skipped, not updated. When a project is given, new and
+existing users alike are added to its members.
+"""
+
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from django.conf import settings
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from task_manager.conditional import bump, stamp_key
+from .models import CustomUser
+
+IMPORT_FIELDS = ["email", "first_name", "last_name", "phone_number"]
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+class UserImportError(Exception):
+    """Raised for a file that cannot be read as an import at all."""
+
+
+def format_for(name):
+    """Import format implied by a file name's extension."""
+    try:
+        return FORMATS[os.path.splitext(name)[1].lower()]
+    except KeyError:
+        raise UserImportError("Upload a .csv, .jsonl or .ndjson file")
+
+
+def read_rows(file, format):
+    """Yield ``(line, row)`` pairs from a text stream; bad rows are ``None``."""
+    if format == "csv":
+        reader = csv.DictReader(file)
+        if reader.fieldnames is None or "email" not in reader.fieldnames:
+            raise UserImportError("The CSV header must name an email column")
+        for row in reader:
+            yield reader.line_num, row
+    elif format == "jsonl":
+        for line, text in enumerate(file, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+    else:
+        raise UserImportError(f"Unknown import format {format!r}")
+
+
+def prepare(row):
+    """Validate a row and hash its password; runs in the worker processes.
+
+    Returns ``(values, None)`` for a valid row, ``(None, errors)`` otherwise.
+    """
+    user = CustomUser(
+        **{name: str(row.get(name) or "").strip() for name in IMPORT_FIELDS}
+    )
+    errors = {}
+    try:
+        user.clean_fields(exclude=["password"])
+    except ValidationError as e:
+        errors.update(e.message_dict)
+    password = row.get("password")
+    if password:
+        try:
+            validate_password(str(password), user)
+        except ValidationError as e:
+            errors["password"] = e.messages
+    if errors:
+        return None, errors
+    user.set_password(str(password) if password else None)
+    return {name: getattr(user, name) for name in [*IMPORT_FIELDS, "password"]}, None
+
+
+def _setup_worker():
+    import django
+
+    django.setup()  # Workers started with spawn/forkserver begin unconfigured
+
+
+class ImportReport:
+    """Running totals of an import, passed to the progress callback per chunk."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.processed = 0
+        self.created = 0
+        self.skipped = 0
+        self.errors = []  # (line, {field: [messages]})
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "created": self.created,
+            "skipped": self.skipped,
+            "invalid": len(self.errors),
+            "errors": [
+                {"line": line, "errors": errors}
+                for line, errors in self.errors[: settings.USER_IMPORT_MAX_ERRORS]
+            ],
+            "seconds": round(self.elapsed, 3),
+        }
+
+
+def import_users(rows, project=None, chunk_size=None, workers=None, progress=None):
+    """Create users from ``(line, row)`` pairs (see ``read_rows``).
+
+    ``workers=0`` hashes in this process. Returns an ``ImportReport``.
+    """
+    chunk_size = chunk_size or settings.USER_IMPORT_CHUNK_SIZE
+    if workers is None:
+        workers = settings.USER_IMPORT_WORKERS
+    report = ImportReport()
+    pool = ProcessPoolExecutor(workers, initializer=_setup_worker) if workers else None
+    try:
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            _import_chunk(chunk, project, pool, workers, report)
+            if progress is not None:
+                progress(report)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if report.created:
+        bump([stamp_key("users")])
+    return report
+
+
+def _import_chunk(chunk, project, pool, workers, report):
+    report.processed += len(chunk)
+    pending = {}
+    for line, row in chunk:
+        email = row and CustomUser.objects.normalize_email(
+            str(row.get("email") or "").strip()
+        )
+        if not email:
+            report.errors.append((line, {"email": ["This field is required."]}))
+        elif email in pending:
+            report.skipped += 1  # Repeated within the file
+        else:
+            pending[email] = (line, {**row, "email": email})
+
+    existing = dict(
+        CustomUser.objects.filter(email__in=pending).values_list("email", "pk")
+    )
+    report.skipped += len(existing)
+    new = [pending[email] for email in pending if email not in existing]
+    rows = [row for _, row in new]
+    if pool is not None:
+        results = pool.map(prepare, rows, chunksize=max(1, len(rows) // (workers * 4)))
+    else:
+        results = map(prepare, rows)
+
+    users = []
+    for (line, _), (values, errors) in zip(new, results):
+        if errors:
+            report.errors.append((line, errors))
+        else:
+            users.append(CustomUser(**values))
+
+    emails = [user.email for user in users]
+    with transaction.atomic():
+        # Emails registered since the lookup are skipped by the database, so
+        # count what the insert actually added.
+        registered = CustomUser.objects.filter(email__in=emails).count()
+        CustomUser.objects.bulk_create(users, ignore_conflicts=True)
+        found = list(
+            CustomUser.objects.filter(email__in=emails).values_list("pk", flat=True)
+        )
+        if project is not None:
+            project.members.add(*existing.values(), *found)
+    created = len(found) - registered
+    report.created += created
+    report.skipped += len(users) - created
@@ -0,0 +1,90 @@
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from jwt_auth.models import CustomUser
+from jwt_auth.serializers import CachedBlacklistTokenRefreshSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /refresh/ throughput with and without the cached blacklist, "
+        "against a history of rotated tokens. Everything is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--history", type=int, default=1_000_000, help="Historical tokens"
+        )
+        parser.add_argument(
+            "--refreshes", type=int, default=500, help="Refreshes timed per mode"
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=10_000, help="Rows inserted per batch"
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomUser.objects.create_user(
+                email=f"benchmark-{uuid.uuid4().hex}@example.com",
+                password=uuid.uuid4().hex,
+            )
+            self.create_history(user, options["history"], options["batch_size"])
+            for name, serializer_class in [
+                ("database", TokenRefreshSerializer),
+                ("cached", CachedBlacklistTokenRefreshSerializer),
+            ]:
+                self.run(name, serializer_class, user, options["refreshes"])
+            transaction.set_rollback(True)
+
+    def create_history(self, user, count, batch_size):
+        # Every historical token was rotated, so every one is blacklisted.
+        now = timezone.now()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            outstanding = OutstandingToken.objects.bulk_create(
+                OutstandingToken(
+                    user=user,
+                    jti=uuid.uuid4().hex,
+                    token="benchmark",
+                    created_at=now - timedelta(days=2),
+                    expires_at=now - timedelta(days=1),
+                )
+                for _ in range(size)
+            )
+            if outstanding[0].pk is None:
+                outstanding = OutstandingToken.objects.filter(
+                    jti__in=[token.jti for token in outstanding]
+                )
+            BlacklistedToken.objects.bulk_create(
+                BlacklistedToken(token=token) for token in outstanding
+            )
+            created += size
+            self.stdout.write(f"\rCreated {created} historical tokens", ending="")
+            self.stdout.flush()
+        self.stdout.write("")
+
+    def run(self, name, serializer_class, user, refreshes):
+        refresh = str(serializer_class.token_class.for_user(user))
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(refreshes):
+                serializer = serializer_class(data={"refresh": refresh})
+                serializer.is_valid(raise_exception=True)
+                refresh = serializer.validated_data["refresh"]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{name}: {refreshes / elapsed:.1f} refreshes/s, "
+                f"{len(queries) / refreshes:.1f} queries per refresh"
+            )
+        )
@@ -0,0 +1,69 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from projects.models import Project
+from jwt_auth.imports import UserImportError, format_for, import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a CSV or JSON Lines file with email, password, "
+        "first_name, last_name and phone_number columns. Existing emails are "
+        "skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import, or - for standard input")
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"], help="Defaults to the file extension"
+        )
+        parser.add_argument(
+            "--project", type=int, help="Project that every listed user joins"
+        )
+        parser.add_argument("--workers", type=int, help="Password hashing processes")
+        parser.add_argument("--chunk-size", type=int, help="Users per insert")
+
+    def handle(self, *args, **options):
+        project = None
+        if options["project"] is not None:
+            project = Project.objects.filter(pk=options["project"]).first()
+            if project is None:
+                raise CommandError("Project not found")
+        path = options["path"]
+        try:
+            format = options["format"] or format_for(path)
+            if path == "-":
+                report = self.run(sys.stdin, format, project, options)
+            else:
+                with open(path, encoding="utf-8-sig", newline="") as file:
+                    report = self.run(file, format, project, options)
+        except (OSError, UserImportError) as e:
+            raise CommandError(e)
+
+        self.stdout.write("")
+        for line, errors in report.errors:
+            for field, messages in errors.items():
+                self.stderr.write(f"line {line}: {field}: {' '.join(messages)}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report.created}, skipped {report.skipped} existing, "
+                f"{len(report.errors)} invalid in {report.elapsed:.1f}s "
+                f"({report.rate:.0f} rows/s)"
+            )
+        )
+
+    def run(self, file, format, project, options):
+        return import_users(
+            read_rows(file, format),
+            project=project,
+            chunk_size=options["chunk_size"],
+            workers=options["workers"],
+            progress=self.progress,
+        )
+
+    def progress(self, report):
+        self.stdout.write(
+            f"\r{report.processed} rows, {report.created} created, "
+            f"{report.rate:.0f} rows/s",
+            ending="",
+        )
+        self.stdout.flush()
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('jwt_auth', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['first_name'], name='jwt_auth_cu_first_n_2b2aeb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['last_name'], name='jwt_auth_cu_last_na_3507db_idx'),
+        ),
+    ]
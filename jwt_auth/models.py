@@ -1,11 +1,34 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
+from task_manager.conditional import bump, stamp_key
 
 
-class CustomUserManager(BaseUserManager):
+class CustomUserQuerySet(models.QuerySet):
+    """QuerySet whose bulk writes retire cached users like saves do.
+
+    ``bulk_update()`` goes through ``update()`` as well.
+    """
+
+    def update(self, **kwargs):
+        if set(kwargs) <= {"last_login"}:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            user_ids = list(self.order_by().values_list("pk", flat=True))
+            updated = super().update(**kwargs)
+        if user_ids:
+            bump(
+                [
+                    stamp_key("users"),
+                    *(stamp_key("user", user_id) for user_id in user_ids),
+                ]
+            )
+        return updated
+
+
+class CustomUserManager(BaseUserManager.from_queryset(CustomUserQuerySet)):
     """Custom manager for user model with email as unique identifier."""
 
     def create_user(self, email, password=None, **extra_fields):
@@ -44,5 +67,12 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta(AbstractUser.Meta):
+        # Prefix lookups of /users/search/ (email is indexed as unique).
+        indexes = [
+            models.Index(fields=["first_name"]),
+            models.Index(fields=["last_name"]),
+        ]
+
     def __str__(self):
         return self.email
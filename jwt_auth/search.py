@@ -0,0 +1,66 @@
+"""Prefix search over users for pickers (assignees, project members).
+
+Each word of the query is matched as a prefix with ``LIKE 'word%'`` against
+the indexed email, first name and last name columns, so lookups are index
+range scans; two words are read as a first and last name. Results are
+limited to users who share a project with the caller (staff see everyone)
+and capped at ``USER_SEARCH_MAX_RESULTS``.
+
+Results are cached for ``USER_SEARCH_CACHE_TTL`` seconds under the prefix,
+the caller's projects and the version stamps of those projects and of the
+user list, so membership and profile changes show up at once.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from projects.models import Project
+from projects.visibility import visible_project_ids
+from task_manager.conditional import make_etag, stamp_key, version_stamps
+from .models import CustomUser
+
+RESULT_FIELDS = ["email", "first_name", "last_name"]
+
+
+def prefix_filter(query):
+    words = query.split()
+    if len(words) == 2:
+        first, last = words
+        return Q(first_name__istartswith=first, last_name__istartswith=last)
+    prefix = query.strip()
+    return (
+        Q(email__istartswith=prefix)
+        | Q(first_name__istartswith=prefix)
+        | Q(last_name__istartswith=prefix)
+    )
+
+
+def search_users(user, query, limit):
+    """Up to ``limit`` users matching ``query`` that ``user`` may pick."""
+    query = " ".join(query.lower().split())
+    if user.is_staff:
+        project_ids = None
+        stamp_keys = [stamp_key("users")]
+    else:
+        project_ids = sorted(visible_project_ids(user))
+        stamp_keys = [
+            stamp_key("users"),
+            *(stamp_key("project", project_id) for project_id in project_ids),
+        ]
+    stamps = version_stamps(stamp_keys)
+    key = "users:search:" + make_etag(
+        query, limit, project_ids, sorted(stamps.items())
+    ).strip('"')
+    results = cache.get(key)
+    if results is None:
+        users = CustomUser.objects.filter(prefix_filter(query), is_active=True)
+        if project_ids is not None:
+            members = Project.members.through.objects.filter(
+                project_id__in=project_ids
+            ).values("customuser_id")
+            owners = Project.objects.filter(pk__in=project_ids).values("owner_id")
+            # Two semi-joins rather than a join, so no DISTINCT is needed.
+            users = users.filter(Q(pk__in=members) | Q(pk__in=owners))
+        results = list(users.order_by("email").values(*RESULT_FIELDS)[:limit])
+        cache.set(key, results, settings.USER_SEARCH_CACHE_TTL)
+    return results
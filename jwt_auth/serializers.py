@@ -1,7 +1,15 @@
+from django.conf import settings
 from django.db import transaction
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_field
+from rest_framework_simplejwt.serializers import (
+    TokenBlacklistSerializer,
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from .authentication import user_claims
+from .blacklist import RefreshToken
 from .models import CustomUser
 
 
@@ -57,3 +65,25 @@ class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ["email", "first_name", "last_name", "phone_number"]
+
+
+class UserClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login that signs the user's fields into the tokens if JWT_USER_FROM_CLAIMS."""
+
+    token_class = RefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        if settings.JWT_USER_FROM_CLAIMS:
+            for claim, value in user_claims(user).items():
+                token[claim] = value
+        return token
+
+
+class CachedBlacklistTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RefreshToken
+
+
+class CachedBlacklistTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = RefreshToken
@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from task_manager.conditional import bump, stamp_key
+from .blacklist import BLACKLISTED, remember
+from .models import CustomUser
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_users_stamp(sender, instance, update_fields=None, **kwargs):
+    """Users are listed by /users/; logins only touch last_login, which is not."""
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    bump([stamp_key("users")])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def bump_user_version(sender, instance, update_fields=None, **kwargs):
+    """Retires the cached user and tokens carrying the old user claims."""
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    bump([stamp_key("user", instance.pk)])
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def cache_blacklisting(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        token = instance.token
+        remember(token.jti, token.expires_at.timestamp(), BLACKLISTED)
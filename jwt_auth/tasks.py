@@ -0,0 +1,8 @@
+from celery import shared_task
+from . import blacklist
+
+
+@shared_task
+def compact_expired_tokens():
+    """Delete outstanding and blacklisted token rows whose tokens have expired."""
+    return blacklist.compact_expired_tokens()
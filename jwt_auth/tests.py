@@ -1,3 +1,289 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import (
+    BlacklistedToken,
+    OutstandingToken,
+)
+from projects.models import Project
+from task_manager.throttling import SlidingWindowMixin, closed_window_count
+from . import imports
+from .authentication import CachedJWTAuthentication
+from .blacklist import RefreshToken, compact_expired_tokens
+from .models import CustomUser
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def login(self):
+        response = APIClient().post(
+            "/api/v1/login/",
+            {"email": "owner@example.com", "password": "S3cure-pass-123"},
+        )
+        return RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Bearer {response.data['access']}"
+        )
+
+    def test_cached_user_needs_no_queries(self):
+        request = self.login()
+        with self.assertNumQueries(1):
+            JWTAuthentication().authenticate(request)
+        CachedJWTAuthentication().authenticate(request)
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual((user.pk, user.email), (self.user.pk, self.user.email))
+
+    def test_saving_the_user_retires_the_entry(self):
+        request = self.login()
+        CachedJWTAuthentication().authenticate(request)
+        self.user.is_staff = True
+        self.user.save()
+        with self.assertNumQueries(1):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertTrue(user.is_staff)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    def test_bulk_writes_retire_the_entry(self):
+        request = self.login()
+        CachedJWTAuthentication().authenticate(request)
+        CustomUser.objects.filter(pk=self.user.pk).update(is_staff=True)
+        user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertTrue(user.is_staff)
+        self.user.is_active = False
+        CustomUser.objects.bulk_update([self.user], ["is_active"])
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+    @override_settings(JWT_USER_FROM_CLAIMS=True)
+    def test_claims_resolve_user_until_it_changes(self):
+        request = self.login()
+        with self.assertNumQueries(0):
+            user, _ = CachedJWTAuthentication().authenticate(request)
+        self.assertEqual(user.email, self.user.email)
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            CachedJWTAuthentication().authenticate(request)
+
+
+class RefreshTokenBlacklistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post("/api/v1/refresh/", {"refresh": token})
+
+    def test_rotated_tokens_are_refused_from_the_cache(self):
+        old = str(RefreshToken.for_user(self.user))
+        new = self.refresh(old).data["refresh"]
+        with self.assertNumQueries(0):
+            with self.assertRaises(TokenError):
+                RefreshToken(old)
+            RefreshToken(new)
+        self.assertEqual(self.refresh(old).status_code, 401)
+        # Without the cache the database still has the final word.
+        cache.clear()
+        self.assertEqual(self.refresh(old).status_code, 401)
+        self.assertEqual(self.refresh(new).status_code, 200)
+
+    def test_compaction_deletes_expired_rows_in_chunks(self):
+        now = timezone.now()
+        expired = [now - timedelta(days=1)] * 3
+        for i, expires_at in enumerate([*expired, now + timedelta(hours=1)]):
+            token = OutstandingToken.objects.create(
+                user=self.user,
+                jti=f"jti-{i}",
+                token="token",
+                created_at=now - timedelta(days=2),
+                expires_at=expires_at,
+            )
+            BlacklistedToken.objects.create(token=token)
+        self.assertEqual(compact_expired_tokens(chunk_size=2), 3)
+        self.assertEqual(
+            list(OutstandingToken.objects.values_list("jti", flat=True)), ["jti-3"]
+        )
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
+
+
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        closed_window_count.cache_clear()
+        self.client = APIClient()
+
+    def login(self, now):
+        with mock.patch.object(SlidingWindowMixin, "timer", return_value=now):
+            return self.client.post(
+                "/api/v1/login/", {"email": "nobody@example.com", "password": "x"}
+            )
+
+    def test_window_slides_over_the_previous_minute(self):
+        start = 600_000.0  # A minute boundary
+        for i in range(10):
+            self.assertEqual(self.login(start + i).status_code, 401)
+        refused = self.login(start + 30)
+        self.assertEqual(refused.status_code, 429)
+        self.assertEqual(refused["Retry-After"], "36")
+        # Half a minute later half of the previous window still counts.
+        for i in range(5):
+            self.assertEqual(self.login(start + 90).status_code, 401)
+        self.assertEqual(self.login(start + 90).status_code, 429)
+        self.assertEqual(self.login(start + 150).status_code, 401)
+
+    def test_scopes_are_counted_separately(self):
+        for _ in range(10):
+            self.login(600_000.0)
+        self.assertEqual(self.login(600_000.0).status_code, 429)
+        with mock.patch.object(SlidingWindowMixin, "timer", return_value=600_000.0):
+            response = self.client.post("/api/v1/refresh/", {"refresh": "x"})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(USER_IMPORT_WORKERS=0, USER_IMPORT_CHUNK_SIZE=2)
+class UserImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_superuser(
+            email="admin@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Onboarding", owner=cls.admin)
+
+    def test_command_creates_new_users_and_skips_the_rest(self):
+        rows = io.StringIO(
+            "email,password,first_name,last_name\n"
+            "ada@example.com,An4lytical-engine,Ada,Lovelace\n"
+            "admin@example.com,Whatever-123,,\n"
+            "ada@example.com,An4lytical-engine,Ada,Lovelace\n"
+            "grace@example.com,,Grace,Hopper\n"
+            "not-an-email,Whatever-123,,\n"
+            "alan@example.com,123,Alan,Turing\n"
+        )
+        out = io.StringIO()
+        with mock.patch("sys.stdin", rows):
+            call_command(
+                "import_users",
+                "-",
+                format="csv",
+                project=self.project.pk,
+                stdout=out,
+                stderr=io.StringIO(),
+            )
+        self.assertIn("Created 2, skipped 2 existing, 2 invalid", out.getvalue())
+        ada = CustomUser.objects.get(email="ada@example.com")
+        self.assertTrue(ada.check_password("An4lytical-engine"))
+        self.assertFalse(
+            CustomUser.objects.get(email="grace@example.com").has_usable_password()
+        )
+        self.assertFalse(CustomUser.objects.filter(email="alan@example.com").exists())
+        self.assertCountEqual(
+            self.project.members.values_list("email", flat=True),
+            ["ada@example.com", "admin@example.com", "grace@example.com"],
+        )
+
+    def test_emails_registered_during_the_import_are_not_counted(self):
+        prepare_row = imports.prepare
+
+        def prepare(row):
+            if row["email"] == "late@example.com":
+                CustomUser.objects.create_user(
+                    email="late@example.com", password="S3cure-pass-123"
+                )
+            return prepare_row(row)
+
+        rows = [
+            (1, {"email": "ada@example.com", "password": "An4lytical-engine"}),
+            (2, {"email": "late@example.com", "password": "An4lytical-engine"}),
+        ]
+        with mock.patch("jwt_auth.imports.prepare", prepare):
+            report = imports.import_users(rows, project=self.project, workers=0)
+        self.assertEqual((report.created, report.skipped), (1, 1))
+        self.assertEqual(self.project.members.count(), 2)
+
+    def test_endpoint_is_for_admins(self):
+        client = APIClient()
+        upload = SimpleUploadedFile(
+            "users.jsonl",
+            b'{"email": "ada@example.com", "password": "An4lytical-engine"}\n'
+            b"not json\n",
+        )
+        member = CustomUser.objects.create_user(
+            email="member@example.com", password="S3cure-pass-123"
+        )
+        client.force_authenticate(member)
+        response = client.post("/api/v1/users/import/", {"file": upload})
+        self.assertEqual(response.status_code, 403)
+
+        client.force_authenticate(self.admin)
+        upload.seek(0)
+        response = client.post("/api/v1/users/import/", {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["created"], response.data["invalid"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 2)
+
+
+class UserSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        def user(email, first_name="", last_name=""):
+            return CustomUser.objects.create_user(
+                email=email,
+                password="S3cure-pass-123",
+                first_name=first_name,
+                last_name=last_name,
+            )
+
+        cls.caller = user("caller@example.com")
+        cls.ada = user("ada@example.com", "Ada", "Lovelace")
+        cls.adam = user("adam@example.com", "Adam", "Smith")
+        cls.stranger = user("adele@example.com", "Adele", "Adkins")
+        project = Project.objects.create(name="Engine", owner=cls.ada)
+        project.members.add(cls.caller, cls.adam)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.caller)
+
+    def search(self, q):
+        response = self.client.get("/api/v1/users/search/", {"q": q})
+        return [user["email"] for user in response.data]
+
+    def test_prefixes_match_users_sharing_a_project(self):
+        self.assertEqual(self.search("ad"), ["ada@example.com", "adam@example.com"])
+        self.assertEqual(self.search("LOVE"), ["ada@example.com"])
+        self.assertEqual(self.search("ada love"), ["ada@example.com"])
+        self.assertEqual(self.search("%"), [])
+
+    def test_results_follow_membership_changes(self):
+        self.assertEqual(self.search("smi"), ["adam@example.com"])
+        with self.assertNumQueries(0):
+            self.search("smi")
+        Project.objects.get(name="Engine").members.remove(self.adam)
+        self.assertEqual(self.search("smi"), [])
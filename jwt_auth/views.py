@@ -1,8 +1,24 @@
+import io
+from django.conf import settings
+from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework_simplejwt.views import TokenObtainPairView
+from task_manager.conditional import (
+    make_etag,
+    stamp_datetime,
+    stamp_key,
+    version_stamps,
+)
+from task_manager.response_cache import CachedResponseMixin
+from projects.models import Project
+from .imports import UserImportError, format_for, import_users, read_rows
+from .search import search_users
 from .serializers import RegisterSerializer, UserSerializer
 from .models import CustomUser
 
@@ -10,6 +26,7 @@ class RegisterView(APIView):
     """API endpoint for user registration."""
 
     permission_classes = [AllowAny]
+    throttle_scope = "login"
 
     def post(self, request):
         serializer = RegisterSerializer(data=request.data)
@@ -19,8 +36,78 @@ class RegisterView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class LoginView(TokenObtainPairView):
+    """Token pair for a user's credentials, rate limited per client."""
+
+    throttle_scope = "login"
+
+
+class UserViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """User viewset"""
     queryset = CustomUser.objects.all()
     serializer_class = UserSerializer
-    permission_classes = [IsAuthenticated]
\ No newline at end of file
+    permission_classes = [IsAuthenticated]
+    cache_metrics_name = "users"
+    throttle_scopes = {"search": "user-search"}
+
+    def _validators(self, *parts):
+        key = stamp_key("users")
+        stamp = version_stamps([key])[key]
+        return make_etag("users", *parts, stamp), stamp_datetime(stamp)
+
+    def get_list_validators(self):
+        return self._validators(self.request.get_full_path())
+
+    def get_object_validators(self):
+        return self._validators(str(self.kwargs["pk"]))
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """Users sharing a project with the caller whose email or name starts with ?q=."""
+        query = request.query_params.get("q", "")
+        if not query.strip():
+            return Response(
+                {"q": "Enter the start of an email or name"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(
+                request.query_params.get("limit", settings.USER_SEARCH_MAX_RESULTS)
+            )
+        except ValueError:
+            return Response(
+                {"limit": "Must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.USER_SEARCH_MAX_RESULTS))
+        return Response(search_users(request.user, query, limit))
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def bulk_import(self, request):
+        """Create users from an uploaded CSV or JSON Lines ``file``.
+
+        Existing emails are skipped; an optional ``project`` ID gets every
+        listed user as a member.
+        """
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"file": "Upload a file of users"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        project = None
+        if request.data.get("project"):
+            project = get_object_or_404(Project, pk=request.data["project"])
+        try:
+            rows = read_rows(
+                io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline=""),
+                format_for(upload.name),
+            )
+            report = import_users(rows, project=project)
+        except (UserImportError, UnicodeDecodeError) as e:
+            return Response({"file": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report.as_dict())
\ No newline at end of file
@@ -0,0 +1,75 @@
+"""Kanban board for a project, built from two grouped queries and cached.
+
+Column totals come from one ``GROUP BY status`` query and the top cards of
+every column from one ``ROW_NUMBER() OVER (PARTITION BY status)`` query.
+Results are cached under the project's ``project-tasks`` version stamp, which
+is bumped whenever a task, status or sprint in the project changes.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import RowNumber
+from task_manager.conditional import stamp_key, version_stamps
+from .models import TaskStatus
+from .serializers import TaskStatusSerializer
+
+
+def _build_board(project, limit):
+    from tasks.models import Task
+    from tasks.serializers import TaskListSerializer
+
+    statuses = list(TaskStatus.objects.filter(project=project).order_by("order", "id"))
+    totals = {
+        row["status_id"]: row
+        for row in Task.objects.filter(project=project)
+        .order_by()
+        .values("status_id")
+        .annotate(task_count=Count("id"), story_points=Sum("story_points"))
+    }
+    cards = (
+        Task.objects.filter(project=project)
+        .annotate(
+            column_rank=Window(
+                RowNumber(),
+                partition_by=[F("status_id")],
+                order_by=[F("updated_at").desc(), F("id").desc()],
+            )
+        )
+        .filter(column_rank__lte=limit)
+        .select_related("status", "assigned_to")
+        .order_by("column_rank")
+    )
+    cards_by_status = {}
+    for task in cards:
+        cards_by_status.setdefault(task.status_id, []).append(task)
+
+    columns = []
+    # Tasks without a status get a leading column, only when there are any.
+    column_statuses = ([None] if None in totals else []) + statuses
+    for task_status in column_statuses:
+        status_id = task_status.pk if task_status else None
+        total = totals.get(status_id, {})
+        columns.append(
+            {
+                "status": TaskStatusSerializer(task_status).data if task_status else None,
+                "task_count": total.get("task_count", 0),
+                "story_points": total.get("story_points") or 0,
+                "tasks": TaskListSerializer(
+                    cards_by_status.get(status_id, []), many=True
+                ).data,
+            }
+        )
+    return {"project": project.pk, "columns": columns}
+
+
+def project_board(project, limit):
+    """Return the board for ``project`` with up to ``limit`` cards per column."""
+    version_key = stamp_key("project-tasks", project.pk)
+    version = version_stamps([version_key])[version_key]
+    key = f"projects:board:{project.pk}:{version}:{limit}"
+    board = cache.get(key)
+    if board is None:
+        board = _build_board(project, limit)
+        cache.set(key, board, settings.PROJECT_BOARD_CACHE_TTL)
+    return board
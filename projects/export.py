@@ -0,0 +1,176 @@
+"""CSV and NDJSON export of a project's tasks.
+
+Rows are read as ``values_list()`` tuples in keyset chunks of
+``PROJECT_EXPORT_CHUNK_SIZE`` ordered by ID, with status, sprint and user
+names joined in, and rendered one chunk at a time, so memory stays flat
+however many tasks the project has. (Keyset chunks rather than
+``.iterator()``: mysqlclient fetches a whole result set into memory.) CSV
+cells that start like a formula are prefixed with ``'`` so spreadsheets show
+them as text.
+
+Large exports can instead be written by a Celery job to a gzip-compressed
+file that is downloaded once ready; ``expire_exports`` removes them after
+``PROJECT_EXPORT_EXPIRY_HOURS``.
+"""
+
+import csv
+import gzip
+import io
+import logging
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from tasks.models import Task
+from .models import ProjectExport
+
+logger = logging.getLogger(__name__)
+
+# Export column: the values_list() lookup that reads it.
+COLUMNS = {
+    "id": "id",
+    "title": "title",
+    "description": "description",
+    "status": "status__name",
+    "priority": "priority",
+    "parent_task_id": "parent_task_id",
+    "assignee": "assigned_to__email",
+    "created_by": "created_by__email",
+    "sprint": "sprint__name",
+    "deadline": "deadline",
+    "story_points": "story_points",
+    "estimated_hours": "estimated_hours",
+    "actual_hours": "actual_hours",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+# Leading characters that make spreadsheets evaluate a CSV cell as a formula.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class ExportError(Exception):
+    """Raised for an export request that names an unknown format or column."""
+
+
+def parse_request(format, columns):
+    """Validate ``?format=`` and a comma-separated ``?columns=``."""
+    if format not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+    if not columns:
+        return format, list(COLUMNS)
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    unknown = [name for name in names if name not in COLUMNS]
+    if unknown or not names:
+        raise ExportError(
+            f"Unknown columns: {', '.join(unknown)}. "
+            f"Choose from: {', '.join(COLUMNS)}"
+        )
+    return format, list(dict.fromkeys(names))
+
+
+def filename(project_id, format):
+    return f"project-{project_id}-tasks.{FORMATS[format][1]}"
+
+
+def content_type(format):
+    return FORMATS[format][0]
+
+
+def row_chunks(project_id, columns):
+    """Yield lists of row tuples, ``PROJECT_EXPORT_CHUNK_SIZE`` at a time."""
+    lookups = ["id", *(COLUMNS[name] for name in columns)]
+    tasks = Task.objects.filter(project_id=project_id).order_by("id")
+    chunk_size = settings.PROJECT_EXPORT_CHUNK_SIZE
+    last_id = 0
+    while True:
+        chunk = list(
+            tasks.filter(id__gt=last_id).values_list(*lookups)[:chunk_size]
+        )
+        if chunk:
+            yield [row[1:] for row in chunk]
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+
+def render(chunks, format, columns):
+    """Yield the export of ``row_chunks()`` as text, one piece per chunk."""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows([_cell(value) for value in row] for row in chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # A project without tasks: just the header
+    else:
+        encoder = DjangoJSONEncoder(separators=(",", ":"))
+        for chunk in chunks:
+            yield "".join(
+                encoder.encode(dict(zip(columns, row))) + "\n" for row in chunk
+            )
+
+
+def _cell(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value  # Shown as text instead of run as a formula
+    return value
+
+
+def write_export(export_id):
+    """Write a queued export to a gzip file in storage; returns its status."""
+    # Claimed atomically, so a redelivered job cannot write the export twice.
+    if not ProjectExport.objects.filter(pk=export_id, status="pending").update(
+        status="running"
+    ):
+        return None
+    export = ProjectExport.objects.get(pk=export_id)
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    chunks = counted(row_chunks(export.project_id, export.columns))
+    try:
+        with tempfile.TemporaryFile() as output:
+            with gzip.open(output, "wt", encoding="utf-8", newline="") as compressed:
+                for piece in render(chunks, export.format, export.columns):
+                    compressed.write(piece)
+            output.seek(0)
+            name = filename(export.project_id, export.format) + ".gz"
+            export.file.save(f"{export.pk}/{name}", File(output), save=False)
+    except Exception:
+        logger.exception("Could not write export %s", export.pk)
+        export.status = "failed"
+    else:
+        export.status = "ready"
+        export.row_count = rows
+    export.finished_at = timezone.now()
+    export.save(update_fields=["file", "status", "row_count", "finished_at"])
+    return export.status
+
+
+def expire_exports():
+    """Delete exports (and their files) older than the expiry window."""
+    cutoff = timezone.now() - timedelta(hours=settings.PROJECT_EXPORT_EXPIRY_HOURS)
+    count = 0
+    for export in ProjectExport.objects.filter(created_at__lt=cutoff).iterator():
+        if export.file:
+            export.file.delete(save=False)
+        export.delete()
+        count += 1
+    return count
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+from django.test.utils import CaptureQueriesContext
+from jwt_auth.models import CustomUser
+from projects.models import Project
+from projects.visibility import filter_visible, invalidate_visible_projects
+from tasks.models import Task
+
+
+class Command(BaseCommand):
+    help = "Compare OR-join + DISTINCT visibility filtering with the cached project-ID set."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="User whose visibility is benchmarked")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument(
+            "--explain", action="store_true", help="Print the query plans as well"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(email=options["email"])
+        except CustomUser.DoesNotExist:
+            raise CommandError("User not found")
+
+        strategies = {
+            "tasks (OR + DISTINCT)": lambda: Task.objects.filter(
+                models.Q(project__owner=user) | models.Q(project__members=user)
+            ).distinct(),
+            "tasks (cached IDs)": lambda: filter_visible(
+                Task.objects.all(), user, project_field="project"
+            ),
+            "projects (OR + DISTINCT)": lambda: Project.objects.filter(
+                models.Q(owner=user) | models.Q(members=user)
+            ).distinct(),
+            "projects (cached IDs)": lambda: filter_visible(
+                Project.objects.all(), user
+            ),
+        }
+        invalidate_visible_projects(user.pk)
+        for name, build in strategies.items():
+            with CaptureQueriesContext(connection) as queries:
+                list(build()[:10])
+            start = time.perf_counter()
+            for _ in range(options["iterations"]):
+                list(build()[:10])
+            elapsed = (time.perf_counter() - start) / options["iterations"] * 1000
+            self.stdout.write(
+                f"{name}: {elapsed:.2f} ms/page, {len(queries)} queries on first run"
+            )
+            if options["explain"]:
+                self.stdout.write(build()[:10].explain())
@@ -0,0 +1,88 @@
+"""Incremental changes to a project's members, addressed by email.
+
+Emails are resolved to user IDs in batches of ``PROJECT_MEMBER_BATCH_SIZE``
+and only the membership rows that actually change are inserted or deleted,
+so adding one member to a project with thousands costs the same as adding
+one to an empty project. ``m2m_changed`` fires with just the changed users,
+which keeps the visibility and response caches in step.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from jwt_auth.models import CustomUser
+from .models import Project
+
+Membership = Project.members.through
+
+
+class UnknownEmails(Exception):
+    """Raised with the emails that match no user."""
+
+    def __init__(self, emails):
+        super().__init__(emails)
+        self.emails = emails
+
+
+def resolve_emails(emails):
+    """Return the IDs of the users with ``emails``, or raise ``UnknownEmails``."""
+    emails = list(dict.fromkeys(emails))
+    batch_size = settings.PROJECT_MEMBER_BATCH_SIZE
+    found = {}
+    for start in range(0, len(emails), batch_size):
+        found.update(
+            CustomUser.objects.filter(
+                email__in=emails[start : start + batch_size]
+            ).values_list("email", "pk")
+        )
+    missing = [email for email in emails if email not in found]
+    if missing:
+        raise UnknownEmails(missing)
+    return list(found.values())
+
+
+def _current_members(project, user_ids):
+    batch_size = settings.PROJECT_MEMBER_BATCH_SIZE
+    current = set()
+    for start in range(0, len(user_ids), batch_size):
+        current.update(
+            Membership.objects.filter(
+                project_id=project.pk,
+                customuser_id__in=user_ids[start : start + batch_size],
+            ).values_list("customuser_id", flat=True)
+        )
+    return current
+
+
+@transaction.atomic
+def add_members(project, emails):
+    """Add the users with ``emails``; returns how many were not members yet."""
+    user_ids = resolve_emails(emails)
+    current = _current_members(project, user_ids)
+    new_ids = [user_id for user_id in user_ids if user_id not in current]
+    if new_ids:
+        project.members.add(*new_ids)
+    return len(new_ids)
+
+
+@transaction.atomic
+def remove_members(project, emails):
+    """Remove the users with ``emails``; returns how many were members."""
+    user_ids = resolve_emails(emails)
+    current = list(_current_members(project, user_ids))
+    if current:
+        project.members.remove(*current)
+    return len(current)
+
+
+def member_count():
+    """``member_count`` annotation: a correlated count, so no ``GROUP BY``."""
+    counts = (
+        Membership.objects.filter(project_id=OuterRef("pk"))
+        .order_by()
+        .values("project_id")
+        .annotate(count=Count("*"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
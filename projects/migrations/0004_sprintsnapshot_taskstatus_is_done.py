@@ -0,0 +1,39 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_sprint_taskstatus'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskstatus',
+            name='is_done',
+            field=models.BooleanField(default=False, help_text='Tasks in this status count as completed'),
+        ),
+        migrations.CreateModel(
+            name='SprintSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('total_points', models.PositiveIntegerField(default=0)),
+                ('completed_points', models.PositiveIntegerField(default=0)),
+                ('remaining_points', models.PositiveIntegerField(default=0)),
+                ('estimated_hours', models.FloatField(default=0.0)),
+                ('actual_hours', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='projects.sprint')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('sprint', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0004_sprintsnapshot_taskstatus_is_done'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStats',
+            fields=[
+                ('project', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='projects.project')),
+                ('task_count', models.IntegerField(default=0)),
+                ('no_status_count', models.IntegerField(default=0)),
+                ('unassigned_count', models.IntegerField(default=0)),
+                ('overdue_count', models.IntegerField(default=0)),
+                ('low_priority_count', models.IntegerField(default=0)),
+                ('medium_priority_count', models.IntegerField(default=0)),
+                ('high_priority_count', models.IntegerField(default=0)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectStatusCount',
+            fields=[
+                ('status', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counter', serialize=False, to='projects.taskstatus')),
+                ('count', models.IntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_counts', to='projects.project')),
+            ],
+        ),
+    ]
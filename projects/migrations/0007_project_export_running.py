@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_project_export'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='projectexport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+    ]
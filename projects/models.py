@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from jwt_auth.models import CustomUser
 
@@ -27,6 +28,13 @@ class Project(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets the visibility signals spot ownership changes without a query.
+        instance._loaded_owner_id = instance.__dict__.get("owner_id")
+        return instance
+
 
 class TaskStatus(models.Model):
     """Model for custom task statuses per project."""
@@ -36,6 +44,9 @@ class TaskStatus(models.Model):
     )
     name = models.CharField(max_length=50)
     order = models.PositiveIntegerField(default=0)  # For Kanban sorting
+    is_done = models.BooleanField(
+        default=False, help_text="Tasks in this status count as completed"
+    )
 
     class Meta:
         unique_together = ["project", "name"]
@@ -56,4 +67,97 @@ class Sprint(models.Model):
 
 
     def __str__(self):
-        return f"{self.name} ({self.project.name})"
\ No newline at end of file
+        return f"{self.name} ({self.project.name})"
+
+
+class SprintSnapshot(models.Model):
+    """Daily totals for a sprint, used for burndown and velocity reports."""
+
+    sprint = models.ForeignKey(
+        Sprint, on_delete=models.CASCADE, related_name="snapshots"
+    )
+    date = models.DateField()
+    task_count = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    total_points = models.PositiveIntegerField(default=0)
+    completed_points = models.PositiveIntegerField(default=0)
+    remaining_points = models.PositiveIntegerField(default=0)
+    estimated_hours = models.FloatField(default=0.0)
+    actual_hours = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [("sprint", "date")]
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.sprint.name} on {self.date}"
+
+
+class ProjectStats(models.Model):
+    """Denormalized task counters of a project, kept current on every task write.
+
+    Counts that depend on the project's done statuses (open, done) are
+    derived from the per-status counts. ``overdue_count`` counts the open
+    tasks whose deadline had passed at ``reconciled_at``; the reconciliation
+    job moves that moment forward.
+    """
+
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, primary_key=True, related_name="stats"
+    )
+    task_count = models.IntegerField(default=0)
+    no_status_count = models.IntegerField(default=0)
+    unassigned_count = models.IntegerField(default=0)
+    overdue_count = models.IntegerField(default=0)
+    low_priority_count = models.IntegerField(default=0)
+    medium_priority_count = models.IntegerField(default=0)
+    high_priority_count = models.IntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Stats for project {self.project_id}"
+
+
+class ProjectStatusCount(models.Model):
+    """Number of tasks currently in a status."""
+
+    status = models.OneToOneField(
+        TaskStatus, on_delete=models.CASCADE, primary_key=True, related_name="counter"
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="status_counts"
+    )
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.count} tasks in status {self.status_id}"
+
+
+class ProjectExport(models.Model):
+    """A task export written to a compressed file by a Celery job."""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="exports"
+    )
+    requested_by = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="project_exports"
+    )
+    format = models.CharField(max_length=10)
+    columns = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    file = models.FileField(upload_to="exports/", blank=True)
+    row_count = models.IntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export of project {self.project_id} ({self.status})"
@@ -1,10 +1,38 @@
 from rest_framework import permissions
+from .visibility import OWNER, project_roles
+
+
+def get_project_roles(request):
+    """Return ``request.user``'s project roles, resolved at most once per request."""
+    roles = getattr(request, "_project_roles", None)
+    if roles is None:
+        user = request.user
+        roles = project_roles(user) if user and user.is_authenticated else {}
+        request._project_roles = roles
+    return roles
+
+
+def has_project_access(request, project_id, write=False):
+    """Answer an owner/member check for one project from the request's roles."""
+    if request.user.is_staff:
+        return True
+    role = get_project_roles(request).get(project_id)
+    return role == OWNER if write else role is not None
 
 
 class IsProjectOwnerOrMember(permissions.BasePermission):
     """Allow only project owner or members to access; only owner/admin can edit."""
 
     def has_object_permission(self, request, view, obj):
-        if request.method in permissions.SAFE_METHODS:
-            return obj.members.contains(request.user) or request.user.is_staff
-        return obj.owner == request.user or request.user.is_staff
+        return has_project_access(
+            request, obj.pk, write=request.method not in permissions.SAFE_METHODS
+        )
+
+    @staticmethod
+    def filter_permitted(request, projects, write=False):
+        """Return the projects the user may read (or edit), without per-object queries."""
+        return [
+            project
+            for project in projects
+            if has_project_access(request, project.pk, write=write)
+        ]
@@ -0,0 +1,163 @@
+"""Sprint reporting backed by daily SprintSnapshot rows.
+
+Task writes move today's row of their sprints with ``F()`` updates built from
+the ``(old, new)`` transitions carried by ``tasks_changed``. A sprint without
+a row for today gets one computed with a single aggregate query after the
+commit, and the nightly beat job recomputes every active sprint to correct
+drift, so reports read O(days) snapshot rows instead of scanning tasks or
+replaying TaskHistory.
+"""
+
+from collections import Counter
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .models import Sprint, SprintSnapshot, TaskStatus
+
+
+def done_status_ids(project_id):
+    """Statuses that count as completed: those flagged ``is_done``.
+
+    Projects that have not flagged any fall back to their last column.
+    """
+    return done_status_ids_by_project([project_id]).get(project_id, [])
+
+
+def done_status_ids_by_project(project_ids):
+    """``done_status_ids`` for several projects with one query."""
+    statuses = {}
+    for project_id, status_id, is_done in (
+        TaskStatus.objects.filter(project_id__in=project_ids)
+        .order_by("-order", "-id")
+        .values_list("project_id", "id", "is_done")
+    ):
+        statuses.setdefault(project_id, []).append((status_id, is_done))
+    return {
+        project_id: pick_done_status_ids(rows) for project_id, rows in statuses.items()
+    }
+
+
+def pick_done_status_ids(statuses):
+    """Apply the done rule to ``(id, is_done)`` pairs ordered last column first."""
+    flagged = [status_id for status_id, is_done in statuses if is_done]
+    if flagged or not statuses:
+        return flagged
+    return [statuses[0][0]]
+
+
+def snapshot_sprint(sprint, date=None, done_ids=None):
+    """Recompute and store the snapshot of ``sprint`` for ``date`` (default today)."""
+    from tasks.models import Task
+
+    date = date or timezone.localdate()
+    if done_ids is None:
+        done_ids = done_status_ids(sprint.project_id)
+    done = Q(status_id__in=done_ids)
+    totals = Task.objects.filter(sprint=sprint).aggregate(
+        task_count=Count("id"),
+        completed_count=Count("id", filter=done),
+        total_points=Coalesce(Sum("story_points"), 0),
+        completed_points=Coalesce(Sum("story_points", filter=done), 0),
+        estimated_hours=Coalesce(Sum("estimated_hours"), 0.0),
+        actual_hours=Coalesce(Sum("actual_hours"), 0.0),
+    )
+    totals["remaining_points"] = totals["total_points"] - totals["completed_points"]
+    snapshot, _ = SprintSnapshot.objects.update_or_create(
+        sprint=sprint, date=date, defaults=totals
+    )
+    return snapshot
+
+
+def _sprint_totals(state, done_ids):
+    """What one task in ``state`` adds to its sprint's snapshot."""
+    points = state["story_points"] or 0
+    done = state["status_id"] in done_ids
+    return {
+        "task_count": 1,
+        "completed_count": int(done),
+        "total_points": points,
+        "completed_points": points if done else 0,
+        "remaining_points": 0 if done else points,
+        "estimated_hours": state["estimated_hours"] or 0,
+        "actual_hours": state["actual_hours"] or 0,
+    }
+
+
+def _moved(field, delta):
+    """``field + delta`` floored at zero, never negative midway (unsigned on MySQL)."""
+    if delta < 0:
+        return Greatest(F(field), -delta) + delta
+    return F(field) + delta
+
+
+def apply_transitions(transitions):
+    """Move today's sprint snapshots for ``(old, new)`` task states with ``F()`` updates."""
+    from .stats import cached_done_status_ids
+
+    deltas = {}
+    for old, new in transitions:
+        if old == new:
+            continue
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None or state["sprint_id"] is None:
+                continue
+            done_ids = cached_done_status_ids(state["project_id"])
+            totals = deltas.setdefault(state["sprint_id"], Counter())
+            for field, value in _sprint_totals(state, done_ids).items():
+                totals[field] += sign * value
+    today = timezone.localdate()
+    missing = []
+    for sprint_id, totals in deltas.items():
+        changes = {field: _moved(field, delta) for field, delta in totals.items() if delta}
+        if changes and not SprintSnapshot.objects.filter(
+            sprint_id=sprint_id, date=today
+        ).update(**changes):
+            missing.append(sprint_id)
+    if missing:
+        # Computed after the commit: the sprint may be deleted with its project.
+        transaction.on_commit(lambda: snapshot_active_sprints(sprint_ids=missing))
+
+
+def active_sprints(project_ids=None, date=None, sprint_ids=None):
+    date = date or timezone.localdate()
+    sprints = Sprint.objects.filter(start_date__lte=date, end_date__gte=date)
+    if project_ids is not None:
+        sprints = sprints.filter(project_id__in=project_ids)
+    if sprint_ids is not None:
+        sprints = sprints.filter(pk__in=sprint_ids)
+    return sprints
+
+
+def snapshot_active_sprints(project_ids=None, sprint_ids=None):
+    """Refresh today's snapshot of every active sprint (optionally per project or sprint)."""
+    done_by_project = {}
+    count = 0
+    for sprint in active_sprints(project_ids, sprint_ids=sprint_ids).iterator():
+        if sprint.project_id not in done_by_project:
+            done_by_project[sprint.project_id] = done_status_ids(sprint.project_id)
+        snapshot_sprint(sprint, done_ids=done_by_project[sprint.project_id])
+        count += 1
+    return count
+
+
+def latest_snapshots(sprints):
+    """Map sprint ID to its most recent snapshot (up to the sprint's end date)."""
+    latest = {}
+    snapshots = SprintSnapshot.objects.filter(sprint__in=sprints).order_by(
+        "sprint_id", "-date"
+    )
+    end_dates = {sprint.pk: sprint.end_date for sprint in sprints}
+    for snapshot in snapshots:
+        if snapshot.sprint_id in latest or snapshot.date > end_dates[snapshot.sprint_id]:
+            continue
+        latest[snapshot.sprint_id] = snapshot
+    return latest
+
+
+def recent_sprints(project, count):
+    """The last ``count`` sprints of a project that have started, newest first."""
+    return list(
+        Sprint.objects.filter(project=project, start_date__lte=timezone.localdate())
+        .order_by("-end_date", "-id")[:count]
+    )
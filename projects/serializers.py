@@ -1,15 +1,16 @@
 from django.db import transaction
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Project, TaskStatus, Sprint
+from .members import UnknownEmails, resolve_emails
+from .models import Project, ProjectExport, TaskStatus, Sprint, SprintSnapshot
 from jwt_auth.serializers import UserSerializer
-from jwt_auth.models import CustomUser
 
 
 class TaskStatusSerializer(serializers.ModelSerializer):
     """Serializer for TaskStatus model."""
     class Meta:
         model = TaskStatus
-        fields = ["id", "project", "name", "order"]
+        fields = ["id", "project", "name", "order", "is_done"]
 
 
 class SprintSerializer(serializers.ModelSerializer):
@@ -17,7 +18,22 @@ class SprintSerializer(serializers.ModelSerializer):
     class Meta:
         model = Sprint
         fields = ["id", "project", "name", "start_date", "end_date", "created_at"]
-        
+
+
+class SprintSnapshotSerializer(serializers.ModelSerializer):
+    """Serializer for daily sprint snapshots."""
+    class Meta:
+        model = SprintSnapshot
+        fields = [
+            "date",
+            "task_count",
+            "completed_count",
+            "total_points",
+            "completed_points",
+            "remaining_points",
+            "estimated_hours",
+            "actual_hours",
+        ]
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -25,6 +41,7 @@ class ProjectSerializer(serializers.ModelSerializer):
 
     owner = UserSerializer(read_only=True)
     members = UserSerializer(many=True, read_only=True)
+    member_count = serializers.SerializerMethodField()
     member_emails = serializers.ListField(
         child=serializers.EmailField(), write_only=True, required=False
     )
@@ -37,37 +54,33 @@ class ProjectSerializer(serializers.ModelSerializer):
             "description",
             "owner",
             "members",
+            "member_count",
             "member_emails",
             "created_at",
             "updated_at",
         ]
 
+    def get_member_count(self, obj) -> int:
+        count = getattr(obj, "member_count", None)  # Annotated by the viewset
+        return obj.members.count() if count is None else count
+
+    def _member_ids(self, member_emails):
+        try:
+            return resolve_emails(member_emails)
+        except UnknownEmails as e:
+            raise serializers.ValidationError(
+                {
+                    "member_emails": f"Users with these emails not found: {', '.join(e.emails)}"
+                }
+            )
+
     @transaction.atomic
     def create(self, validated_data):
         """Create project and assign members by email."""
         member_emails = validated_data.pop("member_emails", [])
         project = Project.objects.create(**validated_data)
-
         if member_emails:
-            # fetch all users with the given emails in a single query
-            users_to_add = list(CustomUser.objects.filter(email__in=member_emails))
-
-            # check if all provided emails correspond to existing users
-            found_emails = {user.email for user in users_to_add}
-            invalid_emails = [
-                email for email in member_emails if email not in found_emails
-            ]
-
-            if invalid_emails:
-                # raise validation error for invalid emails
-                raise serializers.ValidationError(
-                    {
-                        "member_emails": f"User with these emails not found: {', '.join(invalid_emails)}"
-                    }
-                )
-
-            # add all found users to the project members in one go
-            project.members.set(users_to_add)  # use set() for efficiency
+            project.members.set(self._member_ids(member_emails))
         return project
 
     def update(self, instance, validated_data):
@@ -75,16 +88,55 @@ class ProjectSerializer(serializers.ModelSerializer):
         # handle other updates
         instance = super().update(instance, validated_data)
         if member_emails is not None:
-            users_to_set = list(CustomUser.objects.filter(email__in=member_emails))
-            found_emails = {user.email for user in users_to_set}
-            invalid_emails = [
-                email for email in member_emails if email not in found_emails
-            ]
-            if invalid_emails:
-                raise serializers.ValidationError(
-                    {
-                        "member_emails": f"Users with these emails not found: {', '.join(invalid_emails)}"
-                    }
-                )
-            instance.members.set(users_to_set)
-        return instance
\ No newline at end of file
+            instance.members.set(self._member_ids(member_emails))
+            # The viewset's annotation predates the change; recount instead.
+            instance.__dict__.pop("member_count", None)
+        return instance
+
+
+class ProjectListSerializer(ProjectSerializer):
+    """Project list entries: members are counted, not listed (see /members/)."""
+
+    class Meta(ProjectSerializer.Meta):
+        fields = [
+            "id",
+            "name",
+            "description",
+            "owner",
+            "member_count",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class ProjectMembersSerializer(serializers.Serializer):
+    """Emails of the users to add to or remove from a project."""
+
+    emails = serializers.ListField(child=serializers.EmailField(), allow_empty=False)
+
+
+class ProjectExportSerializer(serializers.ModelSerializer):
+    """A queued task export; ``download_url`` is set once it is ready."""
+
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProjectExport
+        fields = [
+            "id",
+            "format",
+            "columns",
+            "status",
+            "row_count",
+            "download_url",
+            "created_at",
+            "finished_at",
+        ]
+
+    def get_download_url(self, obj) -> str | None:
+        if obj.status != "ready":
+            return None
+        kwargs = {"pk": obj.project_id, "export_id": obj.pk}
+        url = reverse("project-download-export", kwargs=kwargs)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
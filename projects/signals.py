@@ -0,0 +1,129 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from task_manager.conditional import bump, stamp_key
+from tasks.tracking import tasks_changed
+from . import reports, stats
+from .models import Project, ProjectStats, ProjectStatusCount, Sprint, TaskStatus
+from .visibility import invalidate_visible_projects
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def invalidate_member_visibility(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop cached visibility for users whose membership changed."""
+    if action == "pre_clear" and not reverse:
+        # pk_set is empty on clear, so remember who is about to be removed.
+        instance._cleared_member_ids = list(
+            instance.members.values_list("id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        invalidate_visible_projects(instance.pk)
+    elif action == "post_clear":
+        invalidate_visible_projects(*instance.__dict__.pop("_cleared_member_ids", []))
+    else:
+        invalidate_visible_projects(*pk_set)
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def bump_member_stamps(sender, instance, action, reverse, pk_set, **kwargs):
+    """Members are part of the project payload."""
+    if action == "pre_clear" and reverse:
+        instance._cleared_project_ids = list(
+            instance.projects.values_list("id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        project_ids = [instance.pk]
+    elif action == "post_clear":
+        project_ids = instance.__dict__.pop("_cleared_project_ids", [])
+    else:
+        project_ids = pk_set
+    bump(
+        [
+            stamp_key("projects"),
+            *(stamp_key("project", project_id) for project_id in project_ids),
+        ]
+    )
+
+
+@receiver(post_save, sender=Project)
+def invalidate_owner_visibility(sender, instance, created, **kwargs):
+    """Drop cached visibility for the new and (if changed) previous owner."""
+    previous_owner_id = getattr(instance, "_loaded_owner_id", None)
+    if created or previous_owner_id != instance.owner_id:
+        invalidate_visible_projects(instance.owner_id, previous_owner_id)
+    instance._loaded_owner_id = instance.owner_id
+
+
+@receiver(post_save, sender=Project)
+def create_project_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ProjectStats.objects.create(project=instance, reconciled_at=timezone.now())
+
+
+@receiver(post_delete, sender=Project)
+def invalidate_deleted_project_visibility(sender, instance, **kwargs):
+    invalidate_visible_projects(instance.owner_id)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def bump_project_stamp(sender, instance, **kwargs):
+    bump([stamp_key("projects"), stamp_key("project", instance.pk)])
+
+
+def bump_project_tasks_stamps(project_ids):
+    """Mark the task lists (and boards) of the given projects as changed."""
+    bump(
+        [
+            stamp_key("tasks"),
+            *(stamp_key("project-tasks", project_id) for project_id in project_ids),
+        ]
+    )
+
+
+@receiver(tasks_changed)
+def bump_task_stamps(sender, project_ids, **kwargs):
+    bump_project_tasks_stamps(project_ids)
+
+
+@receiver(tasks_changed)
+def update_project_stats(sender, transitions=(), **kwargs):
+    stats.apply_transitions(transitions)
+
+
+@receiver(tasks_changed)
+def update_sprint_snapshots(sender, transitions=(), **kwargs):
+    reports.apply_transitions(transitions)
+
+
+@receiver(post_save, sender=TaskStatus)
+@receiver(post_delete, sender=TaskStatus)
+@receiver(post_save, sender=Sprint)
+@receiver(post_delete, sender=Sprint)
+def bump_rendered_with_tasks(sender, instance, **kwargs):
+    """Statuses and sprints are rendered inside tasks and on the board."""
+    bump_project_tasks_stamps([instance.project_id])
+
+
+@receiver(post_save, sender=TaskStatus)
+@receiver(post_delete, sender=TaskStatus)
+def recount_status_stats(sender, instance, created=False, raw=False, **kwargs):
+    """Statuses decide which tasks are open or overdue, so recount their project.
+
+    Runs after commit: deleting a project deletes its statuses first, and the
+    recount must not recreate counters for it.
+    """
+    project_id = instance.project_id
+    if created and not raw:
+        ProjectStatusCount.objects.create(status=instance, project_id=project_id)
+    stats.invalidate_done_statuses(project_id)
+    transaction.on_commit(lambda: stats.reconcile([project_id]))
+    # Completed totals depend on the done statuses too.
+    transaction.on_commit(lambda: reports.snapshot_active_sprints([project_id]))
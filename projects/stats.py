@@ -0,0 +1,285 @@
+"""Denormalized task counters per project, for O(1) dashboard reads.
+
+Task writes move the counters with ``F()`` updates built from the
+``(old, new)`` transitions carried by ``tasks_changed``, so concurrent writers
+never overwrite each other's increments. Counts that depend on which statuses
+are "done" (open, done) are derived at read time from the per-status counts.
+``reconcile`` recomputes everything from the tasks table, a chunk of projects
+at a time, to correct drift: deadlines passing, status changes and writes that
+bypass the ORM.
+"""
+
+import logging
+from collections import Counter
+from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Project, ProjectStats, ProjectStatusCount, TaskStatus
+from .reports import done_status_ids, done_status_ids_by_project, pick_done_status_ids
+from .serializers import TaskStatusSerializer
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_FIELDS = {
+    "low": "low_priority_count",
+    "medium": "medium_priority_count",
+    "high": "high_priority_count",
+}
+COUNTER_FIELDS = [
+    "task_count",
+    "no_status_count",
+    "unassigned_count",
+    "overdue_count",
+    *PRIORITY_FIELDS.values(),
+]
+
+
+def _done_key(project_id):
+    return f"projects:done-statuses:{project_id}"
+
+
+def cached_done_status_ids(project_id):
+    return cache.get_or_set(
+        _done_key(project_id), lambda: done_status_ids(project_id), None
+    )
+
+
+def invalidate_done_statuses(project_id):
+    cache.delete(_done_key(project_id))
+
+
+def _tally(stats, statuses, deadlines, state, sign, now):
+    counters = stats.setdefault(state["project_id"], Counter())
+    counters["task_count"] += sign
+    if state["status_id"] is None:
+        counters["no_status_count"] += sign
+    else:
+        statuses[state["status_id"]] += sign
+    if state["assigned_to_id"] is None:
+        counters["unassigned_count"] += sign
+    if state["priority"] in PRIORITY_FIELDS:
+        counters[PRIORITY_FIELDS[state["priority"]]] += sign
+    deadline = state["deadline"]
+    # Only deadlines already passed can have passed at the last reconciliation.
+    if isinstance(deadline, datetime) and deadline < now:
+        if state["status_id"] not in cached_done_status_ids(state["project_id"]):
+            deadlines.append((state["project_id"], deadline, sign))
+
+
+def _moved(field, delta):
+    # Floored so a counter that drifted low cannot go negative before the
+    # next reconciliation.
+    return Greatest(F(field) + delta, 0) if delta < 0 else F(field) + delta
+
+
+def apply_transitions(transitions):
+    """Move the counters for ``(old, new)`` task states with ``F()`` updates.
+
+    ``overdue_count`` counts the open tasks whose deadline had passed when
+    the project was last reconciled, so a task is judged against the same
+    moment when it is counted and when it is uncounted; deadlines passing in
+    between are picked up by the next reconciliation.
+    """
+    now = timezone.now()
+    stats, statuses, deadlines = {}, Counter(), []
+    for old, new in transitions:
+        if old == new:
+            continue
+        if old is not None:
+            _tally(stats, statuses, deadlines, old, -1, now)
+        if new is not None:
+            _tally(stats, statuses, deadlines, new, 1, now)
+    if stats:
+        _move_counters(stats, statuses, deadlines)
+
+
+@transaction.atomic(savepoint=False)
+def _move_counters(stats, statuses, deadlines):
+    # Atomic of its own: tasks_changed is also sent after the writer's
+    # transaction has ended, and the lock below needs one.
+    if deadlines:
+        # Locked so a reconciliation cannot move reconciled_at under us.
+        reconciled = dict(
+            ProjectStats.objects.select_for_update()
+            .filter(project_id__in={project_id for project_id, _, _ in deadlines})
+            .values_list("project_id", "reconciled_at")
+        )
+        for project_id, deadline, sign in deadlines:
+            reconciled_at = reconciled.get(project_id)
+            if reconciled_at is not None and deadline < reconciled_at:
+                stats[project_id]["overdue_count"] += sign
+    for project_id, counters in stats.items():
+        changes = {
+            field: _moved(field, delta) for field, delta in counters.items() if delta
+        }
+        if changes:
+            ProjectStats.objects.filter(project_id=project_id).update(**changes)
+    statuses = {status_id: delta for status_id, delta in statuses.items() if delta}
+    if statuses:
+        ProjectStatusCount.objects.filter(status_id__in=statuses).update(
+            count=Greatest(
+                F("count")
+                + Case(
+                    *[
+                        When(status_id=status_id, then=delta)
+                        for status_id, delta in statuses.items()
+                    ],
+                    output_field=IntegerField(),
+                ),
+                0,
+            )
+        )
+
+
+@transaction.atomic
+def _reconcile_chunk(project_ids):
+    """Recount one chunk of projects; return the IDs whose counters were off."""
+    from tasks.models import Task
+
+    now = timezone.now()
+    # Lock the counters first so F() updates racing the recount queue behind it.
+    stored = {
+        stats.project_id: stats
+        for stats in ProjectStats.objects.select_for_update().filter(
+            project_id__in=project_ids
+        )
+    }
+    stored_statuses = {
+        counter.status_id: counter
+        for counter in ProjectStatusCount.objects.select_for_update().filter(
+            project_id__in=project_ids
+        )
+    }
+    done = done_status_ids_by_project(project_ids)
+    fresh = {
+        project_id: ProjectStats(project_id=project_id, reconciled_at=now)
+        for project_id in project_ids
+    }
+    fresh_statuses = {
+        status_id: ProjectStatusCount(status_id=status_id, project_id=project_id)
+        for status_id, project_id in TaskStatus.objects.filter(
+            project_id__in=project_ids
+        ).values_list("id", "project_id")
+    }
+    rows = (
+        Task.objects.filter(project_id__in=project_ids)
+        .order_by()
+        .values("project_id", "status_id", "priority")
+        .annotate(
+            tasks=Count("id"),
+            unassigned=Count("id", filter=Q(assigned_to__isnull=True)),
+            overdue=Count("id", filter=Q(deadline__lt=now)),
+        )
+    )
+    for row in rows:
+        stats = fresh[row["project_id"]]
+        stats.task_count += row["tasks"]
+        stats.unassigned_count += row["unassigned"]
+        if row["priority"] in PRIORITY_FIELDS:
+            field = PRIORITY_FIELDS[row["priority"]]
+            setattr(stats, field, getattr(stats, field) + row["tasks"])
+        if row["status_id"] is None:
+            stats.no_status_count += row["tasks"]
+        else:
+            fresh_statuses[row["status_id"]].count += row["tasks"]
+        if row["status_id"] not in done.get(row["project_id"], []):
+            stats.overdue_count += row["overdue"]
+
+    drifted = {
+        project_id
+        for project_id, stats in fresh.items()
+        if project_id not in stored
+        or any(getattr(stats, f) != getattr(stored[project_id], f) for f in COUNTER_FIELDS)
+    }
+    drifted.update(
+        counter.project_id
+        for status_id, counter in fresh_statuses.items()
+        if status_id not in stored_statuses
+        or counter.count != stored_statuses[status_id].count
+    )
+    ProjectStats.objects.bulk_update(
+        [stats for project_id, stats in fresh.items() if project_id in stored],
+        [*COUNTER_FIELDS, "reconciled_at"],
+    )
+    ProjectStats.objects.bulk_create(
+        [stats for project_id, stats in fresh.items() if project_id not in stored]
+    )
+    ProjectStatusCount.objects.bulk_update(
+        [
+            counter
+            for status_id, counter in fresh_statuses.items()
+            if status_id in stored_statuses
+            and counter.count != stored_statuses[status_id].count
+        ],
+        ["count"],
+    )
+    ProjectStatusCount.objects.bulk_create(
+        [
+            counter
+            for status_id, counter in fresh_statuses.items()
+            if status_id not in stored_statuses
+        ]
+    )
+    return drifted
+
+
+def reconcile(project_ids=None, chunk_size=None):
+    """Recompute the counters of all (or the given) projects; return how many drifted."""
+    chunk_size = chunk_size or settings.PROJECT_STATS_RECONCILE_CHUNK_SIZE
+    projects = Project.objects.order_by("pk").values_list("pk", flat=True)
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+    drifted = 0
+    last_id = 0
+    while True:
+        chunk = list(projects.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            break
+        drifted += len(_reconcile_chunk(chunk))
+        last_id = chunk[-1]
+    if drifted:
+        logger.info("Reconciled task counters of %d drifted projects", drifted)
+    return drifted
+
+
+def project_stats(project):
+    """Dashboard counters of ``project``, read from the denormalized rows."""
+    stats = ProjectStats.objects.filter(project=project).first()
+    if stats is None:  # Predates the counters or was never reconciled
+        reconcile([project.pk])
+        stats = ProjectStats.objects.get(project=project)
+    counters = list(
+        ProjectStatusCount.objects.filter(project=project)
+        .select_related("status")
+        .order_by("status__order", "status_id")
+    )
+    done_ids = set(
+        pick_done_status_ids(
+            [(counter.status_id, counter.status.is_done) for counter in reversed(counters)]
+        )
+    )
+    done_count = sum(c.count for c in counters if c.status_id in done_ids)
+    return {
+        "project": project.pk,
+        "task_count": stats.task_count,
+        "open_count": stats.task_count - done_count,
+        "done_count": done_count,
+        "overdue_count": stats.overdue_count,
+        "unassigned_count": stats.unassigned_count,
+        "no_status_count": stats.no_status_count,
+        "by_priority": {
+            priority: getattr(stats, field) for priority, field in PRIORITY_FIELDS.items()
+        },
+        "by_status": [
+            {
+                "status": TaskStatusSerializer(counter.status).data,
+                "task_count": counter.count,
+            }
+            for counter in counters
+        ],
+        "reconciled_at": stats.reconciled_at,
+    }
@@ -0,0 +1,25 @@
+from celery import shared_task
+from . import export, reports, stats
+
+
+@shared_task
+def snapshot_sprints():
+    """Nightly snapshot of every active sprint, including ones with no changes."""
+    return reports.snapshot_active_sprints()
+
+
+@shared_task
+def reconcile_project_stats():
+    """Recount the denormalized project counters to correct any drift."""
+    return stats.reconcile()
+
+
+@shared_task
+def export_project_tasks(export_id):
+    """Write a queued project export to a compressed file."""
+    return export.write_export(export_id)
+
+
+@shared_task
+def expire_project_exports():
+    return export.expire_exports()
@@ -1,3 +1,528 @@
-from django.test import TestCase
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from jwt_auth.models import CustomUser
+from tasks.models import Task
+from .models import (
+    Project,
+    ProjectExport,
+    ProjectStats,
+    Sprint,
+    SprintSnapshot,
+    TaskStatus,
+)
+from . import export, reports, stats
+from .permissions import IsProjectOwnerOrMember
+from .visibility import filter_visible, visible_project_ids
 
-# Create your tests here.
+
+class ProjectVisibilityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.member = CustomUser.objects.create_user(
+            email="member@example.com", password="S3cure-pass-123"
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Board", owner=self.owner)
+
+    def test_visible_ids_are_cached(self):
+        self.assertEqual(visible_project_ids(self.owner), {self.project.pk})
+        with self.assertNumQueries(0):
+            visible_project_ids(self.owner)
+
+    def test_membership_changes_invalidate(self):
+        self.assertEqual(visible_project_ids(self.member), frozenset())
+        self.project.members.add(self.member)
+        self.assertEqual(visible_project_ids(self.member), {self.project.pk})
+        self.project.members.clear()
+        self.assertEqual(visible_project_ids(self.member), frozenset())
+        self.member.projects.add(self.project)
+        self.assertEqual(visible_project_ids(self.member), {self.project.pk})
+
+    def test_ownership_change_invalidates_both_owners(self):
+        visible_project_ids(self.owner)
+        visible_project_ids(self.member)
+        project = Project.objects.get(pk=self.project.pk)
+        project.owner = self.member
+        project.save()
+        self.assertEqual(visible_project_ids(self.owner), frozenset())
+        self.assertEqual(visible_project_ids(self.member), {self.project.pk})
+
+    def test_filter_visible_avoids_distinct(self):
+        self.project.members.add(self.owner)
+        queryset = filter_visible(Project.objects.all(), self.owner)
+        self.assertNotIn("DISTINCT", str(queryset.query))
+        self.assertEqual(list(queryset), [self.project])
+
+
+class ProjectMembersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.users = [
+            CustomUser.objects.create_user(
+                email=f"user{i}@example.com", password="S3cure-pass-123"
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.project = Project.objects.create(name="Board", owner=self.owner)
+        self.project.members.add(self.users[0])
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/v1/projects/{self.project.pk}/members/"
+
+    def test_patching_member_emails_recounts(self):
+        response = self.client.patch(
+            f"/api/v1/projects/{self.project.pk}/",
+            {"member_emails": ["user1@example.com", "user2@example.com"]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["member_count"], 2)
+        response = self.client.patch(
+            f"/api/v1/projects/{self.project.pk}/", {"member_emails": []}, format="json"
+        )
+        self.assertEqual((response.data["member_count"], response.data["members"]), (0, []))
+
+    def test_add_and_remove_touch_only_changes(self):
+        emails = ["user0@example.com", "user1@example.com"]
+        response = self.client.post(self.url, {"emails": emails}, format="json")
+        self.assertEqual(response.data, {"added": 1, "member_count": 2})
+        self.assertEqual(visible_project_ids(self.users[1]), {self.project.pk})
+
+        emails = ["user1@example.com", "user2@example.com"]
+        response = self.client.delete(self.url, {"emails": emails}, format="json")
+        self.assertEqual(response.data, {"removed": 1, "member_count": 1})
+        response = self.client.post(
+            self.url, {"emails": ["nobody@example.com"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(self.users[0])
+        response = self.client.post(
+            self.url, {"emails": ["user2@example.com"]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_members_are_paginated_and_counted_in_lists(self):
+        self.project.members.add(*self.users[1:])
+        response = self.client.get(self.url, {"pagination": "cursor"})
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertEqual(response.data["results"][0]["email"], "user0@example.com")
+        response = self.client.get("/api/v1/projects/")
+        project = response.data["results"][0]
+        self.assertNotIn("members", project)
+        self.assertEqual(project["member_count"], 3)
+
+
+@override_settings(PROJECT_EXPORT_CHUNK_SIZE=2)
+class ProjectExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.owner)
+        done = TaskStatus.objects.create(project=cls.project, name="Done", order=1)
+        for i in range(5):
+            Task.objects.create(
+                title=f"Task {i}",
+                description="line one\nline two",
+                project=cls.project,
+                created_by=cls.owner,
+                assigned_to=cls.owner if i % 2 else None,
+                status=done if i == 0 else None,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/v1/projects/{self.project.pk}/export/"
+
+    def test_streams_csv_with_joined_names_in_chunks(self):
+        # Visibility, the project, then three chunks of tasks.
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                self.url, {"format": "csv", "columns": "title,status,assignee"}
+            )
+            content = b"".join(response.streaming_content).decode()
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        lines = content.splitlines()
+        self.assertEqual(
+            lines[:3],
+            ["title,status,assignee", "Task 0,Done,", "Task 1,,owner@example.com"],
+        )
+        self.assertEqual(len(lines), 6)
+
+    def test_ndjson_and_column_validation(self):
+        response = self.client.get(
+            self.url, {"format": "ndjson", "columns": "id,title"}
+        )
+        content = b"".join(response.streaming_content)
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(rows[0].keys(), {"id", "title"})
+        self.assertEqual(len(rows), 5)
+        response = self.client.get(
+            self.url, {"format": "ndjson", "columns": "secret"}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {"format": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_job_writes_a_compressed_file(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        with override_settings(MEDIA_ROOT=media_root), mock.patch(
+            "projects.tasks.export_project_tasks.delay"
+        ) as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    self.url + "?format=csv&columns=id,description"
+                )
+            self.assertEqual(response.status_code, 202)
+            export_id = response.data["id"]
+            delay.assert_called_once_with(export_id)
+            self.assertEqual(export.write_export(export_id), "ready")
+            status_url = f"/api/v1/projects/{self.project.pk}/exports/{export_id}/"
+            data = self.client.get(status_url).data
+            self.assertEqual(data["row_count"], 5)
+            response = self.client.get(data["download_url"])
+            content = gzip.decompress(b"".join(response.streaming_content)).decode()
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn('"line one\nline two"', content)
+        self.assertEqual(ProjectExport.objects.get().status, "ready")
+        # A redelivered job finds the export already claimed.
+        self.assertIsNone(export.write_export(export_id))
+
+    def test_csv_cells_are_not_read_as_formulas(self):
+        Task.objects.create(
+            title="=HYPERLINK(1)", project=self.project, created_by=self.owner
+        )
+        response = self.client.get(self.url, {"format": "csv", "columns": "id,title"})
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn(",'=HYPERLINK(1)", content)
+        self.assertIn(",Task 0", content)
+
+
+class ProjectPermissionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.member = CustomUser.objects.create_user(
+            email="member@example.com", password="S3cure-pass-123"
+        )
+        cls.projects = [
+            Project.objects.create(name=f"Board {i}", owner=cls.owner)
+            for i in range(3)
+        ]
+        cls.projects[0].members.add(cls.member)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_roles_resolved_once_per_request(self):
+        request = RequestFactory().get("/")
+        request.user = self.member
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                IsProjectOwnerOrMember.filter_permitted(request, self.projects),
+                [self.projects[0]],
+            )
+            self.assertFalse(
+                IsProjectOwnerOrMember.filter_permitted(
+                    request, self.projects, write=True
+                )
+            )
+
+    def test_owner_can_edit_member_cannot(self):
+        permission = IsProjectOwnerOrMember()
+        for user, allowed in [(self.owner, True), (self.member, False)]:
+            request = RequestFactory().patch("/")
+            request.user = user
+            self.assertEqual(
+                permission.has_object_permission(request, None, self.projects[0]),
+                allowed,
+            )
+
+
+class ProjectBoardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.owner)
+        cls.todo = TaskStatus.objects.create(project=cls.project, name="To Do")
+        cls.done = TaskStatus.objects.create(project=cls.project, name="Done", order=1)
+        for i in range(5):
+            Task.objects.create(
+                title=f"Task {i}",
+                project=cls.project,
+                created_by=cls.owner,
+                status=cls.todo if i < 3 else cls.done,
+                story_points=2,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/v1/projects/{self.project.pk}/board/"
+
+    def test_columns_in_status_order_with_totals(self):
+        response = self.client.get(self.url, {"limit": 2})
+        columns = response.data["columns"]
+        self.assertEqual([c["status"]["name"] for c in columns], ["To Do", "Done"])
+        self.assertEqual([c["task_count"] for c in columns], [3, 2])
+        self.assertEqual([c["story_points"] for c in columns], [6, 4])
+        self.assertEqual([len(c["tasks"]) for c in columns], [2, 2])
+
+    def test_board_is_cached_until_a_task_changes(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as cached:
+            self.client.get(self.url)
+        self.assertFalse(any("tasks_task" in q["sql"] for q in cached))
+        task = Task.objects.filter(status=self.todo).first()
+        task.status = self.done
+        task.save()
+        columns = self.client.get(self.url).data["columns"]
+        self.assertEqual([c["task_count"] for c in columns], [2, 3])
+
+
+class ProjectStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Stats", owner=cls.owner)
+        cls.other = Project.objects.create(name="Other", owner=cls.owner)
+        cls.todo = TaskStatus.objects.create(project=cls.project, name="To Do")
+        cls.done = TaskStatus.objects.create(
+            project=cls.project, name="Done", order=1, is_done=True
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.url = f"/api/v1/projects/{self.project.pk}/stats/"
+
+    def create_task(self, title, **kwargs):
+        return Task.objects.create(
+            title=title, project=self.project, created_by=self.owner, **kwargs
+        )
+
+    def test_counters_follow_every_kind_of_write(self):
+        overdue = self.create_task(
+            "Late", status=self.todo, deadline=timezone.now() - timedelta(days=1)
+        )
+        moved = self.create_task("Moved", status=self.todo, assigned_to=self.owner)
+        Task.objects.bulk_create(
+            [
+                Task(title="Bulk", project=self.project, created_by=self.owner),
+                Task(title="Away", project=self.other, created_by=self.owner),
+            ]
+        )
+        moved.status = self.done
+        moved.priority = "high"
+        moved.save()
+        Task.objects.filter(title="Bulk").update(priority="low")
+        Task.objects.filter(title="Away").update(project=self.project)
+        Task.objects.get(title="Away").delete()
+
+        data = self.client.get(self.url).data
+        self.assertEqual(
+            (data["task_count"], data["open_count"], data["done_count"]), (3, 2, 1)
+        )
+        self.assertEqual(data["overdue_count"], 1)
+        self.assertEqual(data["unassigned_count"], 2)
+        self.assertEqual(data["no_status_count"], 1)
+        self.assertEqual(data["by_priority"], {"low": 1, "medium": 1, "high": 1})
+        self.assertEqual([s["task_count"] for s in data["by_status"]], [1, 1])
+        # Completing the overdue task takes it off the overdue count.
+        overdue.status = self.done
+        overdue.save()
+        self.assertEqual(self.client.get(self.url).data["overdue_count"], 0)
+        self.assertEqual(stats.reconcile(), 0)
+
+    def test_reads_do_not_scale_with_tasks(self):
+        for i in range(20):
+            self.create_task(f"Task {i}", status=self.todo)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["task_count"], 20)
+        self.assertFalse(any("tasks_task" in q["sql"] for q in queries))
+
+    def test_deadlines_passing_between_reconciles_do_not_drift(self):
+        task = self.create_task(
+            "Soon", status=self.todo, deadline=timezone.now() + timedelta(hours=1)
+        )
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            task.status = self.done
+            task.save()
+        self.assertEqual(self.client.get(self.url).data["overdue_count"], 0)
+        self.assertEqual(stats.reconcile(), 0)
+
+    def test_counters_do_not_go_negative(self):
+        task = self.create_task("Task", status=self.todo)
+        ProjectStats.objects.filter(project=self.project).update(task_count=0)
+        task.delete()
+        self.assertEqual(self.client.get(self.url).data["task_count"], 0)
+
+    def test_reconcile_repairs_drift(self):
+        self.create_task("Task", status=self.todo)
+        ProjectStats.objects.filter(project=self.project).update(task_count=7)
+        self.assertEqual(stats.reconcile(chunk_size=1), 1)
+        self.assertEqual(self.client.get(self.url).data["task_count"], 1)
+
+
+class ProjectStatsTransactionTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_overdue_task_saved_outside_a_transaction(self):
+        owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        project = Project.objects.create(name="Stats", owner=owner)
+        todo = TaskStatus.objects.create(project=project, name="To Do")
+        TaskStatus.objects.create(project=project, name="Done", order=1, is_done=True)
+        locked_in_transaction = []
+        select_for_update = QuerySet.select_for_update
+
+        def record(queryset, *args, **kwargs):
+            locked_in_transaction.append(connection.in_atomic_block)
+            return select_for_update(queryset, *args, **kwargs)
+
+        # Saves send tasks_changed after the row is written, in autocommit.
+        with mock.patch.object(QuerySet, "select_for_update", record):
+            task = Task.objects.create(
+                title="Late",
+                project=project,
+                created_by=owner,
+                status=todo,
+                deadline=timezone.now() - timedelta(days=1),
+            )
+            task.priority = "high"
+            task.save()
+        self.assertEqual(locked_in_transaction, [True, True])
+        self.assertEqual(ProjectStats.objects.get(project=project).overdue_count, 1)
+
+
+class SprintReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.owner)
+        cls.todo = TaskStatus.objects.create(project=cls.project, name="To Do")
+        cls.done = TaskStatus.objects.create(
+            project=cls.project, name="Done", order=1, is_done=True
+        )
+        today = timezone.localdate()
+        cls.sprint = Sprint.objects.create(
+            project=cls.project,
+            name="Sprint 1",
+            start_date=today - timedelta(days=3),
+            end_date=today + timedelta(days=3),
+        )
+        for i, (task_status, points) in enumerate([(cls.todo, 5), (cls.done, 3)]):
+            Task.objects.create(
+                title=f"Task {i}",
+                project=cls.project,
+                created_by=cls.owner,
+                sprint=cls.sprint,
+                status=task_status,
+                story_points=points,
+                estimated_hours=4,
+                actual_hours=6,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def totals(self):
+        snapshot = SprintSnapshot.objects.get(sprint=self.sprint)
+        return (
+            snapshot.task_count,
+            snapshot.completed_count,
+            snapshot.completed_points,
+            snapshot.remaining_points,
+            snapshot.actual_hours,
+        )
+
+    def test_task_changes_move_todays_snapshot(self):
+        reports.snapshot_sprint(self.sprint)
+        task = Task.objects.get(title="Task 0")
+        task.status = self.done
+        task.actual_hours = 8
+        task.save()
+        Task.objects.filter(title="Task 1").update(story_points=1)
+        self.assertEqual(self.totals(), (2, 2, 6, 0, 14))
+        reports.snapshot_sprint(self.sprint)
+        self.assertEqual(self.totals(), (2, 2, 6, 0, 14))
+
+    def test_first_change_of_the_day_snapshots_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.filter(title="Task 0").update(status=self.done)
+        self.assertEqual(self.totals(), (2, 2, 8, 0, 12))
+
+    def test_other_changes_leave_snapshots_alone(self):
+        reports.snapshot_sprint(self.sprint)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                Task.objects.filter(title="Task 0").update(title="Renamed")
+        self.assertFalse(any("sprintsnapshot" in q["sql"] for q in queries))
+
+    def test_snapshot_totals(self):
+        snapshot = reports.snapshot_sprint(self.sprint)
+        self.assertEqual(
+            (snapshot.total_points, snapshot.completed_points, snapshot.remaining_points),
+            (8, 3, 5),
+        )
+        self.assertEqual((snapshot.estimated_hours, snapshot.actual_hours), (8, 12))
+
+    def test_reports_read_snapshots(self):
+        self.assertEqual(reports.snapshot_active_sprints([self.project.pk]), 1)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        base = f"/api/v1/projects/{self.project.pk}"
+        with CaptureQueriesContext(connection) as queries:
+            days = client.get(f"{base}/sprints/{self.sprint.pk}/burndown/").data["days"]
+        self.assertFalse(any("tasks_" in q["sql"] for q in queries))
+        self.assertEqual([day["remaining_points"] for day in days], [5])
+        velocity = client.get(f"{base}/velocity/").data
+        self.assertEqual(velocity[0]["completed_points"], 3)
+        accuracy = client.get(f"{base}/estimate-accuracy/").data
+        self.assertEqual(accuracy[0]["accuracy"], 1.5)
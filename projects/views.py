@@ -1,28 +1,105 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import content_disposition_header
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
-from .models import Project, TaskStatus, Sprint
-from .serializers import ProjectSerializer, TaskStatusSerializer, SprintSerializer
-from .permissions import IsProjectOwnerOrMember
+from task_manager.conditional import (
+    make_etag,
+    stamp_datetime,
+    stamp_key,
+    version_stamps,
+)
+from task_manager.response_cache import CachedResponseMixin
+from task_manager.pagination import IdPagination, UpdatedAtPagination
+from jwt_auth.serializers import UserSerializer
+from .visibility import filter_visible, visible_project_ids
+from .board import project_board
+from .stats import project_stats
+from tasks import downloads
+from . import export, reports
+from .members import UnknownEmails, add_members, member_count, remove_members
+from .models import Project, ProjectExport, TaskStatus, Sprint
+from .serializers import (
+    ProjectExportSerializer,
+    ProjectListSerializer,
+    ProjectMembersSerializer,
+    ProjectSerializer,
+    TaskStatusSerializer,
+    SprintSerializer,
+    SprintSnapshotSerializer,
+)
+from .permissions import IsProjectOwnerOrMember, has_project_access
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """Viewset for Project CRUD operations."""
 
     queryset = Project.objects.select_related("owner").prefetch_related("members")
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsProjectOwnerOrMember]
+    pagination_class = UpdatedAtPagination
+    cache_metrics_name = "projects"
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ProjectListSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
         user = self.request.user
-        if user.is_authenticated:
-            return Project.objects.filter(
-                models.Q(owner=user) | models.Q(members=user)
-            ).distinct().select_related("owner").prefetch_related("members")
-        return Project.objects.none()
+        if not user.is_authenticated:
+            return Project.objects.none()
+        queryset = Project.objects.select_related("owner").annotate(
+            member_count=member_count()
+        )
+        if self.action in ("retrieve", "update", "partial_update"):
+            queryset = queryset.prefetch_related("members")
+        return filter_visible(queryset, user)
+
+    def get_list_validators(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        # Projects render the names of their owner (and members on detail).
+        stamps = version_stamps(
+            [
+                stamp_key("users"),
+                *(
+                    stamp_key("project", project_id)
+                    for project_id in sorted(visible_project_ids(user))
+                ),
+            ]
+        )
+        # The stamp keys name the visible projects, so users who see the same
+        # projects share validators (and cached responses).
+        etag = make_etag(
+            "projects", self.request.get_full_path(), sorted(stamps.items())
+        )
+        return etag, stamp_datetime(max(stamps.values(), default=0))
+
+    def get_object_validators(self):
+        user = self.request.user
+        try:
+            pk = int(self.kwargs["pk"])
+        except ValueError:
+            return None
+        if not user.is_authenticated or pk not in visible_project_ids(user):
+            return None
+        keys = [stamp_key("project", pk), stamp_key("users")]
+        stamps = version_stamps(keys)
+        etag = make_etag("project", pk, [stamps[key] for key in keys])
+        return etag, stamp_datetime(max(stamps.values()))
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= on /export/ picks the file format, not a renderer.
+        return super().perform_content_negotiation(
+            request, force=force or self.action == "export_tasks"
+        )
 
     def perform_create(self, serializer):
         """Set owner to current user."""
@@ -31,7 +108,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], serializer_class=TaskStatusSerializer)
     def add_status(self, request, pk=None):
         project = self.get_object()
-        if project.owner != request.user and not request.user.is_staff:
+        if not has_project_access(request, project.pk, write=True):
             return Response(
                 {"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN
             )
@@ -44,7 +121,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["post"], serializer_class=SprintSerializer)
     def add_sprint(self, request, pk=None):
         project = self.get_object()
-        if project.owner != request.user and not request.user.is_staff:
+        if not has_project_access(request, project.pk, write=True):
             return Response(
                 {"detail": "Not authorized"}, status=status.HTTP_403_FORBIDDEN
             )
@@ -53,3 +130,198 @@ class ProjectViewSet(viewsets.ModelViewSet):
             serializer.save(project=project)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(
+        detail=True,
+        methods=["get", "post", "delete"],
+        serializer_class=ProjectMembersSerializer,
+        pagination_class=IdPagination,
+    )
+    def members(self, request, pk=None):
+        """List members page by page (GET), or add/remove them by email.
+
+        POST and DELETE take ``{"emails": [...]}`` and touch only the users
+        whose membership changes.
+        """
+        project = self.get_object()
+        if request.method == "GET":
+            page = self.paginate_queryset(project.members.order_by("id"))
+            return self.get_paginated_response(UserSerializer(page, many=True).data)
+        serializer = ProjectMembersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        change = add_members if request.method == "POST" else remove_members
+        try:
+            changed = change(project, serializer.validated_data["emails"])
+        except UnknownEmails as e:
+            return Response(
+                {"emails": f"Users with these emails not found: {', '.join(e.emails)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        key = "added" if request.method == "POST" else "removed"
+        return Response({key: changed, "member_count": project.members.count()})
+
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        url_path="export",
+        serializer_class=ProjectExportSerializer,
+    )
+    def export_tasks(self, request, pk=None):
+        """Tasks as ?format=csv|ndjson, limited to ?columns=a,b,...
+
+        GET streams the file; POST queues a job that writes it compressed and
+        returns the export to poll until its ``download_url`` is set.
+        """
+        # Exporting only reads the project, so members may queue one too.
+        project = get_object_or_404(self.get_queryset(), pk=pk)
+        try:
+            format, columns = export.parse_request(
+                request.query_params.get("format", "csv"),
+                request.query_params.get("columns"),
+            )
+        except export.ExportError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.method == "POST":
+            from .tasks import export_project_tasks
+
+            job = ProjectExport.objects.create(
+                project=project,
+                requested_by=request.user,
+                format=format,
+                columns=columns,
+            )
+            transaction.on_commit(lambda: export_project_tasks.delay(str(job.pk)))
+            return Response(
+                ProjectExportSerializer(job, context={"request": request}).data,
+                status=status.HTTP_202_ACCEPTED,
+            )
+        response = StreamingHttpResponse(
+            export.render(export.row_chunks(project.pk, columns), format, columns),
+            content_type=export.content_type(format),
+        )
+        response["Content-Disposition"] = content_disposition_header(
+            True, export.filename(project.pk, format)
+        )
+        return response
+
+    def get_export(self, pk, export_id):
+        project = get_object_or_404(self.get_queryset(), pk=pk)
+        return get_object_or_404(ProjectExport, pk=export_id, project=project)
+
+    @action(
+        detail=True, methods=["get"], url_path=r"exports/(?P<export_id>[0-9a-f-]+)"
+    )
+    def export_status(self, request, pk=None, export_id=None):
+        export_job = self.get_export(pk, export_id)
+        return Response(
+            ProjectExportSerializer(export_job, context={"request": request}).data
+        )
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"exports/(?P<export_id>[0-9a-f-]+)/download",
+    )
+    def download_export(self, request, pk=None, export_id=None):
+        export_job = self.get_export(pk, export_id)
+        if export_job.status != "ready":
+            return Response(
+                {"detail": "The export is not ready"}, status=status.HTTP_409_CONFLICT
+            )
+        return downloads.serve_file(
+            request,
+            export_job.file,
+            export.filename(export_job.project_id, export_job.format) + ".gz",
+            make_etag("export", export_job.pk),
+            last_modified=int(export_job.finished_at.timestamp()),
+        )
+
+    @action(detail=True, methods=["get"])
+    def board(self, request, pk=None):
+        """Kanban board: every status column with its top tasks and totals."""
+        project = self.get_object()
+        try:
+            limit = int(
+                request.query_params.get("limit", settings.PROJECT_BOARD_COLUMN_SIZE)
+            )
+        except ValueError:
+            return Response(
+                {"limit": "Must be an integer"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.PROJECT_BOARD_MAX_COLUMN_SIZE))
+        return Response(project_board(project, limit))
+
+    @action(detail=True, methods=["get"])
+    def stats(self, request, pk=None):
+        """Task counters for dashboards: totals, open, overdue, per priority and status."""
+        return Response(project_stats(self.get_object()))
+
+    def _sprint_count(self, request):
+        try:
+            count = int(request.query_params.get("sprints", 5))
+        except ValueError:
+            count = 5
+        return max(1, min(count, 50))
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"sprints/(?P<sprint_id>\d+)/burndown",
+    )
+    def burndown(self, request, pk=None, sprint_id=None):
+        """Daily remaining/completed points and hours for one sprint."""
+        project = self.get_object()
+        try:
+            sprint = Sprint.objects.get(pk=sprint_id, project=project)
+        except Sprint.DoesNotExist:
+            return Response(
+                {"detail": "Sprint not found"}, status=status.HTTP_404_NOT_FOUND
+            )
+        snapshots = sprint.snapshots.filter(
+            date__gte=sprint.start_date, date__lte=sprint.end_date
+        )
+        return Response(
+            {
+                "sprint": SprintSerializer(sprint).data,
+                "days": SprintSnapshotSerializer(snapshots, many=True).data,
+            }
+        )
+
+    @action(detail=True, methods=["get"])
+    def velocity(self, request, pk=None):
+        """Completed vs committed story points over the last ?sprints=N sprints."""
+        project = self.get_object()
+        sprints = reports.recent_sprints(project, self._sprint_count(request))
+        latest = reports.latest_snapshots(sprints)
+        data = []
+        for sprint in sprints:
+            snapshot = latest.get(sprint.pk)
+            data.append(
+                {
+                    "sprint": SprintSerializer(sprint).data,
+                    "total_points": snapshot.total_points if snapshot else None,
+                    "completed_points": snapshot.completed_points if snapshot else None,
+                }
+            )
+        return Response(data)
+
+    @action(detail=True, methods=["get"], url_path="estimate-accuracy")
+    def estimate_accuracy(self, request, pk=None):
+        """Estimated vs actual hours over the last ?sprints=N sprints."""
+        project = self.get_object()
+        sprints = reports.recent_sprints(project, self._sprint_count(request))
+        latest = reports.latest_snapshots(sprints)
+        data = []
+        for sprint in sprints:
+            snapshot = latest.get(sprint.pk)
+            estimated = snapshot.estimated_hours if snapshot else None
+            actual = snapshot.actual_hours if snapshot else None
+            data.append(
+                {
+                    "sprint": SprintSerializer(sprint).data,
+                    "estimated_hours": estimated,
+                    "actual_hours": actual,
+                    "accuracy": round(actual / estimated, 3) if estimated else None,
+                }
+            )
+        return Response(data)
@@ -0,0 +1,72 @@
+"""Cached lookup of the projects a user may see and their role in each.
+
+Visibility is "owner or member". Resolving it with ``Q(owner=user) |
+Q(members=user)`` joins the M2M table and needs ``DISTINCT``; instead the
+user's roles are computed once with a ``UNION`` of two index-only lookups,
+cached per user, and querysets filter with ``IN`` (or an equivalent subquery
+for very large sets).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Value
+from .models import Project
+
+OWNER = "owner"
+MEMBER = "member"
+
+# Above this many IDs an IN list is larger than the subquery it replaces.
+MAX_INLINE_PROJECT_IDS = 1000
+
+
+def _cache_key(user_id):
+    return f"projects:roles:{user_id}"
+
+
+def _roles_query(user_id):
+    owned = Project.objects.filter(owner_id=user_id).values_list("id", Value(OWNER))
+    member_of = Project.members.through.objects.filter(
+        customuser_id=user_id
+    ).values_list("project_id", Value(MEMBER))
+    return owned.order_by().union(member_of.order_by(), all=True)
+
+
+def project_roles(user):
+    """Return ``{project_id: OWNER | MEMBER}`` for every project the user can see."""
+    key = _cache_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = {}
+        for project_id, role in _roles_query(user.pk):
+            if roles.get(project_id) != OWNER:
+                roles[project_id] = role
+        cache.set(key, roles, settings.PROJECT_VISIBILITY_CACHE_TTL)
+    return roles
+
+
+def visible_project_ids(user):
+    """Return the frozenset of project IDs the user owns or is a member of."""
+    return frozenset(project_roles(user))
+
+
+def invalidate_visible_projects(*user_ids):
+    """Drop cached visibility and roles for the given users."""
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids if user_id])
+
+
+def filter_visible(queryset, user, project_field=None):
+    """Restrict ``queryset`` to rows in projects visible to ``user``.
+
+    ``project_field`` names the FK to Project (e.g. ``"project"`` for tasks);
+    leave it unset when filtering Project itself.
+    """
+    lookup = f"{project_field}_id__in" if project_field else "pk__in"
+    project_ids = visible_project_ids(user)
+    if len(project_ids) > MAX_INLINE_PROJECT_IDS:
+        owned = Project.objects.filter(owner_id=user.pk).values("id")
+        member_of = Project.members.through.objects.filter(
+            customuser_id=user.pk
+        ).values("project_id")
+        # Two semi-joins rather than one OR-join, so no DISTINCT is needed.
+        return queryset.filter(Q(**{lookup: owned}) | Q(**{lookup: member_of}))
+    return queryset.filter(**{lookup: project_ids})
@@ -0,0 +1,157 @@
+"""Conditional requests (ETag / Last-Modified / If-Match) from version stamps.
+
+A version stamp is the time, in nanoseconds, at which something last changed,
+kept in the cache under a ``versions:<kind>:<id>`` key and bumped by the model
+signals. Validators are built from stamps (plus a cheap row lookup for single
+objects) before the queryset is evaluated, so an unchanged resource is
+answered with 304 without being loaded or serialized.
+
+A stamp missing from the cache (never set or evicted) is created with the
+current time, so losing one can only cause a spurious miss, never a stale 304.
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+# Stamps never expire on their own; every write that matters bumps them.
+STAMP_TIMEOUT = None
+
+
+def stamp_key(kind, pk=None):
+    """Cache key of a stamp. Kinds in use:
+
+    * ``project``: a project's own fields and members (``projects`` for all).
+    * ``project-tasks``: the tasks of a project and what they render: statuses,
+      sprints, comments, attachments (``tasks`` for all projects).
+    * ``task``: the comments and attachments of one task.
+    * ``user``: a user's own fields, for cached authentication (``users``
+      for the user list).
+    """
+    return f"versions:{kind}" if pk is None else f"versions:{kind}:{pk}"
+
+
+def version_stamps(keys):
+    """Return ``{key: stamp}``, creating stamps that are not cached yet."""
+    keys = list(keys)
+    stamps = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, STAMP_TIMEOUT)
+        stamps.update(missing)
+    return stamps
+
+
+def bump(keys):
+    """Mark ``keys`` as changed now and again once the transaction commits.
+
+    The second bump keeps readers that raced the commit from caching the old
+    data under the new stamp.
+    """
+    keys = list(keys)
+    if not keys:
+        return
+
+    def set_stamps():
+        now = time.time_ns()
+        cache.set_many({key: now for key in keys}, STAMP_TIMEOUT)
+
+    set_stamps()
+    transaction.on_commit(set_stamps)
+
+
+def stamp_datetime(stamp):
+    return datetime.fromtimestamp(stamp / 1e9, tz=dt_timezone.utc)
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def _if_match_passes(header, etag):
+    # Compared weakly: GZipMiddleware weakens the ETags it sends to clients.
+    etags = parse_etags(header)
+    return "*" in etags or etag.removeprefix("W/") in {
+        tag.removeprefix("W/") for tag in etags
+    }
+
+
+class ConditionalViewSetMixin:
+    """ETag and Last-Modified on list/retrieve, If-Match on update/destroy.
+
+    Views implement ``get_list_validators`` and ``get_object_validators``,
+    returning ``(etag, last_modified)`` or ``None`` to skip the checks (e.g.
+    when the object does not exist, so the normal 404 path runs).
+    """
+
+    def get_list_validators(self):
+        return None
+
+    def get_object_validators(self):
+        return None
+
+    def _with_validators(self, response, validators):
+        if validators is not None and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        return response
+
+    def _conditional_read(self, request, validators, handler, *args, **kwargs):
+        if validators is not None:
+            etag, last_modified = validators
+            # HTTP dates have whole-second precision.
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=int(last_modified.timestamp())
+            )
+            if not_modified is not None:
+                return self._with_validators(not_modified, validators)
+        response = self.read_response(request, validators, handler, *args, **kwargs)
+        return self._with_validators(response, validators)
+
+    def read_response(self, request, validators, handler, *args, **kwargs):
+        """Produce the full response once the preconditions did not short-circuit."""
+        return handler(request, *args, **kwargs)
+
+    def _precondition_failed(self, request):
+        header = request.headers.get("If-Match")
+        if header is None:
+            return None
+        validators = self.get_object_validators()
+        if validators is not None and _if_match_passes(header, validators[0]):
+            return None
+        return Response(
+            {"detail": "The resource has changed since it was fetched (If-Match)."},
+            status=status.HTTP_412_PRECONDITION_FAILED,
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_read(
+            request, self.get_list_validators(), super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_read(
+            request, self.get_object_validators(), super().retrieve, *args, **kwargs
+        )
+
+    def update(self, request, *args, **kwargs):
+        failed = self._precondition_failed(request)
+        if failed is not None:
+            return failed
+        response = super().update(request, *args, **kwargs)
+        # Hand back the new ETag so the client can chain further writes.
+        return self._with_validators(response, self.get_object_validators())
+
+    def destroy(self, request, *args, **kwargs):
+        failed = self._precondition_failed(request)
+        if failed is not None:
+            return failed
+        return super().destroy(request, *args, **kwargs)
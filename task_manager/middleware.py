@@ -0,0 +1,14 @@
+from django.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """GZipMiddleware that leaves responses served by byte range alone.
+
+    Compressing them would change the bytes that Range and Content-Range
+    refer to.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header("Accept-Ranges"):
+            return response
+        return super().process_response(request, response)
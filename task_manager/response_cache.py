@@ -0,0 +1,116 @@
+"""Server-side cache of read responses, invalidated through version stamps.
+
+Entries are keyed by the response's ETag (see ``task_manager.conditional``),
+which already hashes the stamps of every project the response depends on
+and, for lists, the caller's set of visible projects. Bumping a project's
+stamp from the model signals therefore retires exactly the entries tagged
+with that project; stale entries are never read again and simply expire.
+
+Entries live in the ``RESPONSE_CACHE_ALIAS`` cache (Redis in production,
+locmem in tests). Hits and misses are counted per view for
+``/api/v1/metrics/response-cache/``.
+"""
+
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .conditional import ConditionalViewSetMixin
+
+# Views that count hits and misses, by metrics name.
+CACHED_VIEWS = set()
+
+_MISSING = object()
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _metric_key(name, outcome):
+    return f"response-cache:{outcome}:{name}"
+
+
+def _count(name, outcome):
+    cache = response_cache()
+    key = _metric_key(name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:  # First of its kind (or evicted)
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def metrics():
+    """Hits, misses and hit ratio per cached view."""
+    cache = response_cache()
+    keys = {
+        (name, outcome): _metric_key(name, outcome)
+        for name in sorted(CACHED_VIEWS)
+        for outcome in ("hits", "misses")
+    }
+    counts = cache.get_many(keys.values())
+    result = {}
+    for name in sorted(CACHED_VIEWS):
+        hits = counts.get(keys[(name, "hits")], 0)
+        misses = counts.get(keys[(name, "misses")], 0)
+        total = hits + misses
+        result[name] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": round(hits / total, 4) if total else None,
+        }
+    return result
+
+
+class CachedResponseMixin(ConditionalViewSetMixin):
+    """Serve list/retrieve from the response cache when the validators allow it.
+
+    Subclasses set ``cache_metrics_name``; responses are cached only when the
+    view supplies validators, i.e. when it can tell what they depend on.
+    """
+
+    cache_metrics_name = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cache_metrics_name:
+            CACHED_VIEWS.add(cls.cache_metrics_name)
+
+    def response_cache_key(self, request, etag):
+        # The absolute URI, because pagination links in the body include the host.
+        raw = "|".join(
+            [self.cache_metrics_name, self.action, request.build_absolute_uri(), etag]
+        )
+        return "response-cache:entry:" + hashlib.md5(
+            raw.encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def read_response(self, request, validators, handler, *args, **kwargs):
+        if validators is None:
+            return handler(request, *args, **kwargs)
+        cache = response_cache()
+        key = self.response_cache_key(request, validators[0])
+        data = cache.get(key, _MISSING)
+        if data is not _MISSING:
+            _count(self.cache_metrics_name, "hits")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+        _count(self.cache_metrics_name, "misses")
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.RESPONSE_CACHE_TTL)
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class ResponseCacheMetricsView(APIView):
+    """Response cache hit/miss counters per view (admins only)."""
+
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(metrics())
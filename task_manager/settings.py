@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
@@ -56,7 +57,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
-    "django.middleware.gzip.GZipMiddleware",
+    "task_manager.middleware.GZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -145,7 +146,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "jwt_auth.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -153,12 +154,19 @@ REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "task_manager.throttling.AnonSlidingWindowThrottle",
+        "task_manager.throttling.UserSlidingWindowThrottle",
+        "task_manager.throttling.ScopedSlidingWindowThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
         "user": "1000/day",
+        # Scopes set by views; see task_manager.throttling.
+        "login": "10/min",
+        "search": "60/min",
+        "user-search": "300/min",
+        "task-read": "600/min",
+        "task-write": "120/min",
     },
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -168,8 +176,132 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "jwt_auth.serializers.UserClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": (
+        "jwt_auth.serializers.CachedBlacklistTokenRefreshSerializer"
+    ),
+    "TOKEN_BLACKLIST_SERIALIZER": (
+        "jwt_auth.serializers.CachedBlacklistTokenBlacklistSerializer"
+    ),
 }
 
+# Expired outstanding/blacklisted token rows deleted per transaction by the
+# compact-jwt-tokens job.
+JWT_TOKEN_COMPACTION_CHUNK_SIZE = 5000
+
+# Users handled per chunk by import_users and /users/import/ (one existence
+# lookup and one bulk insert each), processes hashing their passwords, and
+# how many invalid rows an import response lists.
+USER_IMPORT_CHUNK_SIZE = 1000
+USER_IMPORT_WORKERS = config(
+    "USER_IMPORT_WORKERS", default=os.cpu_count() or 1, cast=int
+)
+USER_IMPORT_MAX_ERRORS = 100
+
+# Most users returned by /users/search/, and how long a result stays cached
+# (user and membership changes retire it sooner).
+USER_SEARCH_MAX_RESULTS = 10
+USER_SEARCH_CACHE_TTL = 60
+
+# Seconds an authenticated user's row stays cached; saving the user retires
+# the entry at once. With JWT_USER_FROM_CLAIMS, tokens issued at login carry
+# the user's fields and requests skip the cache lookup for the user row.
+JWT_USER_CACHE_TTL = 300
+JWT_USER_FROM_CLAIMS = config("JWT_USER_FROM_CLAIMS", default=False, cast=bool)
+
+# Process-local by default, so tests and development need no Redis. Production
+# sets CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and points
+# CACHE_LOCATION at a Redis database shared by every worker (and
+# RESPONSE_CACHE_LOCATION at another one for the response cache).
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="default"),
+    },
+    "responses": {
+        "BACKEND": config(
+            "RESPONSE_CACHE_BACKEND",
+            default=config(
+                "CACHE_BACKEND",
+                default="django.core.cache.backends.locmem.LocMemCache",
+            ),
+        ),
+        "LOCATION": config("RESPONSE_CACHE_LOCATION", default="responses"),
+    },
+}
+
+# Cache holding the throttles' per-client request counters; it must be shared
+# by every worker for the limits to hold across them.
+THROTTLE_CACHE_ALIAS = "default"
+
+# Cache holding the data of read responses from the task, project and user
+# endpoints, and how long an entry may live. Writes retire entries sooner by
+# bumping the version stamps their keys are built from.
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TTL = 300
+
+# Seconds a user's accessible project IDs stay cached; membership and
+# ownership changes invalidate the entry immediately.
+PROJECT_VISIBILITY_CACHE_TTL = 300
+
+# Tasks read per query by /projects/{id}/export/, and hours an export file
+# written by the export job is kept for download.
+PROJECT_EXPORT_CHUNK_SIZE = 2000
+PROJECT_EXPORT_EXPIRY_HOURS = 24
+
+# Emails resolved per query by the project member add/remove endpoints.
+PROJECT_MEMBER_BATCH_SIZE = 500
+
+# Cards returned per Kanban column by default / at most, and how long a
+# board stays cached (task and status changes invalidate it sooner).
+PROJECT_BOARD_COLUMN_SIZE = 20
+PROJECT_BOARD_MAX_COLUMN_SIZE = 100
+PROJECT_BOARD_CACHE_TTL = 300
+
+# Projects recounted per transaction by the project stats reconciliation job.
+PROJECT_STATS_RECONCILE_CHUNK_SIZE = 500
+
+# Upper bound on operations accepted by one /tasks/bulk/ request.
+TASK_BULK_MAX_OPERATIONS = 2000
+
+# Deepest parent_task level walked by /tasks/{id}/tree/ and the cycle checks.
+TASK_TREE_MAX_DEPTH = 50
+
+# /search/ page sizes, snippet length in characters, and rows per chunk
+# streamed by the reindex_search command.
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_SNIPPET_LENGTH = 160
+SEARCH_REINDEX_CHUNK_SIZE = 1000
+
+# Chunked attachment uploads: bytes per chunk (also the block size of the
+# content hash attachments are deduplicated by), the largest accepted file,
+# and hours an unfinished upload is kept before its chunks are discarded.
+# A chunk claimed by a request that died is released after the claim timeout.
+ATTACHMENT_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+ATTACHMENT_MAX_SIZE = 100 * 1024 * 1024
+ATTACHMENT_UPLOAD_EXPIRY_HOURS = 24
+ATTACHMENT_UPLOAD_CLAIM_TIMEOUT = 60 * 10
+
+# How authorized attachment downloads are delivered: "nginx" hands the file to
+# the proxy with X-Accel-Redirect (ATTACHMENT_ACCEL_REDIRECT_PREFIX must be an
+# internal location aliased to MEDIA_ROOT), "sendfile" uses X-Sendfile (Apache,
+# lighttpd), and "django" streams it in-process with Range support.
+ATTACHMENT_DOWNLOAD_BACKEND = config("ATTACHMENT_DOWNLOAD_BACKEND", default="django")
+ATTACHMENT_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+# Attachment content never changes, so clients may cache it this long.
+ATTACHMENT_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Attachment thumbnails: longest side in pixels, generations running at once
+# across all workers, seconds a job waits for a free slot, and how long a slot
+# stays claimed if its worker dies. PDF pages need the optional pypdfium2.
+THUMBNAIL_SIZE = 256
+THUMBNAIL_MAX_CONCURRENCY = 2
+THUMBNAIL_RETRY_SECONDS = 10
+THUMBNAIL_SLOT_TIMEOUT = 300
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
@@ -179,19 +311,62 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+# Use django.core.mail.backends.filebased.EmailBackend (with EMAIL_FILE_PATH)
+# or locmem.EmailBackend as a stand-in for SMTP in local runs.
+EMAIL_BACKEND = config(
+    "EMAIL_BACKEND", default="django.core.mail.backends.smtp.EmailBackend"
+)
+EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
 EMAIL_HOST = config("EMAIL_HOST", default="smtp.gmail.com")
 EMAIL_PORT = config("EMAIL_PORT", default=587, cast=int)
-EMAIL_UST_TLS = True
+EMAIL_USE_TLS = True
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = "Task Manager <no-reply@taskmanager.com>"
 
+# Email outbox worker (tasks.outbox): rows claimed per batch, claim lease,
+# send rate (messages/second) and retry policy with exponential backoff.
+EMAIL_OUTBOX_BATCH_SIZE = 200
+EMAIL_OUTBOX_LEASE_SECONDS = 300
+EMAIL_OUTBOX_RATE_LIMIT = 10
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 60
+
+# Due tasks fetched per query, and digests sent per SMTP batch, by
+# check_deadline_reminders. The lock keeps overlapping runs from doubling up.
+DEADLINE_REMINDER_CHUNK_SIZE = 500
+DEADLINE_REMINDER_BATCH_SIZE = 100
+DEADLINE_REMINDER_LOCK_TIMEOUT = 60 * 30
+
 CELERY_BEAT_SCHEDULE = {
     "check-deadline-reminders": {
         "task": "tasks.tasks.check_deadline_reminders",
         "schedule": crontab(hour=9, minute=0),  # Run daily at 9:00 am
-    }
+    },
+    "snapshot-sprints": {
+        "task": "projects.tasks.snapshot_sprints",
+        "schedule": crontab(hour=23, minute=50),  # Close out each sprint day
+    },
+    "reconcile-project-stats": {
+        "task": "projects.tasks.reconcile_project_stats",
+        "schedule": crontab(minute="*/15"),  # Also catches tasks going overdue
+    },
+    "expire-attachment-uploads": {
+        "task": "tasks.tasks.expire_attachment_uploads",
+        "schedule": crontab(minute=30),  # Hourly
+    },
+    "expire-project-exports": {
+        "task": "projects.tasks.expire_project_exports",
+        "schedule": crontab(minute=45),  # Hourly
+    },
+    "compact-jwt-tokens": {
+        "task": "jwt_auth.tasks.compact_expired_tokens",
+        "schedule": crontab(hour=3, minute=0),
+    },
+    "drain-email-outbox": {
+        "task": "tasks.tasks.drain_email_outbox",
+        "schedule": crontab(),  # Every minute, picks up retries
+    },
 }
 
 LOGGING = {
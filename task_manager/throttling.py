@@ -0,0 +1,127 @@
+"""Rate limits counted with sliding-window counters in a shared cache.
+
+DRF's throttles keep a list of request timestamps per client and rewrite it
+on every request, which grows with the rate and races between workers.
+Here each client and scope has one integer counter per fixed window, raised
+with the cache's atomic ``incr``. A request is admitted while the current
+window's count plus the previous window's, weighted by how much of it the
+sliding window still covers, stays within the rate.
+
+Counters live in the ``THROTTLE_CACHE_ALIAS`` cache (Redis in production).
+A closed window never changes again, so its count is read from the cache
+once per process and memoized; a request then costs one increment.
+
+Views pick their scope with ``throttle_scope``, overridden per action by a
+``throttle_scopes`` mapping of action names to scopes.
+"""
+
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    ScopedRateThrottle,
+    UserRateThrottle,
+)
+
+
+def throttle_cache():
+    return caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+def window_key(key, window):
+    return f"{key}:{window}"
+
+
+@lru_cache(maxsize=10_000)
+def closed_window_count(key):
+    """Count of a window that has ended; keys name the window, so never stale."""
+    return throttle_cache().get(key, 0)
+
+
+def increment(key, timeout):
+    cache = throttle_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)  # Another worker created it first
+
+
+class SlidingWindowMixin:
+    """Replaces the timestamp history of a ``SimpleRateThrottle`` with counters."""
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        window, offset = divmod(self.now, self.duration)
+        window = int(window)
+        self.elapsed = offset / self.duration
+        current_key = window_key(self.key, window)
+        # Kept for the whole next window, which still weighs this one.
+        self.current = increment(current_key, 2 * self.duration)
+        self.previous = closed_window_count(window_key(self.key, window - 1))
+        if self.estimate() <= self.num_requests:
+            return True
+        # Refused requests do not count against the client.
+        self.current -= 1
+        try:
+            throttle_cache().decr(current_key)
+        except ValueError:
+            pass  # Evicted meanwhile
+        return False
+
+    def estimate(self):
+        return self.previous * (1 - self.elapsed) + self.current
+
+    def wait(self):
+        remaining = (1 - self.elapsed) * self.duration
+        if self.current >= self.num_requests or not self.previous:
+            # Wait for the next window, which starts weighted by this one.
+            weight = 1 - (self.num_requests - 1) / max(self.current, 1)
+            return remaining + max(weight, 0) * self.duration
+        # Wait until enough of the previous window has slid out.
+        needed = 1 - (self.num_requests - 1 - self.current) / self.previous
+        return max(needed - self.elapsed, 0) * self.duration
+
+    def timer(self):
+        return time.time()
+
+
+class AnonSlidingWindowThrottle(SlidingWindowMixin, AnonRateThrottle):
+    """Limits anonymous clients by IP address (``anon`` rate)."""
+
+
+class UserSlidingWindowThrottle(SlidingWindowMixin, UserRateThrottle):
+    """Limits authenticated users by ID, others by IP address (``user`` rate)."""
+
+
+class ScopedSlidingWindowThrottle(SlidingWindowMixin, ScopedRateThrottle):
+    """Limits each view or action scope separately, at the rate named by the scope.
+
+    Views without a scope are not limited by this throttle.
+    """
+
+    def allow_request(self, request, view):
+        self.scope = self.get_scope(view)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return SlidingWindowMixin.allow_request(self, request, view)
+
+    def get_scope(self, view):
+        scopes = getattr(view, "throttle_scopes", {})
+        action = getattr(view, "action", None)
+        if action in scopes:
+            return scopes[action]
+        return getattr(view, self.scope_attr, None)
@@ -17,9 +17,8 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from .response_cache import ResponseCacheMetricsView
 
 prefix = "api/v1/"
 
@@ -28,10 +27,15 @@ urlpatterns = [
     path(prefix, include("jwt_auth.urls")),
     path(prefix, include("tasks.urls")),
     path(prefix, include("projects.urls")),
+    path(
+        f"{prefix}metrics/response-cache/",
+        ResponseCacheMetricsView.as_view(),
+        name="response-cache-metrics",
+    ),
     path("api/v1/schema", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/v1/docs/",
         SpectacularSwaggerView.as_view(url_name="schema"),
         name="swagger-ui",
     ),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
@@ -0,0 +1,270 @@
+"""Bulk create/update/delete of tasks in a single transaction.
+
+Every referenced project, status, sprint, parent task and assignee is loaded
+with one query per model before validation, uniqueness and parent cycles are
+checked for the whole batch at once, and writes go through
+``bulk_create``/``bulk_update`` so history rows and outbox emails are emitted
+in batches too.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from jwt_auth.models import CustomUser
+from projects.models import Project, TaskStatus, Sprint
+from projects.permissions import has_project_access
+from projects.visibility import filter_visible
+from .models import Task
+from .permissions import IsOwnerOrAdmin
+from .serializers import BulkTaskItemSerializer
+from .tasks import assignment_email
+from .outbox import enqueue_emails
+from .tree import CYCLE_ERROR, ancestor_parents, find_cycles
+
+RELATED_FIELDS = {
+    # payload key: (serializer source, model)
+    "project_id": ("project", Project),
+    "status_id": ("status", TaskStatus),
+    "sprint_id": ("sprint", Sprint),
+    "parent_task_id": ("parent_task", Task),
+}
+
+
+class BulkValidationError(Exception):
+    """Raised with per-item errors when any operation in a batch is invalid."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _coerce_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _preload_related(operations):
+    """Load every referenced object with one query per model."""
+    wanted = {key: set() for key in RELATED_FIELDS}
+    emails = set()
+    for op in operations:
+        data = op.get("data") or {}
+        for key in RELATED_FIELDS:
+            pk = _coerce_pk(data.get(key))
+            if pk is not None:
+                wanted[key].add(pk)
+        if data.get("assigned_to_email"):
+            emails.add(data["assigned_to_email"])
+    related_cache = {
+        source: model._base_manager.in_bulk(wanted[key]) if wanted[key] else {}
+        for key, (source, model) in RELATED_FIELDS.items()
+    }
+    users = {}
+    if emails:
+        users = {u.email: u for u in CustomUser.objects.filter(email__in=emails)}
+    return related_cache, users
+
+
+def _load_targets(request, operations):
+    """Load the tasks targeted by update/delete operations in one query."""
+    ids = {op["id"] for op in operations if op["action"] != "create"}
+    if not ids:
+        return {}
+    queryset = Task.objects.select_related("project")  # Rendered in assignment emails
+    if not request.user.is_staff:
+        queryset = filter_visible(queryset, request.user, project_field="project")
+    return queryset.in_bulk(ids)
+
+
+def _check_unique_titles(validated):
+    """Enforce (project, title) uniqueness for the whole batch in one query."""
+    touched_ids = {task.pk for _, _, task, _ in validated if task is not None}
+    final = {}
+    errors = {}
+    for index, _, task, data in validated:
+        if data is None:
+            continue
+        key = (
+            data["project"].pk if "project" in data else task.project_id,
+            data["title"] if "title" in data else task.title,
+        )
+        if key in final:
+            errors[index] = {"title": "Duplicate (project, title) within the batch"}
+        final[key] = index
+    if final:
+        clashes = (
+            Task.objects.filter(
+                project_id__in={project_id for project_id, _ in final},
+                title__in={title for _, title in final},
+            )
+            .exclude(pk__in=touched_ids)
+            .values_list("project_id", "title")
+        )
+        for key in clashes:
+            if key in final:
+                errors[final[key]] = {
+                    "title": "A task with this title already exists in the project"
+                }
+    return errors
+
+
+def _check_parent_cycles(validated):
+    """Reject parent changes that form a cycle once the whole batch is applied."""
+    moves = {
+        task.pk: data["parent_task"].pk if data["parent_task"] else None
+        for _, _, task, data in validated
+        if task is not None and data is not None and "parent_task" in data
+    }
+    if not moves:
+        return {}
+    cyclic = find_cycles(moves)
+    return {
+        index: {"parent_task_id": CYCLE_ERROR}
+        for index, _, task, _ in validated
+        if task is not None and task.pk in cyclic
+    }
+
+
+def _check_deleted_ancestors(validated):
+    """Reject writes to tasks that the batch's deletes remove by cascade.
+
+    Deletes run first, so an update to a subtask of a deleted task, or a
+    create under one, would otherwise reference a row that is gone.
+    """
+    deleted = {task.pk for _, op, task, _ in validated if op["action"] == "delete"}
+    if not deleted:
+        return {}
+    writes = []
+    for index, _, task, data in validated:
+        if data is None:
+            continue
+        if task is not None:
+            writes.append((index, task.pk, "id"))
+        elif data.get("parent_task") is not None:
+            writes.append((index, data["parent_task"].pk, "parent_task_id"))
+    # Cascades follow the parents stored now, whatever the batch moves.
+    parents = ancestor_parents({node for _, node, _ in writes})
+    errors = {}
+    for index, node, field in writes:
+        seen = set()
+        while node is not None and node not in seen:
+            if node in deleted:
+                errors[index] = {field: "Deleted with its parent in this batch"}
+                break
+            seen.add(node)
+            node = parents.get(node)
+    return errors
+
+
+def validate_operations(request, operations):
+    """Validate a whole batch.
+
+    Returns ``[(index, op, task, validated_data)]`` or raises
+    ``BulkValidationError`` listing every invalid item.
+    """
+    related_cache, users = _preload_related(operations)
+    targets = _load_targets(request, operations)
+    context = {"request": request, "related_cache": related_cache}
+    errors = {}
+    validated = []
+    seen_ids = set()
+
+    for index, op in enumerate(operations):
+        task = None
+        if op["action"] != "create":
+            task = targets.get(op["id"])
+            if task is None:
+                errors[index] = {"id": "Task not found"}
+                continue
+            if op["id"] in seen_ids:
+                errors[index] = {"id": "Task appears in more than one operation"}
+                continue
+            seen_ids.add(op["id"])
+            if not IsOwnerOrAdmin.has_task_access(request, task, write=True):
+                errors[index] = {"id": "Not authorized"}
+                continue
+        if op["action"] == "delete":
+            validated.append((index, op, task, None))
+            continue
+
+        serializer = BulkTaskItemSerializer(
+            task, data=op["data"], partial=task is not None, context=context
+        )
+        if not serializer.is_valid():
+            errors[index] = serializer.errors
+            continue
+        data = dict(serializer.validated_data)
+        email = data.pop("assigned_to_email", None)
+        if email:
+            if email not in users:
+                errors[index] = {"assigned_to_email": "User not found"}
+                continue
+            data["assigned_to"] = users[email]
+        moved = task is not None and "project" in data
+        if (task is None or moved) and not has_project_access(
+            request, data["project"].pk
+        ):
+            errors[index] = {"project_id": "Not authorized"}
+            continue
+        validated.append((index, op, task, data))
+
+    errors.update(_check_unique_titles(validated))
+    errors.update(_check_parent_cycles(validated))
+    errors.update(_check_deleted_ancestors(validated))
+    if errors:
+        raise BulkValidationError(
+            [{"index": index, "errors": errors[index]} for index in sorted(errors)]
+        )
+    return validated
+
+
+@transaction.atomic
+def apply_operations(request, validated):
+    """Apply validated operations; return per-item results in request order."""
+    user = request.user
+    now = timezone.now()
+    results = {}
+    assignments = []
+
+    deletes = [task.pk for _, op, task, _ in validated if op["action"] == "delete"]
+    if deletes:
+        Task.objects.filter(pk__in=deletes).delete()
+    for index, op, task, _ in validated:
+        if op["action"] == "delete":
+            results[index] = {"index": index, "id": task.pk, "status": "deleted"}
+
+    updated, update_fields = [], {"updated_at"}
+    for index, op, task, data in validated:
+        if op["action"] != "update":
+            continue
+        previous_assignee = task.assigned_to_id
+        for field, value in data.items():
+            setattr(task, field, value)
+            update_fields.add(field)
+        task.updated_at = now
+        task._request_user = user  # Attributed in the history rows
+        updated.append(task)
+        if task.assigned_to_id and task.assigned_to_id != previous_assignee:
+            assignments.append(task)
+        results[index] = {"index": index, "id": task.pk, "status": "updated"}
+    if updated:
+        Task.objects.bulk_update(updated, sorted(update_fields))
+
+    created = [
+        (index, Task(created_by=user, **data))
+        for index, op, _, data in validated
+        if op["action"] == "create"
+    ]
+    if created:
+        Task.objects.bulk_create([task for _, task in created])
+        for index, task in created:
+            if task.assigned_to_id:
+                assignments.append(task)
+            results[index] = {"index": index, "id": task.pk, "status": "created"}
+
+    if assignments:
+        enqueue_emails(
+            [assignment_email(task, task.assigned_to.email) for task in assignments]
+        )
+    return [results[index] for index in sorted(results)]
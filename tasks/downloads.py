@@ -0,0 +1,194 @@
+"""Attachment downloads, authorized here and served by the front proxy.
+
+Once the view has checked that the user can see the task, the response only
+names the file: ``X-Accel-Redirect`` for nginx or ``X-Sendfile`` for Apache
+and lighttpd, which then send the bytes (and answer Range requests) without
+holding a worker. The ``django`` backend, meant for local runs, streams the
+file in-process and handles a single byte range itself.
+
+Attachment content never changes, so responses carry a long-lived private
+Cache-Control and an ETag from the content hash.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+from task_manager.conditional import make_etag
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def attachment_etag(attachment):
+    if attachment.blob_id is not None:
+        return f'"{attachment.blob.digest}"'
+    # Files from before content addressing are never rewritten either.
+    return make_etag("attachment", attachment.pk, attachment.file.name)
+
+
+def attachment_filename(attachment):
+    return attachment.name or attachment.file.name.rsplit("/", 1)[-1]
+
+
+def serve_attachment(request, attachment):
+    """Return the response that delivers ``attachment`` to an authorized user."""
+    return serve_file(
+        request,
+        attachment.file,
+        attachment_filename(attachment),
+        attachment_etag(attachment),
+        int(attachment.uploaded_at.timestamp()),
+    )
+
+
+def serve_thumbnail(request, attachment):
+    """Deliver the thumbnail of ``attachment``, shown inline."""
+    thumbnail = attachment.blob.thumbnail
+    stem = os.path.splitext(attachment_filename(attachment))[0]
+    return serve_file(
+        request,
+        thumbnail,
+        f"{stem}.jpg",
+        # Regenerated thumbnails keep their name, so the ETag cannot rely on it.
+        make_etag("thumbnail", thumbnail.name, thumbnail.size),
+        as_attachment=False,
+    )
+
+
+def serve_file(request, file, filename, etag, last_modified=None, as_attachment=True):
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        backend = settings.ATTACHMENT_DOWNLOAD_BACKEND
+        path = _local_path(file) if backend == "sendfile" else None
+        download = (file, filename, as_attachment)
+        if backend == "nginx":
+            response = _offload(
+                *download,
+                "X-Accel-Redirect",
+                settings.ATTACHMENT_ACCEL_REDIRECT_PREFIX + quote(file.name),
+            )
+        elif path is not None:
+            response = _offload(*download, "X-Sendfile", path)
+        else:
+            response = _stream(request, *download, etag, last_modified)
+    if response.status_code in (200, 206, 304):
+        response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = (
+            f"private, max-age={settings.ATTACHMENT_CACHE_MAX_AGE}, immutable"
+        )
+    return response
+
+
+def _local_path(file):
+    try:
+        return file.path
+    except NotImplementedError:  # Remote storage: nothing for the proxy to send
+        return None
+
+
+def _content_type(filename):
+    content_type, encoding = mimetypes.guess_type(filename)
+    if encoding == "gzip":
+        return "application/gzip"  # Not text/csv for export.csv.gz
+    return content_type or "application/octet-stream"
+
+
+def _offload(file, filename, as_attachment, header, value):
+    # The proxy fills in the body, length and Range handling.
+    response = HttpResponse(content_type=_content_type(filename))
+    response[header] = value
+    response["Content-Disposition"] = content_disposition_header(
+        as_attachment, filename
+    )
+    return response
+
+
+def parse_range(header, size):
+    """Return the inclusive ``(start, end)`` of a single byte range.
+
+    ``None`` means the header should be ignored and the whole file sent, which
+    is also how multiple ranges are answered.
+    """
+    match = RANGE_RE.match(header.replace(" ", ""))
+    if match is None or match.group(0) == "bytes=-":
+        return None
+    first, last = match.groups()
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+
+class _RangeFile:
+    """Read at most ``length`` bytes of an open file from its current position."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _stream(request, file, filename, as_attachment, etag, last_modified):
+    size = file.size
+    header = request.headers.get("Range")
+    if_range = request.headers.get("If-Range")
+    # A client resuming a file that has since changed gets the whole file.
+    if header and if_range and if_range not in (
+        etag,
+        last_modified and http_date(last_modified),
+    ):
+        header = None
+    try:
+        byte_range = parse_range(header, size) if header else None
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    content = file.storage.open(file.name, "rb")
+    options = {
+        "as_attachment": as_attachment,
+        "filename": filename,
+        "content_type": _content_type(filename),
+    }
+    if byte_range is None:
+        response = FileResponse(content, **options)
+    else:
+        start, end = byte_range
+        content.seek(start)
+        response = FileResponse(
+            _RangeFile(content, end - start + 1), status=206, **options
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    # Also keeps GZipMiddleware from compressing the bytes the ranges refer to.
+    response["Accept-Ranges"] = "bytes"
+    return response
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from tasks import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of every task and comment."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, help="Rows read and written per batch"
+        )
+
+    def handle(self, *args, **options):
+        counts = {"tasks": 0, "comments": 0}
+        for counts in search.reindex(options["chunk_size"]):
+            self.stdout.write(
+                f"\rIndexed {counts['tasks']} tasks, {counts['comments']} comments",
+                ending="",
+            )
+            self.stdout.flush()
+        search.optimize_index()
+        self.stdout.write("")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Reindexed {counts['tasks']} tasks and {counts['comments']} comments"
+            )
+        )
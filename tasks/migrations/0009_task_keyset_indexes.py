@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-18 06:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_sprint_taskstatus'),
+        ('tasks', '0008_rename_fields_taskhistory_field'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['-updated_at', '-id'], name='tasks_task_updated_bb3434_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskhistory',
+            index=models.Index(fields=['task', '-changed_at', '-id'], name='tasks_taskh_task_id_edb9ce_idx'),
+        ),
+    ]
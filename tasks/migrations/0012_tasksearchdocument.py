@@ -0,0 +1,81 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:13
+"""Full-text index over task search documents: FTS5 on SQLite, FULLTEXT on MySQL.
+
+On MySQL, queries run in boolean mode as ``+term*``. Stopwords and terms
+shorter than ``ft_min_word_len`` (``innodb_ft_min_token_size`` for InnoDB)
+are silently dropped from both the index and the query, so searching for
+them cannot narrow the results.
+"""
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    """CREATE VIRTUAL TABLE tasks_tasksearchdocument_fts USING fts5(
+        title, body, content='tasks_tasksearchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER tasks_tasksearchdocument_ai AFTER INSERT ON tasks_tasksearchdocument BEGIN
+        INSERT INTO tasks_tasksearchdocument_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER tasks_tasksearchdocument_ad AFTER DELETE ON tasks_tasksearchdocument BEGIN
+        INSERT INTO tasks_tasksearchdocument_fts(tasks_tasksearchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER tasks_tasksearchdocument_au AFTER UPDATE ON tasks_tasksearchdocument BEGIN
+        INSERT INTO tasks_tasksearchdocument_fts(tasks_tasksearchdocument_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO tasks_tasksearchdocument_fts(rowid, title, body)
+        VALUES (new.id, new.title, new.body);
+    END""",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS tasks_tasksearchdocument_au",
+    "DROP TRIGGER IF EXISTS tasks_tasksearchdocument_ad",
+    "DROP TRIGGER IF EXISTS tasks_tasksearchdocument_ai",
+    "DROP TABLE IF EXISTS tasks_tasksearchdocument_fts",
+]
+MYSQL_INDEX = [
+    "ALTER TABLE tasks_tasksearchdocument"
+    " ADD FULLTEXT INDEX tasks_search_fulltext (title, body)",
+]
+MYSQL_DROP = [
+    "ALTER TABLE tasks_tasksearchdocument DROP INDEX tasks_search_fulltext",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('title', models.CharField(blank=True, max_length=250)),
+                ('body', models.TextField(blank=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['task'], name='tasks_tasks_task_id_9e7aab_idx')],
+            },
+        ),
+        # Other backends search with LIKE (see tasks.search).
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_INDEX, "mysql": MYSQL_INDEX}),
+            _run({"sqlite": SQLITE_DROP, "mysql": MYSQL_DROP}),
+        ),
+    ]
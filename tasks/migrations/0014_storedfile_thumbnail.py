@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0013_attachment_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnail',
+            field=models.FileField(blank=True, max_length=255, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='storedfile',
+            name='thumbnail_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('unavailable', 'Unavailable'), ('failed', 'Failed')], default='pending', max_length=12),
+        ),
+    ]
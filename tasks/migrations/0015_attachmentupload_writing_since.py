@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0014_storedfile_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attachmentupload',
+            name='writing_since',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,161 @@
 import os
-from django.db import models
+import uuid
+from django.db import models, transaction
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
 from jwt_auth.models import CustomUser
 from projects.models import Project, TaskStatus, Sprint
+from . import tracking
+
+
+class TaskQuerySet(models.QuerySet):
+    """QuerySet that records TaskHistory for bulk writes the save signals never see."""
+
+    def update(self, **kwargs):
+        """Update rows and write one history row per changed tracked field."""
+        return self.update_with_history(None, **kwargs)
+
+    def update_with_history(self, user, **kwargs):
+        # auto_now is not applied by update(); keep updated_at honest for
+        # the keyset pagination and conditional requests that rely on it.
+        kwargs.setdefault("updated_at", timezone.now())
+        attnames = tracking.tracked_attnames(self.model, kwargs)
+        if not attnames and not {"project", "project_id"} & kwargs.keys():
+            # Nothing recorded or counted changes, so skip the snapshot; the
+            # caches still need to hear about the projects involved.
+            project_ids = set(
+                self.order_by().values_list("project_id", flat=True).distinct()
+            )
+            updated = super().update(**kwargs)
+            if updated:
+                tracking.tasks_changed.send(
+                    sender=self.model, project_ids=project_ids, transitions=[]
+                )
+            return updated
+        columns = ["id", *tracking.STATE_COLUMNS]
+        columns += [col for col in attnames.values() if col not in columns]
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = {
+                row["id"]: row for row in self.order_by().values(*columns).iterator()
+            }
+            updated = super().update(**kwargs)
+            if not before:
+                return updated
+            project_ids = {row["project_id"] for row in before.values()}
+            # Re-read rather than trusting kwargs so F() expressions and
+            # field coercion are reflected in the recorded values.
+            after = (
+                self.model._base_manager.using(self.db)
+                .filter(pk__in=list(before))
+                .order_by()
+                .values(*columns)
+            )
+            diffs = {}
+            transitions = []
+            for row in after.iterator():
+                project_ids.add(row["project_id"])
+                old_row = before[row["id"]]
+                diffs[row["id"]] = tracking.diff(
+                    {name: old_row[col] for name, col in attnames.items()},
+                    {name: row[col] for name, col in attnames.items()},
+                )
+                transitions.append(
+                    (tracking.counted_state(old_row), tracking.counted_state(row))
+                )
+            history = [
+                entry
+                for task_id, changes in tracking.history_changes(
+                    self.model, diffs, self.db
+                ).items()
+                for entry in TaskHistory.from_changes(task_id, user, changes)
+            ]
+            TaskHistory.objects.using(self.db).bulk_create(history)
+        tracking.tasks_changed.send(
+            sender=self.model,
+            project_ids=project_ids,
+            transitions=transitions,
+            task_ids=set(before),
+            fields=set(attnames),
+        )
+        return updated
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """Bulk update tasks and record their history in a single insert."""
+        objs = list(objs)
+        diffs = {}
+        transitions = []
+        project_ids = set()
+        for obj in objs:
+            diffs[obj.pk] = obj.get_tracked_changes(fields)
+            transitions.append((obj.loaded_counted_state(), tracking.counted_state(obj)))
+            project_ids.update([obj.project_id, getattr(obj, "_loaded_project_id", None)])
+        rendered = tracking.history_changes(self.model, diffs, self.db)
+        history = [
+            entry
+            for obj in objs
+            for entry in TaskHistory.from_changes(
+                obj.pk, getattr(obj, "_request_user", None), rendered[obj.pk]
+            )
+        ]
+        # A plain QuerySet keeps Django's internal .update() calls from
+        # being tracked a second time.
+        plain = models.QuerySet(self.model, using=self.db)
+        with transaction.atomic(using=self.db, savepoint=False):
+            updated = plain.bulk_update(objs, fields, batch_size=batch_size)
+            TaskHistory.objects.using(self.db).bulk_create(history)
+        for obj in objs:
+            obj.snapshot_tracked_fields(fields)
+        project_ids.discard(None)
+        tracking.tasks_changed.send(
+            sender=self.model,
+            project_ids=project_ids,
+            transitions=transitions,
+            task_ids={obj.pk for obj in objs},
+            fields=set(tracking.tracked_attnames(self.model, fields)),
+        )
+        return updated
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False, **kwargs):
+        objs = list(objs)
+        existing = set()
+        if ignore_conflicts:
+            # Rows skipped as conflicts must not be taken for new ones below.
+            existing = {
+                (project_id, title) for project_id, title, _ in self._title_keys(objs)
+            }
+        objs = super().bulk_create(
+            objs, batch_size=batch_size, ignore_conflicts=ignore_conflicts, **kwargs
+        )
+        if any(obj.pk is None for obj in objs):
+            # e.g. MySQL: recover primary keys through (project, title).
+            ids = {
+                (project_id, title): pk
+                for project_id, title, pk in self._title_keys(objs)
+            }
+            for obj in objs:
+                key = (obj.project_id, obj.title)
+                if obj.pk is None and key not in existing:
+                    obj.pk = ids.get(key)
+                    existing.add(key)  # Later duplicates in the batch were skipped
+        created = [obj for obj in objs if obj.pk is not None]
+        for obj in created:
+            obj.snapshot_tracked_fields()
+        if created:
+            tracking.tasks_changed.send(
+                sender=self.model,
+                project_ids={obj.project_id for obj in created},
+                transitions=[(None, tracking.counted_state(obj)) for obj in created],
+                task_ids={obj.pk for obj in created},
+                fields=set(tracking.TRACKED_FIELDS),
+            )
+        return objs
+
+    def _title_keys(self, objs):
+        """``(project_id, title, id)`` of the stored tasks sharing a key with ``objs``."""
+        return self.model._base_manager.using(self.db).filter(
+            project_id__in={obj.project_id for obj in objs},
+            title__in={obj.title for obj in objs},
+        ).values_list("project_id", "title", "id")
 
 
 class Task(models.Model):
@@ -47,9 +200,64 @@ class Task(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_tracked_fields()
+        return instance
+
+    def snapshot_tracked_fields(self, fields=None):
+        """Remember tracked values as they are in the database right now."""
+        if fields is None or not hasattr(self, "_loaded_values"):
+            self._loaded_values = {}
+        self._loaded_values.update(tracking.snapshot(self, fields))
+        if fields is None or {"project", "project_id"} & set(fields):
+            # Not part of the history, but moves must reach both projects.
+            self._loaded_project_id = self.__dict__.get("project_id")
+
+    def get_tracked_changes(self, fields=None):
+        """Diff tracked fields against the loaded snapshot, as raw column values.
+
+        Only falls back to a query when the snapshot is missing values, e.g.
+        for instances built by hand or loaded with deferred fields.
+        """
+        if self.pk is None:
+            return {}
+        current = tracking.snapshot(self, fields)
+        loaded = getattr(self, "_loaded_values", {})
+        missing = [name for name in current if name not in loaded]
+        if missing:
+            attnames = tracking.tracked_attnames(type(self), missing)
+            row = (
+                type(self)._base_manager.db_manager(self._state.db)
+                .filter(pk=self.pk)
+                .values(*attnames.values())
+                .first()
+            )
+            if row is None:
+                return {}
+            loaded = {
+                **loaded,
+                **{name: row[attname] for name, attname in attnames.items()},
+            }
+            self._loaded_values = loaded
+        return tracking.diff(loaded, current)
+
+    def loaded_counted_state(self):
+        """Task state as of the snapshot, i.e. what the counters and sprint snapshots hold."""
+        state = tracking.counted_state(self)
+        loaded = getattr(self, "_loaded_values", {})
+        for name, attname in tracking.tracked_attnames(type(self)).items():
+            if attname in state and name in loaded:
+                state[attname] = loaded[name]
+        state["project_id"] = getattr(self, "_loaded_project_id", state["project_id"])
+        return state
+
     class Meta:
         ordering = ["-created_at"]
         unique_together = [("project", "title")]
@@ -60,6 +268,7 @@ class Task(models.Model):
             models.Index(fields=["status"]),
             models.Index(fields=["priority"]),
             models.Index(fields=["deadline"]),
+            models.Index(fields=["-updated_at", "-id"]),
         ]
 
 
@@ -85,36 +294,99 @@ class Comment(models.Model):
         ]
 
 
+ATTACHMENT_EXTENSIONS = ["pdf", "docx", "jpg", "png", "jpeg"]
+
+
 def task_attachment_path(instance, filename):
     """Generate file path for task attachments."""
     return f"attachments/task_{instance.task.id}/{filename}"
 
 
+class StoredFile(models.Model):
+    """Attachment content stored once per distinct content hash.
+
+    ``ref_count`` is the number of attachments pointing at the file; the
+    file is deleted when the last of them goes.
+    """
+
+    THUMBNAIL_STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("unavailable", "Unavailable"),  # Not an image, or no library to render it
+        ("failed", "Failed"),
+    ]
+
+    digest = models.CharField(max_length=64, unique=True)
+    file = models.FileField(max_length=255)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Derived from the content, so shared by every attachment of it.
+    thumbnail = models.FileField(max_length=255, blank=True)
+    thumbnail_status = models.CharField(
+        max_length=12, choices=THUMBNAIL_STATUS_CHOICES, default="pending"
+    )
+
+    def __str__(self):
+        return self.digest
+
+
 class Attachment(models.Model):
     """Model for task attachments."""
 
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="attachments")
+    # Names the content of ``blob`` for new attachments; older ones still
+    # point at a per-task copy and have no blob.
     file = models.FileField(
         upload_to=task_attachment_path,
-        validators=[
-            FileExtensionValidator(
-                allowed_extensions=["pdf", "docx", "jpg", "png", "jpeg"]
-            )
-        ],
+        validators=[FileExtensionValidator(allowed_extensions=ATTACHMENT_EXTENSIONS)],
+    )
+    blob = models.ForeignKey(
+        StoredFile,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="attachments",
     )
+    name = models.CharField(max_length=255, blank=True)
+    size = models.BigIntegerField(null=True, blank=True)
     uploaded_by = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, related_name="attachments"
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return os.path.basename(self.file.name)
+        return self.name or os.path.basename(self.file.name)
 
     class Meta:
         ordering = ["-uploaded_at"]
         indexes = [models.Index(fields=["task"]), models.Index(fields=["uploaded_by"])]
 
 
+class AttachmentUpload(models.Model):
+    """A chunked attachment upload in progress.
+
+    Chunks are written to storage as they arrive; ``chunk_digests`` holds the
+    SHA-256 of each one, so completing the upload needs no second pass.
+    ``writing_since`` marks the next chunk as claimed by a request streaming it.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="uploads")
+    uploaded_by = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="attachment_uploads"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    received = models.BigIntegerField(default=0)
+    chunk_digests = models.JSONField(default=list)
+    writing_since = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Upload of {self.filename} ({self.received}/{self.size} bytes)"
+
+
 class TaskHistory(models.Model):
     """Model to track changes to tasks."""
 
@@ -127,5 +399,95 @@ class TaskHistory(models.Model):
     new_value = models.TextField(blank=True, null=True)
     changed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=["task", "-changed_at", "-id"])]
+
     def __str__(self):
         return f"{self.field} changed on {self.task.title} at {self.changed_at}"
+
+    @classmethod
+    def from_changes(cls, task_id, user, changes):
+        """Build unsaved history rows for a diff rendered by ``tracking.history_changes``."""
+        return [
+            cls(
+                task_id=task_id,
+                user=user,
+                field=field,
+                old_value=old_value,
+                new_value=new_value,
+            )
+            for field, (old_value, new_value) in changes.items()
+        ]
+
+
+class DeadlineReminder(models.Model):
+    """Record of a deadline reminder already sent, so reruns skip it."""
+
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="deadline_reminders"
+    )
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="deadline_reminders"
+    )
+    deadline = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        # Keyed on the deadline too, so moving a deadline earns a new reminder.
+        unique_together = [("task", "user", "deadline")]
+
+    def __str__(self):
+        return f"Reminder for {self.task_id} sent to {self.user_id} at {self.sent_at}"
+
+
+class OutboundEmail(models.Model):
+    """An email waiting in (or delivered from) the outbox."""
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=250)
+    body = models.TextField()
+    from_email = models.CharField(max_length=250, default="no-reply@taskmanager.com")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    # When the message is next eligible for sending; while "sending" this is
+    # the claim lease, after which a crashed worker's batch is picked up again.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.status})"
+
+
+class TaskSearchDocument(models.Model):
+    """Searchable text of a task or one of its comments.
+
+    The text index itself lives in the database: a FULLTEXT index on MySQL
+    and an FTS5 table kept in sync by triggers on SQLite (see migrations).
+    """
+
+    # "task:<id>" or "comment:<id>"; the upsert target for incremental updates.
+    key = models.CharField(max_length=40, unique=True)
+    task = models.ForeignKey(
+        Task, on_delete=models.CASCADE, related_name="search_documents"
+    )
+    title = models.CharField(max_length=250, blank=True)
+    body = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["task"])]
+
+    def __str__(self):
+        return self.key
@@ -0,0 +1,141 @@
+"""Email outbox: enqueue inside requests, deliver in batches from a worker.
+
+Callers add rows to ``OutboundEmail`` (one INSERT, no SMTP work on the request
+path). ``drain`` claims due rows, merges messages going to the same recipient,
+and sends them over one SMTP connection at a bounded rate. Failures are retried
+with exponential backoff until ``EMAIL_OUTBOX_MAX_ATTEMPTS`` is reached.
+"""
+
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_emails(messages):
+    """Queue ``(subject, body, to_email)`` tuples and schedule a drain after commit."""
+    rows = OutboundEmail.objects.bulk_create(
+        [
+            OutboundEmail(subject=subject[:250], body=body, to_email=to_email)
+            for subject, body, to_email in messages
+        ]
+    )
+    if rows:
+        from .tasks import drain_email_outbox
+
+        transaction.on_commit(lambda: drain_email_outbox.delay())
+    return rows
+
+
+def enqueue_email(subject, body, to_email):
+    return enqueue_emails([(subject, body, to_email)])
+
+
+def _claim_batch(batch_size):
+    """Lease up to ``batch_size`` due messages to this worker."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status__in=["pending", "sending"], next_attempt_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[row.pk for row in batch]).update(
+                status="sending",
+                next_attempt_at=now
+                + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS),
+            )
+    return batch
+
+
+def _coalesce(rows):
+    """Merge rows per recipient: ``[(EmailMessage, [rows])]``."""
+    by_recipient = {}
+    for row in rows:
+        by_recipient.setdefault((row.to_email, row.from_email), []).append(row)
+    messages = []
+    for (to_email, from_email), group in by_recipient.items():
+        if len(group) == 1:
+            subject, body = group[0].subject, group[0].body
+        else:
+            subject = f"{len(group)} notifications from Task Manager"
+            body = "\n\n---\n\n".join(
+                f"{row.subject}\n\n{row.body}" for row in group
+            )
+        messages.append((EmailMessage(subject, body, from_email, [to_email]), group))
+    return messages
+
+
+def _record_failure(rows, error):
+    now = timezone.now()
+    for row in rows:
+        row.attempts += 1
+        row.last_error = str(error)[:1000]
+        if row.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            row.status = "failed"
+        else:
+            row.status = "pending"
+            backoff = settings.EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1)
+            row.next_attempt_at = now + timedelta(seconds=backoff)
+    OutboundEmail.objects.bulk_update(
+        rows, ["attempts", "last_error", "status", "next_attempt_at"]
+    )
+
+
+def drain(batch_size=None, max_batches=None):
+    """Send due outbox messages until the queue is empty; return throughput stats.
+
+    ``delivered`` counts outbox rows, ``emails`` the messages actually sent
+    after per-recipient coalescing.
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    interval = 1.0 / settings.EMAIL_OUTBOX_RATE_LIMIT
+    stats = {"delivered": 0, "emails": 0, "failed": 0}
+    started = next_slot = time.monotonic()
+    rows = _claim_batch(batch_size)
+    batches = 0
+    if rows:
+        # Only open an SMTP session when there is something to send.
+        with get_connection() as connection:
+            while rows:
+                batches += 1
+                sent_ids = []
+                for message, group in _coalesce(rows):
+                    # Never send faster than EMAIL_OUTBOX_RATE_LIMIT per second.
+                    delay = next_slot - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                    next_slot = max(next_slot, time.monotonic()) + interval
+                    try:
+                        connection.send_messages([message])
+                    except Exception as e:
+                        logger.warning("Outbox send to %s failed: %s", message.to, e)
+                        _record_failure(group, e)
+                        stats["failed"] += len(group)
+                        continue
+                    sent_ids.extend(row.pk for row in group)
+                    stats["emails"] += 1
+                if sent_ids:
+                    OutboundEmail.objects.filter(pk__in=sent_ids).update(
+                        status="sent",
+                        sent_at=timezone.now(),
+                        attempts=F("attempts") + 1,
+                    )
+                stats["delivered"] += len(sent_ids)
+                if max_batches is not None and batches >= max_batches:
+                    break
+                rows = _claim_batch(batch_size)
+    elapsed = time.monotonic() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["emails_per_second"] = round(stats["emails"] / elapsed, 2) if elapsed else 0
+    if stats["delivered"] or stats["failed"]:
+        logger.info("Email outbox drained: %s", stats)
+    return stats
@@ -1,19 +1,23 @@
 from rest_framework import permissions
+from projects.permissions import has_project_access
 
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     """Allow only task creator or admin to edit/delete"""
 
     def has_object_permission(self, request, view, obj):
-        if request.method in permissions.SAFE_METHODS:
-            return (
-                obj.created_by == request.user
-                or obj.project.owner == request.user
-                or obj.project.members.contains(request.user)
-                or request.user.is_staff
-            )
-        return (
-            obj.created_by == request.user
-            or obj.project.owner == request.user
-            or request.user.is_staff
+        return self.has_task_access(
+            request, obj, write=request.method not in permissions.SAFE_METHODS
         )
+
+    @staticmethod
+    def has_task_access(request, task, write=False):
+        """Creator, project owner or admin may edit; project members may also read."""
+        if task.created_by_id == request.user.pk:
+            return True
+        return has_project_access(request, task.project_id, write=write)
+
+    @classmethod
+    def filter_permitted(cls, request, tasks, write=False):
+        """Return the tasks the user may read (or edit), without per-object queries."""
+        return [task for task in tasks if cls.has_task_access(request, task, write=write)]
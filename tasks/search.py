@@ -0,0 +1,246 @@
+"""Full-text search over task titles, descriptions and comments.
+
+Every task and every comment has a ``TaskSearchDocument`` row, upserted as
+soon as its text changes. The database does the indexing: an FTS5 table kept
+in sync by triggers on SQLite and a FULLTEXT index on MySQL; other backends
+fall back to ``LIKE`` scans. A search returns one hit per task, ranked by its
+best matching document, with HTML snippets around the matched terms.
+"""
+
+import html
+import re
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Q
+from .models import Comment, Task, TaskSearchDocument
+
+MAX_TERMS = 8
+FTS_TABLE = "tasks_tasksearchdocument_fts"
+
+
+def task_key(task_id):
+    return f"task:{task_id}"
+
+
+def comment_key(comment_id):
+    return f"comment:{comment_id}"
+
+
+def _connection():
+    return connections[TaskSearchDocument.objects.db]
+
+
+def _upsert(documents):
+    if not documents:
+        return
+    options = {"update_conflicts": True, "update_fields": ["task", "title", "body"]}
+    if _connection().features.supports_update_conflicts_with_target:
+        options["unique_fields"] = ["key"]
+    TaskSearchDocument.objects.bulk_create(documents, **options)
+
+
+def _task_documents(rows):
+    return [
+        TaskSearchDocument(key=task_key(pk), task_id=pk, title=title, body=description)
+        for pk, title, description in rows
+    ]
+
+
+def _comment_documents(rows):
+    return [
+        TaskSearchDocument(key=comment_key(pk), task_id=task_id, body=content)
+        for pk, task_id, content in rows
+    ]
+
+
+def index_tasks(task_ids):
+    """Re-index the title and description of the given tasks."""
+    _upsert(
+        _task_documents(
+            Task.objects.filter(pk__in=task_ids)
+            .order_by()
+            .values_list("pk", "title", "description")
+        )
+    )
+
+
+def index_comments(comments):
+    _upsert(_comment_documents((c.pk, c.task_id, c.content) for c in comments))
+
+
+def remove_comment(comment_id):
+    TaskSearchDocument.objects.filter(key=comment_key(comment_id)).delete()
+
+
+def _chunks(rows, chunk_size):
+    """Stream a ``values_list`` queryset (pk first) in primary-key keyset chunks."""
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk).order_by("pk")[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1][0]
+
+
+def reindex(chunk_size=None):
+    """Rebuild every document, one chunk of rows at a time; yields running counts."""
+    chunk_size = chunk_size or settings.SEARCH_REINDEX_CHUNK_SIZE
+    counts = {"tasks": 0, "comments": 0}
+    for chunk in _chunks(Task.objects.values_list("pk", "title", "description"), chunk_size):
+        _upsert(_task_documents(chunk))
+        counts["tasks"] += len(chunk)
+        yield counts
+    for chunk in _chunks(
+        Comment.objects.values_list("pk", "task_id", "content"), chunk_size
+    ):
+        _upsert(_comment_documents(chunk))
+        counts["comments"] += len(chunk)
+        yield counts
+
+
+def optimize_index():
+    """Merge the FTS5 index segments after a large reindex (SQLite only)."""
+    if _connection().vendor == "sqlite":
+        with _connection().cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def parse_terms(query):
+    return [term.lower() for term in re.findall(r"\w+", query or "")][:MAX_TERMS]
+
+
+def _project_clause(project_ids, params):
+    if project_ids is None:
+        return ""
+    params.extend(project_ids)
+    return f"AND t.project_id IN ({', '.join(['%s'] * len(project_ids))})"
+
+
+def _rank_sqlite(terms, project_ids, limit, offset):
+    # Every term must match, as a prefix; bm25 weighs title hits 10x.
+    params = [" ".join(f'"{term}"*' for term in terms)]
+    projects = _project_clause(project_ids, params)
+    sql = f"""
+        SELECT d.task_id, t.project_id, MIN(hit.rank) AS rank
+        FROM (
+            SELECT rowid AS id, rank
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s AND rank MATCH 'bm25(10.0, 1.0)'
+        ) hit
+        JOIN tasks_tasksearchdocument d ON d.id = hit.id
+        JOIN tasks_task t ON t.id = d.task_id
+        WHERE 1 = 1 {projects}
+        GROUP BY d.task_id, t.project_id
+        ORDER BY rank, d.task_id
+        LIMIT %s OFFSET %s
+    """
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        # bm25 is lower-is-better; flip it so scores sort descending everywhere.
+        return [(task_id, project_id, -rank) for task_id, project_id, rank in cursor]
+
+
+def _rank_mysql(terms, project_ids, limit, offset):
+    against = " ".join(f"+{term}*" for term in terms)
+    params = [against, against]
+    projects = _project_clause(project_ids, params)
+    sql = f"""
+        SELECT d.task_id, t.project_id,
+            MAX(MATCH(d.title, d.body) AGAINST (%s IN BOOLEAN MODE)) AS score
+        FROM tasks_tasksearchdocument d
+        JOIN tasks_task t ON t.id = d.task_id
+        WHERE MATCH(d.title, d.body) AGAINST (%s IN BOOLEAN MODE) {projects}
+        GROUP BY d.task_id, t.project_id
+        ORDER BY score DESC, d.task_id
+        LIMIT %s OFFSET %s
+    """
+    with _connection().cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        return list(cursor)
+
+
+def _rank_like(terms, project_ids, limit, offset):
+    matches = Q()
+    for term in terms:
+        matches &= Q(title__icontains=term) | Q(body__icontains=term)
+    documents = TaskSearchDocument.objects.filter(matches)
+    if project_ids is not None:
+        documents = documents.filter(task__project_id__in=project_ids)
+    return list(
+        documents.values_list("task_id", "task__project_id")
+        .annotate(score=Count("id"))
+        .order_by("-score", "task_id")[offset : offset + limit]
+    )
+
+
+RANKERS = {"sqlite": _rank_sqlite, "mysql": _rank_mysql}
+
+
+def highlight(text, terms, length=None):
+    """HTML-escape ``text`` and wrap matched terms in ``<mark>``.
+
+    With ``length``, only an excerpt of that many characters around the first
+    match is returned.
+    """
+    pattern = re.compile(
+        r"\b(?:%s)\w*" % "|".join(re.escape(term) for term in terms), re.IGNORECASE
+    )
+    prefix = suffix = ""
+    if length and len(text) > length:
+        match = pattern.search(text)
+        start = max(0, match.start() - length // 4) if match else 0
+        prefix = "…" if start else ""
+        suffix = "…" if start + length < len(text) else ""
+        text = text[start : start + length]
+    parts = []
+    position = 0
+    for match in pattern.finditer(text):
+        parts.append(html.escape(text[position : match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:]))
+    return prefix + "".join(parts) + suffix
+
+
+def search(query, project_ids=None, limit=20, offset=0):
+    """Ranked hits for ``query``, one per task, best first.
+
+    ``project_ids`` restricts hits to those projects (``None``: no restriction).
+    """
+    terms = parse_terms(query)
+    if not terms or (project_ids is not None and not project_ids):
+        return []
+    if project_ids is not None:
+        project_ids = sorted(project_ids)
+    rank = RANKERS.get(_connection().vendor, _rank_like)
+    ranked = rank(terms, project_ids, limit, offset)
+    documents = {}
+    for document in TaskSearchDocument.objects.filter(
+        task_id__in=[task_id for task_id, _, _ in ranked]
+    ).order_by("id"):
+        documents.setdefault(document.task_id, []).append(document)
+
+    hits = []
+    for task_id, project_id, score in ranked:
+        task_documents = documents.get(task_id, [])
+        title = next((d.title for d in task_documents if d.key == task_key(task_id)), "")
+        # Show the body with the most matched terms, preferring the task's own.
+        best = max(
+            task_documents,
+            key=lambda d: sum(term in d.body.lower() for term in terms),
+            default=None,
+        )
+        hits.append(
+            {
+                "id": task_id,
+                "project_id": project_id,
+                "score": round(score, 4),
+                "title": highlight(title, terms),
+                "snippet": highlight(
+                    best.body if best else "", terms, settings.SEARCH_SNIPPET_LENGTH
+                ),
+                "matched_in": best.key.split(":")[0] if best else None,
+            }
+        )
+    return hits
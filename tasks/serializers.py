@@ -1,11 +1,76 @@
+from django.conf import settings
+from django.urls import reverse
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from drf_spectacular.utils import extend_schema_serializer
-from .models import Task, Comment, Attachment, TaskHistory
+from .models import Task, Comment, Attachment, AttachmentUpload, TaskHistory
 from projects.models import Project, TaskStatus, Sprint
 from projects.serializers import TaskStatusSerializer, SprintSerializer
 from jwt_auth.models import CustomUser
 from jwt_auth.serializers import UserSerializer
-from .tasks import send_task_assignment_email
+from .tasks import assignment_email
+from .outbox import enqueue_email
+from .tree import CYCLE_ERROR, find_cycles
+from . import uploads
+
+
+def _split_param(value):
+    return {name.strip() for name in (value or "").split(",") if name.strip()}
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Resolve from ``context["related_cache"][source]`` when the caller preloaded it.
+
+    Bulk writes load every referenced object in one query per model and pass
+    them in, so validating N items does not cost N lookups per field.
+    """
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get("related_cache", {}).get(self.source)
+        if preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if pk not in preloaded:
+            self.fail("does_not_exist", pk_value=data)
+        return preloaded[pk]
+
+
+class SparseFieldsetMixin:
+    """Limit output to ``?fields=`` and include ``expandable_fields`` only on ``?expand=``.
+
+    Only applied to reads of the top-level serializer (or each item of a
+    top-level list) so write validation always sees every field.
+    """
+
+    expandable_fields = ()
+
+    @classmethod
+    def requested_fields(cls, request):
+        """Return ``(fields, expand)`` name sets requested by a read."""
+        if request is None or request.method not in ("GET", "HEAD", "OPTIONS"):
+            return set(), set()
+        params = request.query_params
+        return _split_param(params.get("fields")), _split_param(params.get("expand"))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.root is not self and self.root is not self.parent:
+            return fields
+        requested, expand = self.requested_fields(self.context.get("request"))
+        for name in self.expandable_fields:
+            if name not in expand and name not in requested:
+                fields.pop(name, None)
+        if requested:
+            keep = requested | expand | {"id"}
+            for name in list(fields):
+                if name not in keep:
+                    fields.pop(name)
+        return fields
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -22,11 +87,94 @@ class AttachmentSerializer(serializers.ModelSerializer):
     """Serializer for Attachment model."""
 
     uploaded_by = UserSerializer(read_only=True)
-    file = serializers.FileField()
+    # Media is not served publicly; files are fetched through download_url,
+    # which ``file`` and ``url`` also render as for clients that read them.
+    file = serializers.FileField(write_only=True)
+    url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Attachment
-        fields = ["id", "file", "uploaded_by", "uploaded_at"]
+        fields = [
+            "id",
+            "file",
+            "name",
+            "size",
+            "url",
+            "download_url",
+            "thumbnail_url",
+            "uploaded_by",
+            "uploaded_at",
+        ]
+        read_only_fields = ["name", "size"]
+
+    def _url(self, obj, name):
+        url = reverse(name, kwargs={"pk": obj.task_id, "attachment_id": obj.pk})
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_download_url(self, obj) -> str:
+        return self._url(obj, "task-download-attachment")
+
+    def get_url(self, obj) -> str:
+        return self.get_download_url(obj)
+
+    def get_thumbnail_url(self, obj) -> str | None:
+        if obj.blob_id is None or obj.blob.thumbnail_status != "ready":
+            return None
+        return self._url(obj, "task-attachment-thumbnail")
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data["file"] = data["download_url"]
+        return data
+
+    def validate_file(self, value):
+        try:
+            uploads.validate_name_and_size(value.name, value.size)
+        except uploads.UploadError as e:
+            raise serializers.ValidationError(e.message)
+        return value
+
+    def create(self, validated_data):
+        # Stored by content hash, so a file already attached elsewhere is reused.
+        return uploads.attach_file(
+            validated_data["task"], validated_data["uploaded_by"], validated_data["file"]
+        )
+
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    """A chunked upload: declare the file first, then PUT its chunks in order."""
+
+    chunk_size = serializers.SerializerMethodField()
+    next_index = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttachmentUpload
+        fields = [
+            "id",
+            "filename",
+            "size",
+            "received",
+            "chunk_size",
+            "next_index",
+            "created_at",
+        ]
+        read_only_fields = ["received", "created_at"]
+
+    def get_chunk_size(self, obj) -> int:
+        return uploads.chunk_size()
+
+    def get_next_index(self, obj) -> int:
+        return uploads.next_index(obj)
+
+    def validate(self, attrs):
+        try:
+            uploads.validate_name_and_size(attrs["filename"], attrs["size"])
+        except uploads.UploadError as e:
+            raise serializers.ValidationError(e.message)
+        return attrs
 
 
 class TaskHistorySerializer(serializers.ModelSerializer):
@@ -42,9 +190,12 @@ class TaskHistorySerializer(serializers.ModelSerializer):
         }
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer for Task model."""
 
+    # Batched writers run the per-item checks that need queries once per batch.
+    batched = False
+
     created_by = UserSerializer(read_only=True)
     assigned_to = UserSerializer(read_only=True)
     assigned_to_email = serializers.EmailField(
@@ -52,12 +203,12 @@ class TaskSerializer(serializers.ModelSerializer):
         required=False,
         help_text="Email of user to assign task to",
     )
-    project_id = serializers.PrimaryKeyRelatedField(
+    project_id = PreloadedPrimaryKeyRelatedField(
         queryset=Project.objects.all(),
         source="project",
         help_text="Project ID",
     )
-    parent_task_id = serializers.PrimaryKeyRelatedField(
+    parent_task_id = PreloadedPrimaryKeyRelatedField(
         queryset=Task.objects.all(),
         source="parent_task",
         required=False,
@@ -72,7 +223,7 @@ class TaskSerializer(serializers.ModelSerializer):
         help_text="Task deadline (ISO 8601 format)",
     )
     status = TaskStatusSerializer(read_only=True)
-    status_id = serializers.PrimaryKeyRelatedField(
+    status_id = PreloadedPrimaryKeyRelatedField(
         queryset=TaskStatus.objects.all(),
         source="status",
         required=False,
@@ -80,7 +231,7 @@ class TaskSerializer(serializers.ModelSerializer):
         help_text="Task status ID",
     )
     sprint = SprintSerializer(read_only=True)
-    sprint_id = serializers.PrimaryKeyRelatedField(
+    sprint_id = PreloadedPrimaryKeyRelatedField(
         queryset=Sprint.objects.all(),
         source="sprint",
         required=False,
@@ -132,6 +283,13 @@ class TaskSerializer(serializers.ModelSerializer):
             "priority": {"help_text": "Task priority (low, medium, high)"},
         }
 
+    def validate_parent_task_id(self, value):
+        """Refuse parents that would make the task its own ancestor."""
+        if value is not None and self.instance is not None and not self.batched:
+            if find_cycles({self.instance.pk: value.pk}):
+                raise serializers.ValidationError(CYCLE_ERROR)
+        return value
+
     def _assign_user_by_email(self, validated_data):
         """Helper to assign user by email if provided."""
         assigned_to_email = validated_data.pop("assigned_to_email", None)
@@ -152,7 +310,7 @@ class TaskSerializer(serializers.ModelSerializer):
         validated_data["created_by"] = self.context["request"].user
         task = super().create(validated_data)
         if assigned_to_email and task.assigned_to:
-            send_task_assignment_email.delay(task.id, task.assigned_to.email)
+            enqueue_email(*assignment_email(task, task.assigned_to.email))
         return task
 
     def update(self, instance, validated_data):
@@ -167,5 +325,73 @@ class TaskSerializer(serializers.ModelSerializer):
             and task.assigned_to
             and task.assigned_to.email != assigned_to_email
         ):
-            send_task_assignment_email.delay(task.id, task.assigned_to.email)
+            enqueue_email(*assignment_email(task, task.assigned_to.email))
         return task
+
+
+class TaskListSerializer(TaskSerializer):
+    """Slim task representation for list views; nested collections via ?expand=."""
+
+    expandable_fields = ("description", "comments", "attachments", "history")
+
+    class Meta(TaskSerializer.Meta):
+        fields = [
+            "id",
+            "title",
+            "description",
+            "status",
+            "priority",
+            "project_id",
+            "parent_task_id",
+            "assigned_to",
+            "deadline",
+            "sprint_id",
+            "story_points",
+            "comments",
+            "attachments",
+            "history",
+            "created_at",
+            "updated_at",
+        ]
+
+
+class BulkTaskItemSerializer(TaskSerializer):
+    """Validates one bulk create/update payload.
+
+    The (project, title) uniqueness and parent cycle checks are done for the
+    whole batch at once by ``tasks.bulk`` instead of per item.
+    """
+
+    batched = True
+
+    class Meta(TaskSerializer.Meta):
+        validators = []
+
+
+class TaskBulkOperationSerializer(serializers.Serializer):
+    """One operation in a bulk task request."""
+
+    action = serializers.ChoiceField(choices=["create", "update", "delete"])
+    id = serializers.IntegerField(
+        required=False, help_text="Task ID (required for update and delete)"
+    )
+    data = serializers.DictField(
+        required=False, help_text="Task fields (required for create and update)"
+    )
+
+    def validate(self, attrs):
+        if attrs["action"] != "create" and "id" not in attrs:
+            raise serializers.ValidationError({"id": "This field is required."})
+        if attrs["action"] != "delete" and "data" not in attrs:
+            raise serializers.ValidationError({"data": "This field is required."})
+        return attrs
+
+
+class TaskBulkSerializer(serializers.Serializer):
+    """Serializer for bulk task create/update/delete requests."""
+
+    operations = serializers.ListField(
+        child=TaskBulkOperationSerializer(),
+        allow_empty=False,
+        max_length=settings.TASK_BULK_MAX_OPERATIONS,
+    )
@@ -1,6 +1,9 @@
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Task, TaskHistory
+from task_manager.conditional import bump, stamp_key
+from .models import Attachment, AttachmentUpload, Comment, Task, TaskHistory
+from . import search, uploads
+from .tracking import TRACKED_FIELDS, counted_state, history_changes, tasks_changed
 from django.contrib.auth import get_user_model
 
 
@@ -8,34 +11,106 @@ User = get_user_model()
 
 
 @receiver(pre_save, sender=Task)
-def track_task_changes(sender, instance, **kwargs):
-    """Log changes to task fields."""
-    if instance.id:  # Only track updates, not creations
-        old_instance = Task.objects.get(id=instance.id)
-        fields_to_track = [
-            "title",
-            "description",
-            "status",
-            "priority",
-            "assigned_to",
-            "deadline",
-            "estimated_hours",
-            "actual_hours",
-            "sprint",
-            "story_points",
+def track_task_changes(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Diff tracked fields in memory; rows are written once the save succeeds."""
+    if raw or not instance.pk:  # Only track updates, not creations or fixtures
+        return
+    instance._pending_changes = instance.get_tracked_changes(update_fields)
+    instance._pending_transition_from = instance.loaded_counted_state()
+
+
+@receiver(post_save, sender=Task)
+def write_task_history(
+    sender, instance, created=False, raw=False, update_fields=None, **kwargs
+):
+    """Write all history rows for a save with a single insert."""
+    changes = instance.__dict__.pop("_pending_changes", None)
+    old_state = instance.__dict__.pop("_pending_transition_from", None)
+    if changes:
+        rendered = history_changes(sender, {instance.pk: changes}, instance._state.db)
+        TaskHistory.objects.bulk_create(
+            TaskHistory.from_changes(
+                instance.pk, getattr(instance, "_request_user", None), rendered[instance.pk]
+            )
+        )
+    project_ids = {instance.project_id, getattr(instance, "_loaded_project_id", None)}
+    project_ids.discard(None)
+    instance.snapshot_tracked_fields(update_fields)
+    new_state = counted_state(instance)
+    if old_state is not None and update_fields is not None:
+        # Columns left out of update_fields keep their stored values.
+        saved = {sender._meta.get_field(name).attname for name in update_fields}
+        new_state = {
+            column: value if column in saved else old_state[column]
+            for column, value in new_state.items()
+        }
+    if created:
+        transitions = [(None, new_state)]
+        fields = set(TRACKED_FIELDS)
+    else:
+        fields = set(changes or ())
+        # Raw (fixture) saves are not tracked and cannot be counted as a move.
+        transitions = [(old_state, new_state)] if old_state is not None else []
+    tasks_changed.send(
+        sender=sender,
+        project_ids=project_ids,
+        transitions=transitions,
+        task_ids={instance.pk},
+        fields=fields,
+    )
+
+
+@receiver(post_delete, sender=Task)
+def announce_task_deletion(sender, instance, **kwargs):
+    tasks_changed.send(
+        sender=sender,
+        project_ids={instance.project_id},
+        transitions=[(instance.loaded_counted_state(), None)],
+    )
+
+
+@receiver(tasks_changed)
+def index_changed_tasks(sender, task_ids=(), fields=(), **kwargs):
+    if task_ids and {"title", "description"} & set(fields):
+        search.index_tasks(task_ids)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_comments([instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, origin=None, **kwargs):
+    # Comments deleted along with their task lose their documents by cascade.
+    if getattr(origin, "model", type(origin)) is Comment:
+        search.remove_comment(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Attachment)
+@receiver(post_delete, sender=Attachment)
+def bump_task_child_stamps(sender, instance, origin=None, **kwargs):
+    """Comments and attachments are rendered inside their task."""
+    if origin is not None and getattr(origin, "model", type(origin)) is not sender:
+        return  # Cascaded from a task or project, which bump the stamps themselves
+    bump(
+        [
+            stamp_key("task", instance.task_id),
+            stamp_key("project-tasks", instance.task.project_id),
+            stamp_key("tasks"),
         ]
-        for field in fields_to_track:
-            old_value = str(getattr(old_instance, field, None))
-            new_value = str(getattr(instance, field, None))
-            if old_value != new_value:
-                TaskHistory.objects.create(
-                    task=instance,
-                    user=(
-                        instance._request_user
-                        if hasattr(instance, "_request_user")
-                        else None
-                    ),
-                    field=field,
-                    old_value=old_value,
-                    new_value=new_value,
-                )
+    )
+
+
+@receiver(post_delete, sender=Attachment)
+def release_attachment_blob(sender, instance, **kwargs):
+    if instance.blob_id is not None:
+        uploads.release_blobs([instance.blob_id])
+
+
+@receiver(post_delete, sender=AttachmentUpload)
+def discard_upload_chunks(sender, instance, **kwargs):
+    uploads.discard_chunks(instance)
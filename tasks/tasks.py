@@ -1,34 +1,123 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from celery import shared_task
-from .models import Task
+from .models import Task, DeadlineReminder
+from . import outbox, thumbnails, uploads
 
 
-@shared_task
-def send_task_assignment_email(task_id, user_email):
-    """Send email when a task is assigned."""
-    task = Task.objects.get(id=task_id)
+def assignment_email(task, user_email):
+    """Return the outbox ``(subject, body, to_email)`` for a task assignment."""
     subject = f"New Task Assigned: {task.title}"
     message = f"You have been assigned to '{task.title}' in project ' {task.project.name}'.\n\nDescription: {task.description}\nDeadline: {task.deadline or 'Not set'}"
-    send_mail(subject, message, "no-reply@taskmanager.com", [user_email])
+    return subject, message, user_email
 
 
 @shared_task
-def send_deadline_reminder_email(task_id, user_email):
-    """Send deadline reminder 24 hours before due."""
-    task = Task.objects.get(id=task_id)
-    subject = f"Deadline Reminder: {task.title}"
-    message = f"The task '{task.title}' is due in 24 hours.\n\nDescription: {task.description}\nProject: {task.project.name}"
-    send_mail(subject, message, "no-reply@taskmanager.com", [user_email])
+def send_task_assignment_email(task_id, user_email):
+    """Queue the assignment email for a task (kept for already-enqueued jobs)."""
+    task = Task.objects.select_related("project").get(id=task_id)
+    outbox.enqueue_email(*assignment_email(task, user_email))
 
 
 @shared_task
-def check_deadline_reminders():
-    """Check tasks due in 24 hours and send reminders."""
-    now = timezone.now()
-    due_soon = now + timedelta(hours=24)
-    tasks = Task.objects.filter(
-        deadline__range=(now, due_soon), assigned_to__isnull=False
+def drain_email_outbox():
+    """Deliver queued emails in batches over one SMTP connection."""
+    return outbox.drain()
+
+
+@shared_task
+def expire_attachment_uploads():
+    """Discard chunked uploads that were never completed."""
+    return uploads.expire_uploads()
+
+
+@shared_task(bind=True, max_retries=None)
+def generate_thumbnail(self, blob_id, force=False):
+    """Render the thumbnail of an attachment's stored file."""
+    slot = thumbnails.acquire_slot()
+    if slot is None:
+        raise self.retry(countdown=settings.THUMBNAIL_RETRY_SECONDS)
+    try:
+        return thumbnails.generate(blob_id, force=force)
+    finally:
+        thumbnails.release_slot(slot)
+
+
+def _deadline_digest(user, tasks):
+    """Build one reminder email listing every task due soon for ``user``."""
+    if len(tasks) == 1:
+        subject = f"Deadline Reminder: {tasks[0].title}"
+    else:
+        subject = f"Deadline Reminder: {len(tasks)} tasks due in 24 hours"
+    lines = [
+        f"- '{task.title}' ({task.project.name}), due {task.deadline:%Y-%m-%d %H:%M}"
+        for task in tasks
+    ]
+    message = "The following tasks are due in 24 hours:\n\n" + "\n".join(lines)
+    return subject, message, user.email
+
+
+@transaction.atomic
+def _send_digests(digests):
+    """Queue a batch of digests and record them so reruns skip these tasks."""
+    outbox.enqueue_emails([message for message, _ in digests])
+    DeadlineReminder.objects.bulk_create(
+        [
+            DeadlineReminder(task=task, user_id=task.assigned_to_id, deadline=task.deadline)
+            for _, tasks in digests
+            for task in tasks
+        ],
+        ignore_conflicts=True,
     )
-    for task in tasks:
-        send_deadline_reminder_email.delay(task.id, task.assigned_to.email)
+
+
+@shared_task
+def check_deadline_reminders():
+    """Send one digest per assignee for tasks due in 24 hours.
+
+    Due tasks are streamed in chunks, grouped by assignee and handed to the
+    email outbox in batches. Queued reminders are recorded in DeadlineReminder,
+    so a second run (or a retry after a partial failure) only sends what is left.
+    """
+    lock_key = "tasks:check-deadline-reminders"
+    if not cache.add(lock_key, 1, settings.DEADLINE_REMINDER_LOCK_TIMEOUT):
+        return 0  # Another run is in progress
+    try:
+        now = timezone.now()
+        due_soon = now + timedelta(hours=24)
+        already_sent = DeadlineReminder.objects.filter(
+            task=OuterRef("pk"),
+            user=OuterRef("assigned_to"),
+            deadline=OuterRef("deadline"),
+        )
+        tasks = (
+            Task.objects.filter(
+                deadline__range=(now, due_soon), assigned_to__isnull=False
+            )
+            .exclude(Exists(already_sent))
+            .select_related("assigned_to", "project")
+            .order_by("assigned_to_id", "deadline")
+            .iterator(chunk_size=settings.DEADLINE_REMINDER_CHUNK_SIZE)
+        )
+        sent = 0
+        digests = []
+        for _, user_tasks in groupby(tasks, key=lambda task: task.assigned_to_id):
+            user_tasks = list(user_tasks)
+            digests.append(
+                (_deadline_digest(user_tasks[0].assigned_to, user_tasks), user_tasks)
+            )
+            if len(digests) >= settings.DEADLINE_REMINDER_BATCH_SIZE:
+                _send_digests(digests)
+                sent += len(digests)
+                digests = []
+        if digests:
+            _send_digests(digests)
+            sent += len(digests)
+        return sent
+    finally:
+        cache.delete(lock_key)
@@ -1,3 +1,888 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from jwt_auth.models import CustomUser
+from projects.models import Project, TaskStatus
+from .models import (
+    Attachment,
+    AttachmentUpload,
+    Comment,
+    DeadlineReminder,
+    OutboundEmail,
+    StoredFile,
+    Task,
+    TaskHistory,
+)
+from . import outbox, search, thumbnails, uploads
+from .tree import subtree
+from .tasks import check_deadline_reminders
 
-# Create your tests here.
+
+class TaskChangeTrackingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.user)
+        cls.todo = TaskStatus.objects.create(project=cls.project, name="To Do")
+        cls.done = TaskStatus.objects.create(project=cls.project, name="Done", order=1)
+        cls.task = Task.objects.create(
+            title="Write docs",
+            project=cls.project,
+            created_by=cls.user,
+            status=cls.todo,
+        )
+
+    def test_multi_field_save_costs_fixed_queries(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task._request_user = self.user
+        task.title = "Write better docs"
+        task.priority = "high"
+        task.status = self.done
+        task.deadline = timezone.now() + timedelta(days=2)
+        task.story_points = 5
+        # One UPDATE for the task, a read of the status names and one INSERT
+        # for all history rows, a read and an upsert for the search document
+        # (the title changed), then one UPDATE each for the project and
+        # per-status counters.
+        with self.assertNumQueries(7):
+            task.save()
+        history = TaskHistory.objects.filter(task=task)
+        self.assertEqual(
+            set(history.values_list("field", flat=True)),
+            {"title", "priority", "status", "deadline", "story_points"},
+        )
+        self.assertTrue(all(h.user_id == self.user.pk for h in history))
+
+    def test_unchanged_save_writes_no_history(self):
+        task = Task.objects.get(pk=self.task.pk)
+        with self.assertNumQueries(1):
+            task.save()
+        self.assertFalse(TaskHistory.objects.exists())
+
+    def test_consecutive_saves_diff_against_last_save(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.priority = "high"
+        task.save()
+        task.priority = "low"
+        task.save()
+        self.assertEqual(
+            list(
+                TaskHistory.objects.order_by("id").values_list(
+                    "old_value", "new_value"
+                )
+            ),
+            [("medium", "high"), ("high", "low")],
+        )
+
+    def test_queryset_update_records_history(self):
+        # Read old values, UPDATE, read new values, one INSERT for history,
+        # one UPDATE for the project counters.
+        with self.assertNumQueries(5):
+            Task.objects.filter(project=self.project).update(priority="low")
+        entry = TaskHistory.objects.get()
+        self.assertEqual(
+            (entry.field, entry.old_value, entry.new_value),
+            ("priority", "medium", "low"),
+        )
+
+    def test_bulk_update_records_history(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.actual_hours = 3.5
+        Task.objects.bulk_update([task], ["actual_hours"])
+        entry = TaskHistory.objects.get()
+        self.assertEqual((entry.old_value, entry.new_value), ("0.0", "3.5"))
+
+    def test_update_by_attname_records_history(self):
+        Task.objects.filter(pk=self.task.pk).update(status_id=self.done.pk)
+        entry = TaskHistory.objects.get()
+        self.assertEqual(
+            (entry.field, entry.old_value, entry.new_value),
+            ("status", "To Do (Board)", "Done (Board)"),
+        )
+        self.assertEqual(TaskStatus.objects.get(pk=self.done.pk).counter.count, 1)
+
+    def test_related_values_are_recorded_by_name(self):
+        task = Task.objects.get(pk=self.task.pk)
+        task.assigned_to = self.user
+        Task.objects.bulk_update([task], ["assigned_to"])
+        entry = TaskHistory.objects.get()
+        self.assertEqual(
+            (entry.field, entry.old_value, entry.new_value),
+            ("assigned_to", "None", "owner@example.com"),
+        )
+
+    def test_untracked_update_skips_snapshot(self):
+        # Read the projects for cache invalidation, then the UPDATE.
+        with self.assertNumQueries(2):
+            Task.objects.filter(pk=self.task.pk).update(parent_task=None)
+        self.assertFalse(TaskHistory.objects.exists())
+
+    def test_bulk_create_ignores_conflicting_rows(self):
+        Task.objects.bulk_create(
+            [
+                Task(title="Write docs", project=self.project, created_by=self.user),
+                Task(title="Review", project=self.project, created_by=self.user),
+            ],
+            ignore_conflicts=True,
+        )
+        self.assertEqual(Project.objects.get(pk=self.project.pk).stats.task_count, 2)
+
+
+class TaskBulkEndpointTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.user)
+        cls.status = TaskStatus.objects.create(project=cls.project, name="To Do")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_ops(self, count):
+        return [
+            {
+                "action": "create",
+                "data": {
+                    "title": f"Imported {i}",
+                    "project_id": self.project.pk,
+                    "status_id": self.status.pk,
+                },
+            }
+            for i in range(count)
+        ]
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(
+                "/api/v1/tasks/bulk/", {"operations": self._create_ops(2)}, format="json"
+            )
+        Task.objects.all().delete()
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post(
+                "/api/v1/tasks/bulk/",
+                {"operations": self._create_ops(60)},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 60)
+        self.assertEqual(len(small), len(large))
+
+    def test_invalid_item_rejects_whole_batch(self):
+        operations = self._create_ops(3) + [{"action": "delete", "id": 999}]
+        response = self.client.post(
+            "/api/v1/tasks/bulk/", {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["errors"][0]["index"], 3)
+        self.assertFalse(Task.objects.exists())
+
+
+    def test_writes_under_a_deleted_task_are_rejected(self):
+        parent = Task.objects.create(
+            title="Parent", project=self.project, created_by=self.user
+        )
+        child = Task.objects.create(
+            title="Child",
+            project=self.project,
+            created_by=self.user,
+            parent_task=parent,
+        )
+        operations = [
+            {"action": "delete", "id": parent.pk},
+            {"action": "update", "id": child.pk, "data": {"title": "Renamed"}},
+            {
+                "action": "create",
+                "data": {
+                    "title": "Grandchild",
+                    "project_id": self.project.pk,
+                    "parent_task_id": child.pk,
+                },
+            },
+        ]
+        response = self.client.post(
+            "/api/v1/tasks/bulk/", {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2])
+        self.assertEqual(Task.objects.count(), 2)
+
+    def test_update_cannot_move_a_task_into_a_hidden_project(self):
+        task = Task.objects.create(
+            title="Mine", project=self.project, created_by=self.user
+        )
+        stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", password="S3cure-pass-123"
+        )
+        hidden = Project.objects.create(name="Hidden", owner=stranger)
+        operations = [
+            {"action": "update", "id": task.pk, "data": {"project_id": hidden.pk}}
+        ]
+        response = self.client.post(
+            "/api/v1/tasks/bulk/", {"operations": operations}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data["errors"][0]["errors"], {"project_id": "Not authorized"}
+        )
+        task.refresh_from_db()
+        self.assertEqual(task.project_id, self.project.pk)
+
+
+class TaskTreeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Tree", owner=cls.user)
+        cls.root = cls.create_task("Root", estimated_hours=1, story_points=1)
+        cls.child = cls.create_task("Child", parent=cls.root, estimated_hours=2)
+        cls.leaf = cls.create_task("Leaf", parent=cls.child, story_points=3)
+        cls.sibling = cls.create_task("Sibling", parent=cls.root, actual_hours=4)
+
+    @classmethod
+    def create_task(cls, title, parent=None, **kwargs):
+        return Task.objects.create(
+            title=title,
+            project=cls.project,
+            created_by=cls.user,
+            parent_task=parent,
+            **kwargs,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_subtree_is_one_query_with_rollups(self):
+        with self.assertNumQueries(1):
+            tree = subtree(self.root)
+        self.assertEqual(
+            [child["title"] for child in tree["children"]], ["Child", "Sibling"]
+        )
+        self.assertEqual(tree["children"][0]["children"][0]["depth"], 2)
+        self.assertEqual(
+            tree["rollup"],
+            {
+                "task_count": 4,
+                "estimated_hours": 3,
+                "actual_hours": 4,
+                "story_points": 4,
+            },
+        )
+        response = self.client.get(f"/api/v1/tasks/{self.child.pk}/tree/")
+        self.assertEqual(response.data["rollup"]["task_count"], 2)
+
+    def test_parent_cycles_are_rejected(self):
+        response = self.client.patch(
+            f"/api/v1/tasks/{self.root.pk}/",
+            {"parent_task_id": self.leaf.pk},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("parent_task_id", response.data)
+        # Each move is fine alone, together they form a loop.
+        response = self.client.post(
+            "/api/v1/tasks/bulk/",
+            {
+                "operations": [
+                    {
+                        "action": "update",
+                        "id": self.sibling.pk,
+                        "data": {"parent_task_id": self.leaf.pk},
+                    },
+                    {
+                        "action": "update",
+                        "id": self.child.pk,
+                        "data": {"parent_task_id": self.sibling.pk},
+                    },
+                ]
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["index"] for e in response.data["errors"]], [0, 1])
+
+
+class TaskListRepresentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.user)
+        cls.status = TaskStatus.objects.create(project=cls.project, name="To Do")
+        for i in range(3):
+            cls.create_task(f"Task {i}")
+
+    @classmethod
+    def create_task(cls, title):
+        task = Task.objects.create(
+            title=title,
+            description="Details",
+            project=cls.project,
+            created_by=cls.user,
+            assigned_to=cls.user,
+            status=cls.status,
+        )
+        Comment.objects.create(task=task, author=cls.user, content="Noted")
+        task.priority = "high"
+        task.save()
+        return task
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_is_slim_and_expands_on_request(self):
+        task = self.client.get("/api/v1/tasks/").data["results"][0]
+        self.assertEqual(task["status"]["name"], "To Do")
+        for name in ("description", "comments", "attachments", "history"):
+            self.assertNotIn(name, task)
+        task = self.client.get("/api/v1/tasks/?expand=comments,history").data[
+            "results"
+        ][0]
+        self.assertEqual([c["content"] for c in task["comments"]], ["Noted"])
+        self.assertEqual([h["field"] for h in task["history"]], ["priority"])
+        self.assertNotIn("attachments", task)
+
+    def test_fields_limit_list_and_detail(self):
+        tasks = self.client.get("/api/v1/tasks/?fields=title,status").data["results"]
+        self.assertEqual(
+            {key for task in tasks for key in task}, {"id", "title", "status"}
+        )
+        pk = tasks[0]["id"]
+        task = self.client.get(f"/api/v1/tasks/{pk}/?fields=title,comments").data
+        self.assertEqual(set(task), {"id", "title", "comments"})
+        # Detail keeps the full representation by default.
+        self.assertIn("history", self.client.get(f"/api/v1/tasks/{pk}/").data)
+
+    def test_list_queries_do_not_grow_with_the_page(self):
+        url = "/api/v1/tasks/?expand=comments,attachments,history"
+        self.client.get("/api/v1/tasks/")  # Warm the visibility cache
+        # Page COUNT and rows (status, creator and assignee joined), then one
+        # prefetch each for comments, attachments and history.
+        with self.assertNumQueries(5):
+            self.assertEqual(len(self.client.get(url).data["results"]), 3)
+        for i in range(3, 8):
+            self.create_task(f"Task {i}")
+        with self.assertNumQueries(5):
+            self.assertEqual(len(self.client.get(url).data["results"]), 8)
+
+
+class TaskCursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.user)
+        Task.objects.bulk_create(
+            Task(
+                title=f"Task {i}",
+                project=cls.project,
+                created_by=cls.user,
+                priority=["low", "medium", "high"][i % 3],
+            )
+            for i in range(25)
+        )
+        # Ties on the cursor position must not repeat or skip rows.
+        Task.objects.update(updated_at=timezone.now())
+        cls.task = Task.objects.order_by("id").first()
+        TaskHistory.objects.bulk_create(
+            TaskHistory(task=cls.task, field="title", new_value=str(i))
+            for i in range(25)
+        )
+        TaskHistory.objects.update(changed_at=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        """IDs of every page from ``url`` on, asserting no page counts."""
+        ids = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).data
+            self.assertFalse(any("COUNT(" in q["sql"] for q in queries))
+            self.assertNotIn("count", data)
+            ids += [item["id"] for item in data["results"]]
+            url = data["next"]
+        return ids
+
+    def test_task_pages_are_stable(self):
+        ids = self.walk("/api/v1/tasks/?pagination=cursor")
+        expected = list(
+            Task.objects.order_by("-updated_at", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_history_pages_are_stable(self):
+        ids = self.walk(f"/api/v1/tasks/{self.task.pk}/history/?pagination=cursor")
+        expected = list(
+            TaskHistory.objects.order_by("-changed_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(ids, expected)
+
+    def test_history_is_a_plain_list_unless_paged(self):
+        url = f"/api/v1/tasks/{self.task.pk}/history/"
+        data = self.client.get(url).data
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 25)
+        data = self.client.get(url, {"page": 2}).data
+        self.assertEqual((data["count"], len(data["results"])), (25, 10))
+
+    def test_ordering_applies_under_the_cursor(self):
+        ids = self.walk("/api/v1/tasks/?pagination=cursor&ordering=-priority")
+        expected = list(
+            Task.objects.order_by("-priority", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+
+class ConditionalRequestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Polling", owner=cls.user)
+        cls.task = Task.objects.create(
+            title="Poll me", project=cls.project, created_by=cls.user
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/v1/tasks/{self.task.pk}/"
+
+    def test_list_answers_304_without_loading_tasks(self):
+        etag = self.client.get("/api/v1/tasks/")["ETag"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any("tasks_task" in q["sql"] for q in queries))
+        Task.objects.filter(pk=self.task.pk).update(priority="high")
+        response = self.client.get("/api/v1/tasks/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_revalidates_on_comments_and_last_modified(self):
+        response = self.client.get(self.url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code,
+            304,
+        )
+        self.client.post(
+            f"{self.url}add_comment/", {"content": "Any news?"}, format="json"
+        )
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_detail_revalidates_when_related_names_change(self):
+        status = TaskStatus.objects.create(project=self.project, name="Todo", order=1)
+        Task.objects.filter(pk=self.task.pk).update(status=status)
+        etag = self.client.get(self.url)["ETag"]
+        status.name = "Doing"
+        status.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.user.first_name = "Renamed"
+        self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_if_match_guards_concurrent_updates(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.patch(
+            self.url, {"priority": "low"}, format="json", HTTP_IF_MATCH=f"W/{etag}"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        response = self.client.patch(
+            self.url, {"priority": "high"}, format="json", HTTP_IF_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.priority, "low")
+
+
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.member = CustomUser.objects.create_user(
+            email="member@example.com", password="S3cure-pass-123"
+        )
+        cls.admin = CustomUser.objects.create_user(
+            email="admin@example.com", password="S3cure-pass-123", is_staff=True
+        )
+        cls.project = Project.objects.create(name="Cached", owner=cls.owner)
+        cls.project.members.add(cls.member)
+        cls.task = Task.objects.create(
+            title="Cache me", project=cls.project, created_by=cls.owner
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, user, url):
+        self.client.force_authenticate(user)
+        return self.client.get(url)
+
+    def test_same_visibility_shares_entries_until_invalidated(self):
+        self.assertEqual(self.get(self.owner, "/api/v1/tasks/")["X-Cache"], "MISS")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get(self.member, "/api/v1/tasks/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["results"][0]["title"], "Cache me")
+        self.assertFalse(any("tasks_task" in q["sql"] for q in queries))
+        Comment.objects.create(task=self.task, author=self.owner, content="Done?")
+        self.assertEqual(self.get(self.member, "/api/v1/tasks/")["X-Cache"], "MISS")
+
+    def test_renaming_related_objects_misses(self):
+        status = TaskStatus.objects.create(project=self.project, name="Todo", order=1)
+        Task.objects.filter(pk=self.task.pk).update(status=status)
+        url = f"/api/v1/tasks/{self.task.pk}/"
+        project_url = f"/api/v1/projects/{self.project.pk}/"
+        self.get(self.owner, url)
+        self.get(self.owner, project_url)
+        self.assertEqual(self.get(self.owner, url)["X-Cache"], "HIT")
+        status.name = "Doing"
+        status.save()
+        response = self.get(self.owner, url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["status"]["name"], "Doing")
+        owner = CustomUser.objects.get(pk=self.owner.pk)
+        owner.first_name = "Renamed"
+        owner.save()
+        self.assertEqual(self.get(self.owner, url)["X-Cache"], "MISS")
+        response = self.get(self.owner, project_url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["owner"]["first_name"], "Renamed")
+
+    def test_metrics_are_admin_only(self):
+        url = f"/api/v1/tasks/{self.task.pk}/"
+        self.get(self.owner, url)
+        self.get(self.owner, url)
+        self.assertEqual(
+            self.get(self.owner, "/api/v1/metrics/response-cache/").status_code, 403
+        )
+        metrics = self.get(self.admin, "/api/v1/metrics/response-cache/").data
+        self.assertGreaterEqual(metrics["tasks"]["hits"], 1)
+        self.assertIn("users", metrics)
+
+
+class AttachmentUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Files", owner=cls.user)
+        cls.tasks = [
+            Task.objects.create(
+                title=f"Task {i}", project=cls.project, created_by=cls.user
+            )
+            for i in range(2)
+        ]
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(
+            MEDIA_ROOT=media_root, ATTACHMENT_UPLOAD_CHUNK_SIZE=4
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch("tasks.tasks.generate_thumbnail.delay")
+        self.generate_thumbnail = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, task, content, size=None):
+        base = f"/api/v1/tasks/{task.pk}/uploads/"
+        upload = self.client.post(
+            base, {"filename": "spec.pdf", "size": size or len(content)}
+        )
+        self.assertEqual(upload.status_code, 201)
+        url = f"{base}{upload.data['id']}/"
+        for index in range(0, len(content), 4):
+            response = self.client.put(
+                f"{url}chunks/{index // 4}/",
+                content[index : index + 4],
+                content_type="application/octet-stream",
+            )
+            self.assertEqual(response.status_code, 200)
+        return url
+
+    def test_resumable_upload_validates_chunks(self):
+        base = f"/api/v1/tasks/{self.tasks[0].pk}/uploads/"
+        rejected = self.client.post(base, {"filename": "run.exe", "size": 10})
+        self.assertEqual(rejected.status_code, 400)
+        url = self.upload(self.tasks[0], b"abcdefgh", size=10)
+        self.assertEqual(self.client.get(url).data["next_index"], 2)
+        too_long = self.client.put(
+            f"{url}chunks/2/", b"ijklm", content_type="application/octet-stream"
+        )
+        self.assertEqual(too_long.status_code, 400)
+        self.assertEqual(self.client.post(f"{url}complete/").status_code, 409)
+        self.client.put(
+            f"{url}chunks/2/", b"ij", content_type="application/octet-stream"
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = self.client.post(f"{url}complete/")
+        self.assertEqual(attachment.status_code, 201)
+        self.assertEqual(
+            (attachment.data["name"], attachment.data["size"]), ("spec.pdf", 10)
+        )
+        stored = Attachment.objects.get().file
+        self.assertEqual(stored.read(), b"abcdefghij")
+        upload_id = url.split("/")[-2]
+        self.assertFalse(default_storage.exists(uploads.chunk_name(upload_id, 0)))
+
+    def test_chunk_being_written_conflicts_until_its_claim_expires(self):
+        url = self.upload(self.tasks[0], b"abcd", size=8)
+        claim = AttachmentUpload.objects.filter(pk=url.split("/")[-2])
+        claim.update(writing_since=timezone.now())
+        response = self.client.put(
+            f"{url}chunks/1/", b"efgh", content_type="application/octet-stream"
+        )
+        self.assertEqual(response.status_code, 409)
+        claim.update(writing_since=timezone.now() - timedelta(hours=1))
+        response = self.client.put(
+            f"{url}chunks/1/", b"efgh", content_type="application/octet-stream"
+        )
+        self.assertEqual(response.data["next_index"], 2)
+        self.assertIsNone(claim.get().writing_since)
+
+    def test_identical_content_is_stored_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(self.upload(self.tasks[0], b"same bytes") + "complete/")
+        response = self.client.post(
+            f"/api/v1/tasks/{self.tasks[1].pk}/add_attachment/",
+            {"file": SimpleUploadedFile("copy.pdf", b"same bytes")},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        blob = StoredFile.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(len({a.file.name for a in Attachment.objects.all()}), 1)
+        self.tasks[0].delete()
+        self.assertEqual(StoredFile.objects.get().ref_count, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks[1].delete()
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(default_storage.exists(blob.file.name))
+
+    @skipUnless(thumbnails.Image, "Pillow is not installed")
+    def test_thumbnail_generated_once_per_content(self):
+        image = io.BytesIO()
+        thumbnails.Image.new("RGBA", (800, 400), "red").save(image, "PNG")
+        for task in self.tasks:
+            with self.captureOnCommitCallbacks(execute=True):
+                data = self.client.post(
+                    f"/api/v1/tasks/{task.pk}/add_attachment/",
+                    {"file": SimpleUploadedFile("photo.png", image.getvalue())},
+                    format="multipart",
+                ).data
+        self.assertIsNone(data["thumbnail_url"])
+        blob = StoredFile.objects.get()
+        self.generate_thumbnail.assert_called_once_with(blob.pk, force=False)
+        self.assertEqual(thumbnails.generate(blob.pk), "ready")
+        url = self.client.get(f"/api/v1/tasks/{self.tasks[1].pk}/").data[
+            "attachments"
+        ][0]["thumbnail_url"]
+        response = self.client.get(url)
+        self.assertIn("inline", response["Content-Disposition"])
+        content = b"".join(response.streaming_content)
+        self.assertEqual(thumbnails.Image.open(io.BytesIO(content)).size, (256, 128))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(url).status_code, 202)
+        self.assertEqual(self.generate_thumbnail.call_args.kwargs, {"force": True})
+
+    def test_download_checks_access_and_serves_ranges(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            data = self.client.post(
+                self.upload(self.tasks[0], b"0123456789") + "complete/"
+            ).data
+        url = data["download_url"]
+        self.assertEqual((data["url"], data["file"]), (url, url))
+        response = self.client.get(url)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+        self.assertIn("immutable", response["Cache-Control"])
+        partial = self.client.get(url, HTTP_RANGE="bytes=2-5")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial["Content-Range"], "bytes 2-5/10")
+        self.assertEqual(b"".join(partial.streaming_content), b"2345")
+        self.assertEqual(self.client.get(url, HTTP_RANGE="bytes=20-").status_code, 416)
+        cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        with override_settings(ATTACHMENT_DOWNLOAD_BACKEND="nginx"):
+            offloaded = self.client.get(url)
+        self.assertTrue(
+            offloaded["X-Accel-Redirect"].startswith("/protected-media/attachments/")
+        )
+        stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", password="S3cure-pass-123"
+        )
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class TaskSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.stranger = CustomUser.objects.create_user(
+            email="stranger@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Search", owner=cls.user)
+        cls.hidden = Project.objects.create(name="Hidden", owner=cls.stranger)
+        cls.login = Task.objects.create(
+            title="Fix login redirect",
+            description="Users land on a blank page after <b>login</b>.",
+            project=cls.project,
+            created_by=cls.user,
+        )
+        cls.other = Task.objects.create(
+            title="Polish settings page",
+            project=cls.project,
+            created_by=cls.user,
+        )
+        Task.objects.create(
+            title="Secret login work", project=cls.hidden, created_by=cls.stranger
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q):
+        return self.client.get("/api/v1/search/", {"q": q}).data["results"]
+
+    def test_ranked_highlighted_and_scoped_to_visible_projects(self):
+        hits = self.search("login")
+        self.assertEqual([hit["id"] for hit in hits], [self.login.pk])
+        self.assertEqual(hits[0]["title"], "Fix <mark>login</mark> redirect")
+        self.assertIn("&lt;b&gt;<mark>login</mark>&lt;/b&gt;", hits[0]["snippet"])
+        self.assertEqual(
+            self.client.get("/api/v1/search/", {"q": "  "}).status_code, 400
+        )
+
+    def test_index_follows_edits_and_comments(self):
+        self.other.title = "Polish preferences page"
+        self.other.save()
+        self.assertEqual(self.search("settings"), [])
+        self.assertEqual([hit["id"] for hit in self.search("prefer")], [self.other.pk])
+        comment = Comment.objects.create(
+            task=self.other, author=self.user, content="Dark mode toggle is broken"
+        )
+        hits = self.search("toggle")
+        self.assertEqual(hits[0]["matched_in"], "comment")
+        comment.delete()
+        self.assertEqual(self.search("toggle"), [])
+
+    def test_reindex_rebuilds_documents(self):
+        search.TaskSearchDocument.objects.all().delete()
+        self.assertEqual(self.search("login"), [])
+        *_, counts = search.reindex(chunk_size=1)
+        self.assertEqual(counts, {"tasks": 3, "comments": 0})
+        self.assertEqual(len(self.search("login")), 1)
+
+
+class DeadlineReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = CustomUser.objects.create_user(
+            email="owner@example.com", password="S3cure-pass-123"
+        )
+        cls.assignee = CustomUser.objects.create_user(
+            email="dev@example.com", password="S3cure-pass-123"
+        )
+        cls.project = Project.objects.create(name="Board", owner=cls.owner)
+        soon = timezone.now() + timedelta(hours=3)
+        for i in range(3):
+            Task.objects.create(
+                title=f"Due {i}",
+                project=cls.project,
+                created_by=cls.owner,
+                assigned_to=cls.assignee if i < 2 else cls.owner,
+                deadline=soon,
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_one_digest_per_assignee_and_reruns_are_noops(self):
+        self.assertEqual(check_deadline_reminders(), 2)
+        self.assertEqual(DeadlineReminder.objects.count(), 3)
+        self.assertEqual(check_deadline_reminders(), 0)
+        outbox.drain()
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ["dev@example.com", "owner@example.com"],
+        )
+
+
+@override_settings(EMAIL_OUTBOX_RATE_LIMIT=1000)
+class EmailOutboxTests(TestCase):
+    def test_messages_to_one_recipient_are_coalesced(self):
+        outbox.enqueue_emails(
+            [
+                ("First", "one", "dev@example.com"),
+                ("Second", "two", "dev@example.com"),
+                ("Other", "three", "owner@example.com"),
+            ]
+        )
+        stats = outbox.drain()
+        self.assertEqual((stats["delivered"], stats["emails"]), (3, 2))
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(OutboundEmail.objects.exclude(status="sent").exists())
+
+    def test_failed_send_is_retried_with_backoff(self):
+        outbox.enqueue_email("Hello", "body", "dev@example.com")
+        with mock.patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("connection reset"),
+        ):
+            stats = outbox.drain()
+        self.assertEqual(stats["failed"], 1)
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), ("pending", 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(outbox.drain()["delivered"], 0)
@@ -0,0 +1,132 @@
+"""Thumbnails of image and PDF attachments, generated by a Celery job.
+
+A thumbnail belongs to the ``StoredFile`` it is made from, so content
+attached to many tasks is rendered once, and is stored next to it. Images
+need Pillow; the first page of a PDF also needs the optional pypdfium2
+package. Content neither can render is marked ``unavailable``.
+
+At most ``THUMBNAIL_MAX_CONCURRENCY`` generations run at once across all
+workers; a job that finds every slot taken is retried shortly after.
+"""
+
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from .models import StoredFile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - Pillow is in requirements.txt
+    Image = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png"}
+
+
+def slot_key(index):
+    return f"tasks:thumbnail-slot:{index}"
+
+
+def acquire_slot():
+    """Claim a free generation slot and return its key, or ``None`` if all are busy."""
+    for index in range(settings.THUMBNAIL_MAX_CONCURRENCY):
+        key = slot_key(index)
+        # The timeout frees the slot of a worker that died mid-job.
+        if cache.add(key, 1, settings.THUMBNAIL_SLOT_TIMEOUT):
+            return key
+    return None
+
+
+def release_slot(key):
+    cache.delete(key)
+
+
+def thumbnail_name(blob):
+    root, _ = os.path.splitext(blob.file.name)
+    return f"{root}.thumb-{settings.THUMBNAIL_SIZE}.jpg"
+
+
+def can_render(blob):
+    extension = os.path.splitext(blob.file.name)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        return Image is not None
+    return extension == ".pdf" and Image is not None and pypdfium2 is not None
+
+
+def _load_image(blob):
+    size = settings.THUMBNAIL_SIZE
+    with blob.file.storage.open(blob.file.name, "rb") as file:
+        if blob.file.name.lower().endswith(".pdf"):
+            pdf = pypdfium2.PdfDocument(file.read())
+            try:
+                page = pdf[0]
+                scale = size / max(page.get_size())
+                return page.render(scale=scale).to_pil()
+            finally:
+                pdf.close()
+        image = Image.open(file)
+        image.draft("RGB", (size, size))  # Lets JPEG decode at a reduced scale
+        image.load()
+    return ImageOps.exif_transpose(image)
+
+
+def _render(blob):
+    image = _load_image(blob)
+    image.thumbnail((settings.THUMBNAIL_SIZE, settings.THUMBNAIL_SIZE))
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image)
+    output = io.BytesIO()
+    image.convert("RGB").save(output, "JPEG", quality=85, optimize=True)
+    return output.getvalue()
+
+
+def generate(blob_id, force=False):
+    """Render and store the thumbnail of a stored file; returns its new status."""
+    blob = StoredFile.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return None  # Deleted with its last attachment
+    if blob.thumbnail_status != "pending" and not force:
+        return blob.thumbnail_status
+    thumbnail = ""
+    if not can_render(blob):
+        status = "unavailable"
+    else:
+        try:
+            content = _render(blob)
+        except Exception:
+            logger.exception("Could not render a thumbnail of %s", blob.file.name)
+            status = "failed"
+        else:
+            name = thumbnail_name(blob)
+            default_storage.delete(name)  # Replaced when regenerating
+            thumbnail = default_storage.save(name, ContentFile(content))
+            status = "ready"
+    updated = StoredFile.objects.filter(pk=blob_id).update(
+        thumbnail=thumbnail, thumbnail_status=status
+    )
+    if not updated and thumbnail:
+        default_storage.delete(thumbnail)  # The file went while we rendered it
+    return status
+
+
+def request_thumbnail(blob, force=False):
+    """Queue generation once the current transaction commits."""
+    from .tasks import generate_thumbnail
+
+    if force:
+        StoredFile.objects.filter(pk=blob.pk).update(thumbnail_status="pending")
+        blob.thumbnail_status = "pending"
+    transaction.on_commit(lambda: generate_thumbnail.delay(blob.pk, force=force))
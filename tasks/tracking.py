@@ -0,0 +1,119 @@
+"""In-memory change tracking for tasks.
+
+Task instances keep a snapshot of their tracked column values from the moment
+they are loaded (or last saved), so the history for a save can be computed as
+a diff without re-reading the row.
+"""
+
+from collections import defaultdict
+
+from django.dispatch import Signal
+
+# Sent with ``project_ids`` after tasks are created, changed or deleted,
+# including the bulk and queryset writes that bypass the model signals.
+# ``transitions`` lists an ``(old, new)`` pair of task states per task,
+# with ``None`` on the missing side for creations and deletions. Saves also
+# send ``task_ids`` and the tracked ``fields`` that may have changed (all of
+# them for creations).
+tasks_changed = Signal()
+
+# Columns the per-project counters are broken down by.
+COUNTED_COLUMNS = ("project_id", "status_id", "priority", "assigned_to_id", "deadline")
+
+# Columns the sprint snapshots total.
+SPRINT_COLUMNS = ("sprint_id", "story_points", "estimated_hours", "actual_hours")
+
+STATE_COLUMNS = COUNTED_COLUMNS + SPRINT_COLUMNS
+
+TRACKED_FIELDS = [
+    "title",
+    "description",
+    "status",
+    "priority",
+    "assigned_to",
+    "deadline",
+    "estimated_hours",
+    "actual_hours",
+    "sprint",
+    "story_points",
+]
+
+
+def tracked_attnames(model, fields=None):
+    """Map tracked field names to their column attribute names (e.g. status -> status_id).
+
+    ``fields`` may name fields either way, as ``update()`` and ``save()`` allow.
+    """
+    if fields is None:
+        names = TRACKED_FIELDS
+    else:
+        fields = {model._meta.get_field(name).name for name in fields}
+        names = [name for name in TRACKED_FIELDS if name in fields]
+    return {name: model._meta.get_field(name).attname for name in names}
+
+
+def snapshot(instance, fields=None):
+    """Return the current loaded values of the tracked fields, skipping deferred ones."""
+    loaded = instance.__dict__
+    return {
+        name: loaded[attname]
+        for name, attname in tracked_attnames(type(instance), fields).items()
+        if attname in loaded
+    }
+
+
+def history_value(value):
+    """Render a value the way TaskHistory keeps it, ``None`` included."""
+    return str(value)
+
+
+def diff(old_values, new_values):
+    """Return raw ``{field: (old, new)}`` for every field whose value changed."""
+    changes = {}
+    for name, new in new_values.items():
+        if name not in old_values:
+            continue
+        old = old_values[name]
+        if old != new:
+            changes[name] = (old, new)
+    return changes
+
+
+def history_changes(model, diffs, using=None):
+    """Render ``{task_id: diff}`` for TaskHistory.
+
+    Related objects are recorded by name rather than id, as the history always
+    has been, so their names are read with one query per related model.
+    """
+    wanted = defaultdict(set)
+    for changes in diffs.values():
+        for name, pair in changes.items():
+            field = model._meta.get_field(name)
+            if field.is_relation:
+                wanted[field.related_model].update(pk for pk in pair if pk is not None)
+    names = {
+        (related, obj.pk): str(obj)
+        for related, pks in wanted.items()
+        # Statuses and sprints name their project too.
+        for obj in related._base_manager.using(using).select_related().filter(pk__in=pks)
+    }
+
+    def render(field, value):
+        if value is not None and field.is_relation:
+            value = names.get((field.related_model, value), value)
+        return history_value(value)
+
+    return {
+        task_id: {
+            name: tuple(render(model._meta.get_field(name), value) for value in pair)
+            for name, pair in changes.items()
+        }
+        for task_id, changes in diffs.items()
+    }
+
+
+def counted_state(values):
+    """The counted and sprint columns of a task, from a ``values()`` row or an instance."""
+    if not isinstance(values, dict):
+        values = values.__dict__
+    return {column: values.get(column) for column in STATE_COLUMNS}
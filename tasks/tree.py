@@ -0,0 +1,122 @@
+"""Task hierarchies (``parent_task``) loaded with one recursive CTE.
+
+``subtree`` fetches a task and all of its descendants in a single query and
+nests them with rolled-up hours and story points. ``find_cycles`` loads the
+ancestor chains of proposed parents in a single query too, so writes can
+refuse to make a task its own ancestor.
+"""
+
+from django.conf import settings
+from django.db import connections
+from .models import Task
+
+CYCLE_ERROR = "A task cannot be nested under itself or its own subtasks"
+ROLLUP_FIELDS = ("estimated_hours", "actual_hours", "story_points")
+NODE_FIELDS = (
+    "id",
+    "title",
+    "status_id",
+    "priority",
+    "assigned_to_id",
+    "deadline",
+    *ROLLUP_FIELDS,
+)
+
+
+def _table():
+    return connections[Task.objects.db].ops.quote_name(Task._meta.db_table)
+
+
+def ancestor_parents(task_ids, max_depth=None):
+    """Map each of ``task_ids`` and all their ancestors to their parent ID."""
+    task_ids = list(task_ids)
+    if not task_ids:
+        return {}
+    max_depth = max_depth or settings.TASK_TREE_MAX_DEPTH
+    placeholders = ", ".join(["%s"] * len(task_ids))
+    # The depth bound also stops the recursion on cycles already in the data.
+    sql = f"""
+        WITH RECURSIVE chain (id, parent_task_id, depth) AS (
+            SELECT id, parent_task_id, 0 FROM {_table()} WHERE id IN ({placeholders})
+            UNION ALL
+            SELECT t.id, t.parent_task_id, chain.depth + 1
+            FROM {_table()} t JOIN chain ON t.id = chain.parent_task_id
+            WHERE chain.depth < %s
+        )
+        SELECT id, parent_task_id FROM chain
+    """
+    with connections[Task.objects.db].cursor() as cursor:
+        cursor.execute(sql, [*task_ids, max_depth])
+        return dict(cursor.fetchall())
+
+
+def find_cycles(moves):
+    """Return the tasks in ``{task_id: new_parent_id}`` that would become their own ancestor.
+
+    All moves are applied together, so a batch swapping two tasks' parents is
+    caught even though each move alone would be fine.
+    """
+    parents = ancestor_parents({p for p in moves.values() if p is not None})
+    parents.update(moves)
+    cyclic = set()
+    for task_id in moves:
+        seen = {task_id}
+        node = parents.get(task_id)
+        while node is not None:
+            if node in seen:
+                cyclic.add(task_id)
+                break
+            seen.add(node)
+            node = parents.get(node)
+    return cyclic
+
+
+def _descendants(root_id, max_depth):
+    sql = f"""
+        WITH RECURSIVE tree (id, depth) AS (
+            SELECT id, 0 FROM {_table()} WHERE id = %s
+            UNION ALL
+            SELECT t.id, tree.depth + 1
+            FROM {_table()} t JOIN tree ON t.parent_task_id = tree.id
+            WHERE tree.depth < %s
+        )
+        SELECT {", ".join(f"t.{name}" for name in NODE_FIELDS)},
+            t.parent_task_id, t.project_id, tree.depth
+        FROM tree JOIN {_table()} t ON t.id = tree.id
+        ORDER BY tree.depth, t.id
+    """
+    return Task.objects.raw(sql, [root_id, max_depth])
+
+
+def subtree(root, project_ids=None, max_depth=None):
+    """Nested tree under ``root`` with rollups summed over each node's subtree.
+
+    Descendants outside ``project_ids`` (when given) are left out together
+    with everything below them.
+    """
+    max_depth = max_depth or settings.TASK_TREE_MAX_DEPTH
+    nodes = {}
+    order = []
+    for task in _descendants(root.pk, max_depth):
+        if task.pk in nodes:  # Reached twice through a cycle in existing data
+            continue
+        if task.pk != root.pk and (
+            task.parent_task_id not in nodes
+            or (project_ids is not None and task.project_id not in project_ids)
+        ):
+            continue
+        node = {name: getattr(task, name) for name in NODE_FIELDS}
+        node.update(parent_task_id=task.parent_task_id, depth=task.depth, children=[])
+        nodes[task.pk] = node
+        order.append(node)
+        if task.pk != root.pk:
+            nodes[task.parent_task_id]["children"].append(node)
+    # Deepest first, so every child's rollup is complete before its parent's.
+    for node in reversed(order):
+        rollup = {name: node[name] or 0 for name in ROLLUP_FIELDS}
+        rollup["task_count"] = 1
+        for child in node["children"]:
+            for name, value in child["rollup"].items():
+                rollup[name] += value
+        node["rollup"] = rollup
+    return nodes[root.pk]
@@ -0,0 +1,338 @@
+"""Chunked, resumable attachment uploads onto content-addressed storage.
+
+An upload is started with the file name and size, which are validated before
+any content is sent. Chunks of ``ATTACHMENT_UPLOAD_CHUNK_SIZE`` bytes are then
+PUT in order and streamed straight to storage while being hashed and counted,
+so an oversized chunk is refused as soon as it overruns. A client that loses
+its connection asks for the upload's state and resends from ``next_index``.
+
+Content is identified by the SHA-256 of the SHA-256 of each chunk-sized
+block, which the chunk digests give without reading the file again. Each
+distinct content is stored once as a ``StoredFile`` that counts the
+attachments referencing it; attaching known content only adds a reference.
+"""
+
+import hashlib
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ATTACHMENT_EXTENSIONS, Attachment, AttachmentUpload, StoredFile
+from . import thumbnails
+
+
+class UploadError(Exception):
+    """Raised with a client-facing message when an upload request is refused."""
+
+    def __init__(self, message, conflict=False):
+        super().__init__(message)
+        self.message = message
+        # Conflicts (wrong chunk, incomplete upload) map to 409 rather than 400.
+        self.conflict = conflict
+
+
+def chunk_size():
+    return settings.ATTACHMENT_UPLOAD_CHUNK_SIZE
+
+
+def validate_name_and_size(filename, size):
+    """Reject a file by its name and declared size before reading any of it."""
+    extension = os.path.splitext(filename)[1][1:].lower()
+    if extension not in ATTACHMENT_EXTENSIONS:
+        raise UploadError(
+            f"File extension “{extension}” is not allowed. Allowed extensions "
+            f"are: {', '.join(ATTACHMENT_EXTENSIONS)}."
+        )
+    if size <= 0:
+        raise UploadError("The submitted file is empty.")
+    if size > settings.ATTACHMENT_MAX_SIZE:
+        raise UploadError(
+            f"Files may be at most {settings.ATTACHMENT_MAX_SIZE} bytes."
+        )
+
+
+def combine_digests(block_digests):
+    """The content hash from the hex SHA-256 of each block, in order."""
+    combined = hashlib.sha256()
+    for digest in block_digests:
+        combined.update(bytes.fromhex(digest))
+    return combined.hexdigest()
+
+
+class BlockHasher:
+    """Incremental ``combine_digests`` for content read in arbitrary pieces."""
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or chunk_size()
+        self.block_digests = []
+        self._block = hashlib.sha256()
+        self._filled = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.block_size - self._filled)
+            self._block.update(view[:take])
+            self._filled += take
+            view = view[take:]
+            if self._filled == self.block_size:
+                self._end_block()
+
+    def _end_block(self):
+        self.block_digests.append(self._block.hexdigest())
+        self._block = hashlib.sha256()
+        self._filled = 0
+
+    def hexdigest(self):
+        if self._filled:
+            self._end_block()
+        return combine_digests(self.block_digests)
+
+
+class _HashingReader:
+    """File-like view of a request body that hashes and counts what is read.
+
+    Reading more than ``limit`` bytes raises, so the storage backend stops
+    writing as soon as a client sends too much.
+    """
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.count = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        # Ask for one byte past the limit so an overrun is noticed.
+        remaining = self.limit + 1 - self.count
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self.stream.read(size) if self.stream is not None else b""
+        self.count += len(data)
+        if self.count > self.limit:
+            raise UploadError(f"Chunk is larger than the expected {self.limit} bytes.")
+        self.sha256.update(data)
+        return data
+
+
+class _ConcatenatedReader:
+    """Read stored chunk files one after another as a single file."""
+
+    def __init__(self, storage, names):
+        self.storage = storage
+        self.names = list(names)
+        self.current = None
+
+    def read(self, size=-1):
+        while self.names or self.current is not None:
+            if self.current is None:
+                self.current = self.storage.open(self.names.pop(0), "rb")
+            data = self.current.read(size)
+            if data:
+                return data
+            self.current.close()
+            self.current = None
+        return b""
+
+
+def chunk_name(upload_id, index):
+    return f"attachments/uploads/{upload_id}/{index:06d}.part"
+
+
+def blob_name(digest, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f"attachments/blobs/{digest[:2]}/{digest}{extension}"
+
+
+def start_upload(task, user, filename, size):
+    validate_name_and_size(filename, size)
+    return AttachmentUpload.objects.create(
+        task=task, uploaded_by=user, filename=filename, size=size
+    )
+
+
+def next_index(upload):
+    return len(upload.chunk_digests)
+
+
+def write_chunk(upload, index, stream):
+    """Stream chunk ``index`` of ``upload`` from ``stream`` into storage.
+
+    Resending the last stored chunk (e.g. after a lost response) is accepted
+    without rewriting it; any other out-of-order chunk is a conflict. The
+    chunk is claimed with a conditional update and streamed outside any
+    transaction, so a slow client holds no lock; a second request for the
+    same chunk meanwhile is a conflict too.
+    """
+    upload = AttachmentUpload.objects.get(pk=upload.pk)
+    expected = next_index(upload)
+    if index == expected - 1:
+        return upload
+    if index != expected:
+        raise UploadError(
+            f"Expected chunk {expected}, got chunk {index}.", conflict=True
+        )
+    if upload.received >= upload.size:
+        raise UploadError("All chunks have already been received.", conflict=True)
+    claimed_at = timezone.now()
+    stale = claimed_at - timedelta(seconds=settings.ATTACHMENT_UPLOAD_CLAIM_TIMEOUT)
+    if not AttachmentUpload.objects.filter(
+        Q(writing_since__isnull=True) | Q(writing_since__lt=stale),
+        pk=upload.pk,
+        received=upload.received,
+    ).update(writing_since=claimed_at):
+        raise UploadError(f"Chunk {index} is already being written.", conflict=True)
+    claim = AttachmentUpload.objects.filter(pk=upload.pk, writing_since=claimed_at)
+
+    # Every chunk but the last is exactly one block of the content hash.
+    length = min(chunk_size(), upload.size - upload.received)
+    reader = _HashingReader(stream, length)
+    name = chunk_name(upload.pk, index)
+    default_storage.delete(name)  # Left by an earlier attempt that failed
+    try:
+        default_storage.save(name, File(reader, name=name))
+        if reader.count != length:
+            raise UploadError(
+                f"Chunk is {reader.count} bytes, expected {length} bytes."
+            )
+    except Exception:
+        default_storage.delete(name)
+        claim.update(writing_since=None)
+        raise
+    upload.received += length
+    upload.chunk_digests = [*upload.chunk_digests, reader.sha256.hexdigest()]
+    if not claim.update(
+        received=upload.received,
+        chunk_digests=upload.chunk_digests,
+        writing_since=None,
+    ):
+        # Held past the claim timeout and taken over by another request.
+        raise UploadError(f"Chunk {index} was claimed again meanwhile.", conflict=True)
+    upload.writing_since = None
+    return upload
+
+
+def complete_upload(upload):
+    """Turn a fully received upload into an attachment and discard its chunks."""
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.received != upload.size:
+            raise UploadError(
+                f"Received {upload.received} of {upload.size} bytes.", conflict=True
+            )
+        names = [chunk_name(upload.pk, i) for i in range(next_index(upload))]
+        attachment = _attach(
+            upload.task_id,
+            upload.uploaded_by_id,
+            upload.filename,
+            upload.size,
+            combine_digests(upload.chunk_digests),
+            lambda: File(_ConcatenatedReader(default_storage, names)),
+        )
+        upload.delete()
+    return attachment
+
+
+def attach_file(task, user, uploaded_file):
+    """Attach a file received in one request, reading it once to hash it."""
+    validate_name_and_size(uploaded_file.name, uploaded_file.size)
+    hasher = BlockHasher()
+    for data in uploaded_file.chunks(hasher.block_size):
+        hasher.update(data)
+    with transaction.atomic():
+        return _attach(
+            task.pk,
+            user.pk,
+            os.path.basename(uploaded_file.name),
+            uploaded_file.size,
+            hasher.hexdigest(),
+            lambda: uploaded_file,
+        )
+
+
+def _attach(task_id, user_id, filename, size, digest, open_content):
+    blob = acquire_blob(digest, size, filename, open_content)
+    return Attachment.objects.create(
+        task_id=task_id,
+        uploaded_by_id=user_id,
+        blob=blob,
+        file=blob.file.name,
+        name=filename,
+        size=size,
+    )
+
+
+def acquire_blob(digest, size, filename, open_content):
+    """Return the stored file for ``digest`` with one more reference.
+
+    The content is only written (from ``open_content()``) when it is new. The
+    row is inserted before the file is written, so concurrent uploads of the
+    same content wait on its unique digest rather than both storing a copy.
+    """
+    if StoredFile.objects.filter(digest=digest).update(ref_count=F("ref_count") + 1):
+        return StoredFile.objects.get(digest=digest)
+    name = blob_name(digest, filename)
+    try:
+        with transaction.atomic():
+            blob = StoredFile.objects.create(
+                digest=digest, size=size, file=name, ref_count=1
+            )
+    except IntegrityError:
+        return acquire_blob(digest, size, filename, open_content)
+    stored = default_storage.save(name, open_content())
+    if stored != name:
+        blob.file.name = stored
+        blob.save(update_fields=["file"])
+    # Only new content needs one; later attachments of it share the thumbnail.
+    thumbnails.request_thumbnail(blob)
+    return blob
+
+
+def release_blobs(blob_ids):
+    """Drop one reference per ID; files nobody references are deleted on commit."""
+    if not blob_ids:
+        return
+    with transaction.atomic():
+        for blob_id in blob_ids:
+            StoredFile.objects.filter(pk=blob_id).update(ref_count=F("ref_count") - 1)
+        unused = list(
+            StoredFile.objects.select_for_update().filter(
+                pk__in=set(blob_ids), ref_count=0
+            )
+        )
+        if not unused:
+            return
+        names = [blob.file.name for blob in unused]
+        names += [blob.thumbnail.name for blob in unused if blob.thumbnail]
+        StoredFile.objects.filter(pk__in=[blob.pk for blob in unused]).delete()
+    _delete_on_commit(names)
+
+
+def discard_chunks(upload):
+    """Delete the stored chunks of an upload that completed or was abandoned."""
+    # One more than recorded: a chunk may have failed half way through.
+    _delete_on_commit(
+        [chunk_name(upload.pk, i) for i in range(len(upload.chunk_digests) + 1)]
+    )
+
+
+def _delete_on_commit(names):
+    def delete_files():
+        for name in names:
+            default_storage.delete(name)
+
+    transaction.on_commit(delete_files)
+
+
+def expire_uploads():
+    """Delete uploads left unfinished for longer than the expiry window."""
+    cutoff = timezone.now() - timedelta(hours=settings.ATTACHMENT_UPLOAD_EXPIRY_HOURS)
+    count = 0
+    for upload in AttachmentUpload.objects.filter(created_at__lt=cutoff).iterator():
+        upload.delete()  # Its chunks go with it (see the post_delete signal)
+        count += 1
+    return count
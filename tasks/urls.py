@@ -7,5 +7,6 @@ router = DefaultRouter()
 router.register(r"tasks", views.TaskViewSet)
 
 urlpatterns = [
+    path("search/", views.SearchView.as_view(), name="search"),
     path("", include(router.urls)),
 ]
@@ -1,16 +1,63 @@
 from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from rest_framework import viewsets, filters
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.permissions import IsAuthenticated
-from .models import Task, Comment, Attachment, TaskHistory
-from .serializers import TaskSerializer, CommentSerializer, AttachmentSerializer, TaskHistorySerializer
+from task_manager.conditional import (
+    make_etag,
+    stamp_datetime,
+    stamp_key,
+    version_stamps,
+)
+from task_manager.response_cache import CachedResponseMixin
+from task_manager.pagination import UpdatedAtPagination, ChangedAtPagination
+from projects.visibility import filter_visible, visible_project_ids
+from .models import Task, Comment, Attachment, AttachmentUpload, TaskHistory
+from .serializers import (
+    TaskSerializer,
+    TaskListSerializer,
+    CommentSerializer,
+    AttachmentSerializer,
+    AttachmentUploadSerializer,
+    TaskHistorySerializer,
+    TaskBulkSerializer,
+)
 from .permissions import IsOwnerOrAdmin
+from .bulk import BulkValidationError, validate_operations, apply_operations
+from .tree import subtree
+from . import downloads, search, thumbnails, uploads
 
 
-class TaskViewSet(viewsets.ModelViewSet):
+# Related data each serialized field needs, so querysets only join or
+# prefetch what the response will actually render.
+TASK_FIELD_SELECT_RELATED = {
+    "status": "status",
+    "sprint": "sprint",
+    "created_by": "created_by",
+    "assigned_to": "assigned_to",
+}
+TASK_FIELD_PREFETCH = {
+    "comments": models.Prefetch(
+        "comments", queryset=Comment.objects.select_related("author")
+    ),
+    "attachments": models.Prefetch(
+        "attachments",
+        queryset=Attachment.objects.select_related("uploaded_by", "blob"),
+    ),
+    "history": models.Prefetch(
+        "history", queryset=TaskHistory.objects.select_related("user")
+    ),
+}
+
+
+class TaskViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """ViewSet for Task CRUD operations."""
 
     queryset = Task.objects.select_related(
@@ -21,20 +68,99 @@ class TaskViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ["status", "priority", "assigned_to__email"]
     ordering_fields = ["created_at", "priority"]
-    ordering = ["-updated_at"]
+    ordering = ["-updated_at", "-id"]
+    pagination_class = UpdatedAtPagination
+    cache_metrics_name = "tasks"
+    throttle_scope = "task-write"
+    throttle_scopes = dict.fromkeys(
+        ["list", "retrieve", "tree", "history", "download_attachment", "upload_status"],
+        "task-read",
+    )
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return TaskListSerializer
+        return super().get_serializer_class()
 
     def get_queryset(self):
+        return self.optimize_queryset(self.visible_queryset())
+
+    def visible_queryset(self):
         user = self.request.user
-        base_qs = Task.objects.select_related(
-            "project", "parent_task", "created_by", "assigned_to"
-        ).prefetch_related('comments', 'attachments')
         if user.is_staff:
-            return base_qs
+            return Task.objects.all()
         if user.is_authenticated:
-            return base_qs.filter(
-                models.Q(project__owner=user) | models.Q(project__members=user)
-            ).distinct()
-        return base_qs.none
+            return filter_visible(Task.objects.all(), user, project_field="project")
+        return Task.objects.none()
+
+    def get_list_validators(self):
+        """Validators from the stamps of every project whose tasks are visible."""
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        if user.is_staff:
+            keys = [stamp_key("tasks")]
+        else:
+            keys = [
+                stamp_key("project-tasks", project_id)
+                for project_id in sorted(visible_project_ids(user))
+            ]
+        # Tasks render the names of their creator and assignee.
+        keys.append(stamp_key("users"))
+        stamps = version_stamps(keys)
+        # The stamp keys name the visible projects, so users who see the same
+        # projects share validators (and cached responses).
+        etag = make_etag(
+            "tasks", self.request.get_full_path(), sorted(stamps.items())
+        )
+        return etag, stamp_datetime(max(stamps.values(), default=0))
+
+    def get_object_validators(self):
+        """Validators from the task's ``updated_at`` and the stamps of what it renders.
+
+        The task stamp covers its comments and attachments, the project-tasks
+        stamp its status and sprint, and the users stamp the names of its
+        creator, assignee and history authors.
+        """
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            row = (
+                self.visible_queryset()
+                .filter(pk=pk)
+                .values_list("updated_at", "project_id")
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            return None
+        if row is None:
+            return None
+        updated_at, project_id = row
+        keys = [
+            stamp_key("task", pk),
+            stamp_key("project-tasks", project_id),
+            stamp_key("users"),
+        ]
+        stamps = version_stamps(keys)
+        etag = make_etag(
+            "task", str(pk), updated_at.isoformat(), [stamps[key] for key in keys]
+        )
+        return etag, max(updated_at, stamp_datetime(max(stamps.values())))
+
+    def optimize_queryset(self, queryset):
+        """Join and prefetch only the relations the serializer will render."""
+        if self.action not in ("list", "retrieve"):
+            # Write responses render the creator; permissions only need IDs.
+            return queryset.select_related("created_by")
+        rendered = set(self.get_serializer().fields)
+        select = [
+            relation
+            for field, relation in TASK_FIELD_SELECT_RELATED.items()
+            if field in rendered
+        ]
+        prefetch = [
+            lookup for field, lookup in TASK_FIELD_PREFETCH.items() if field in rendered
+        ]
+        return queryset.select_related(*select).prefetch_related(*prefetch)
 
     def perform_create(self, serializer):
         """Set created_by to current user."""
@@ -45,6 +171,24 @@ class TaskViewSet(viewsets.ModelViewSet):
         instance._request_user = self.request.user  # Pass user to signal
         serializer.save()
 
+    @action(
+        detail=False,
+        methods=["post"],
+        serializer_class=TaskBulkSerializer,
+        permission_classes=[IsAuthenticated],
+    )
+    def bulk(self, request):
+        """Create, update and delete many tasks in one all-or-nothing transaction."""
+        serializer = TaskBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data["operations"]
+        try:
+            validated = validate_operations(request, operations)
+        except BulkValidationError as e:
+            return Response({"errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        results = apply_operations(request, validated)
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"], serializer_class=CommentSerializer)
     def add_comment(self, request, pk=None):
         """Add a comment to a task."""
@@ -65,10 +209,186 @@ class TaskViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"attachments/(?P<attachment_id>[0-9]+)/download",
+    )
+    def download_attachment(self, request, pk=None, attachment_id=None):
+        """Download an attachment of a task the user can see."""
+        return downloads.serve_attachment(request, self.get_attachment(attachment_id))
+
+    def get_attachment(self, attachment_id):
+        task = self.get_object()
+        return get_object_or_404(
+            Attachment.objects.select_related("blob"), pk=attachment_id, task=task
+        )
+
+    @action(
+        detail=True,
+        methods=["get", "post"],
+        url_path=r"attachments/(?P<attachment_id>[0-9]+)/thumbnail",
+    )
+    def attachment_thumbnail(self, request, pk=None, attachment_id=None):
+        """GET the thumbnail of an attachment; POST to have it generated again."""
+        attachment = self.get_attachment(attachment_id)
+        blob = attachment.blob
+        if blob is None:
+            return Response(
+                {"detail": "This attachment has no thumbnail."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        if request.method == "POST":
+            thumbnails.request_thumbnail(blob, force=True)
+            return Response(
+                {"thumbnail_status": blob.thumbnail_status},
+                status=status.HTTP_202_ACCEPTED,
+            )
+        if blob.thumbnail_status != "ready":
+            return Response(
+                {
+                    "detail": "No thumbnail yet.",
+                    "thumbnail_status": blob.thumbnail_status,
+                },
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return downloads.serve_thumbnail(request, attachment)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path="uploads",
+        serializer_class=AttachmentUploadSerializer,
+    )
+    def start_upload(self, request, pk=None):
+        """Start a chunked upload of an attachment, declaring its name and size."""
+        task = self.get_object()
+        serializer = AttachmentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = uploads.start_upload(
+            task,
+            request.user,
+            serializer.validated_data["filename"],
+            serializer.validated_data["size"],
+        )
+        return Response(
+            AttachmentUploadSerializer(upload).data, status=status.HTTP_201_CREATED
+        )
+
+    def get_upload(self, upload_id):
+        task = self.get_object()
+        try:
+            return get_object_or_404(
+                AttachmentUpload, pk=upload_id, task=task, uploaded_by=self.request.user
+            )
+        except DjangoValidationError:
+            raise Http404
+
+    def upload_error(self, error):
+        return Response(
+            {"detail": error.message},
+            status=(
+                status.HTTP_409_CONFLICT
+                if error.conflict
+                else status.HTTP_400_BAD_REQUEST
+            ),
+        )
+
+    @action(
+        detail=True,
+        methods=["get"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)",
+        serializer_class=AttachmentUploadSerializer,
+    )
+    def upload_status(self, request, pk=None, upload_id=None):
+        """How much of a chunked upload has arrived, to resume from ``next_index``."""
+        return Response(AttachmentUploadSerializer(self.get_upload(upload_id)).data)
+
+    @action(
+        detail=True,
+        methods=["put"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/chunks/(?P<index>[0-9]+)",
+        serializer_class=AttachmentUploadSerializer,
+    )
+    def upload_chunk(self, request, pk=None, upload_id=None, index=None):
+        """Store one chunk, sent as the raw request body."""
+        upload = self.get_upload(upload_id)
+        try:
+            # Read straight from the request stream; request.data would buffer it.
+            upload = uploads.write_chunk(upload, int(index), request.stream)
+        except uploads.UploadError as e:
+            return self.upload_error(e)
+        return Response(AttachmentUploadSerializer(upload).data)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]+)/complete",
+        serializer_class=AttachmentSerializer,
+    )
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """Finish a chunked upload, creating the attachment."""
+        upload = self.get_upload(upload_id)
+        try:
+            attachment = uploads.complete_upload(upload)
+        except uploads.UploadError as e:
+            return self.upload_error(e)
+        return Response(
+            AttachmentSerializer(attachment).data, status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=True, methods=["get"])
+    def tree(self, request, pk=None):
+        """The task with all of its subtasks nested, plus rolled-up totals."""
+        task = self.get_object()
+        project_ids = None if request.user.is_staff else visible_project_ids(request.user)
+        return Response(subtree(task, project_ids=project_ids))
+
     @action(detail=True, methods=["get"])
     def history(self, request, pk=None):
         """Retrieve task history."""
         task = self.get_object()
-        history = TaskHistory.objects.select_related("task", "user").filter(task=task)
-        serializer = TaskHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        history = TaskHistory.objects.select_related("user").filter(task=task)
+        history = history.order_by("-changed_at", "-id")
+        paginator = ChangedAtPagination()
+        if not paginator.is_requested(request):
+            # Existing clients expect a bare list; pages are opt-in here.
+            return Response(TaskHistorySerializer(history, many=True).data)
+        # No view: the task ordering filter must not override history ordering.
+        page = paginator.paginate_queryset(history, request)
+        serializer = TaskHistorySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class SearchView(APIView):
+    """Full-text search over the tasks, descriptions and comments the user can see."""
+
+    permission_classes = [IsAuthenticated]
+    throttle_scope = "search"
+
+    def get(self, request):
+        query = request.query_params.get("q", "")
+        if not search.parse_terms(query):
+            return Response(
+                {"q": "Enter at least one word to search for"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get("limit", settings.SEARCH_PAGE_SIZE))
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            return Response(
+                {"limit": "limit and offset must be integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        limit = max(1, min(limit, settings.SEARCH_MAX_PAGE_SIZE))
+        offset = max(0, offset)
+        project_ids = None if request.user.is_staff else visible_project_ids(request.user)
+        # One extra hit tells whether there is a next page without counting.
+        hits = search.search(query, project_ids, limit=limit + 1, offset=offset)
+        return Response(
+            {
+                "results": hits[:limit],
+                "next_offset": offset + limit if len(hits) > limit else None,
+            }
+        )